@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def get_rss_mb():
+    """ Function for measuring the memory of the current process
+    Returns:
+        Tuple containing:
+            1) rss - the resident set size in MB (the peak resident set size if psutil is not installed);
+            2) source - 'psutil' or 'peak'
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20, 'psutil'
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, 'peak'
+
+
+def measure_backend(model_filepath, backend, calibration_path, runs, batch_size):
+    """ Function for measuring one backend in the current process (it is run in a separate process for each backend,
+    so the memory of one backend does not affect the other)
+    Args:
+        1) model_filepath - the HDF5 model file path
+        2) backend - 'keras' or 'tflite'
+        3) calibration_path - the folder of the images
+        4) runs - the number of measured single-image forward passes
+        5) batch_size - the batch size of the throughput measurement
+    Returns:
+        dictionary
+    """
+    rss_before, _ = get_rss_mb()
+    from modules import nn_model
+    from modules import model_export
+    nn_model.configure_tensorflow()
+    images, _ = model_export.get_calibration_images(data_path=calibration_path)
+    rss_imported, _ = get_rss_mb()
+
+    start_time = time.perf_counter()
+    model = nn_model.get_nn_model(model_filepath=model_filepath, backend=backend)
+    batch_function = nn_model.get_batch_function(model=model, input_shape=images.shape[1:])
+    batch_function(images[:1])
+    load_s = time.perf_counter() - start_time
+
+    predictions = np.concatenate([batch_function(images[i:i + 1]) for i in range(len(images))])
+    latencies = []
+    for run in range(runs):
+        image = images[run % len(images)][np.newaxis]
+        start_time = time.perf_counter()
+        batch_function(image)
+        latencies.append(time.perf_counter() - start_time)
+    batch = images[np.arange(batch_size) % len(images)]
+    batch_function(batch)
+    start_time = time.perf_counter()
+    batch_function(batch)
+    batch_s = time.perf_counter() - start_time
+    rss_after, rss_source = get_rss_mb()
+
+    latencies = np.asarray(latencies) * 1000
+    return {'backend': backend,
+            'model_size_mb': os.path.getsize(nn_model.get_model_filepath(model_filepath, backend)) / 2 ** 20,
+            'load_and_warmup_s': load_s, 'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)), f'batch_{batch_size}_images_per_s': batch_size / batch_s,
+            'rss_model_mb': rss_after - rss_imported, 'rss_total_mb': rss_after, 'rss_baseline_mb': rss_before,
+            'rss_source': rss_source, 'predicted_classes': np.argmax(predictions, axis=1).tolist()}
+
+
+def main():
+    """python -m benchmarks.backend_benchmark [--model models/...h5] [--backends keras tflite] [--runs 50]
+    [--output results.json]
+
+    The .tflite model is created by export_model.py
+    """
+    parser = argparse.ArgumentParser(description="Latency, memory and model size of the Keras and the TensorFlow Lite "
+                                                 "backends of the garbage classifier")
+    parser.add_argument('--model', default='models/6_resnet152_garbage_classification_6_classes_model.h5')
+    parser.add_argument('--backends', nargs='+', default=['keras', 'tflite'], choices=['keras', 'tflite'])
+    parser.add_argument('--calibration-path', default='../Final_Project/Analysis/data/my_test_data')
+    parser.add_argument('--runs', type=int, default=50, help="the number of measured single-image forward passes")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--output', default=None, help="the JSON file for the results")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(measure_backend(model_filepath=args.model, backend=args.worker,
+                                         calibration_path=args.calibration_path, runs=args.runs,
+                                         batch_size=args.batch_size)))
+        return
+
+    results = []
+    for backend in args.backends:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.backend_benchmark', '--model', args.model,
+                                 '--calibration-path', args.calibration_path, '--runs', str(args.runs),
+                                 '--batch-size', str(args.batch_size), '--worker', backend],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    reference_classes = np.asarray(results[0]['predicted_classes'])
+    agreement_key = f"top1_agreement_with_{results[0]['backend']}"
+    for result in results:
+        result[agreement_key] = float(np.mean(np.asarray(result['predicted_classes']) == reference_classes))
+        print(f"{result['backend']:>7}: size = {result['model_size_mb']:7.1f} MB, "
+              f"load = {result['load_and_warmup_s']:5.1f} s, p50 = {result['p50_ms']:7.1f} ms, "
+              f"p99 = {result['p99_ms']:7.1f} ms, {result[f'batch_{args.batch_size}_images_per_s']:6.1f} images/s "
+              f"(batch {args.batch_size}), RSS of the model = {result['rss_model_mb']:7.1f} MB, "
+              f"agreement = {result[agreement_key]:.1%}")
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'model': args.model, 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modules import nn_model
+from modules.inference_engine import InferenceEngine
+
+
+def get_model(model_filepath, n_classes=6):
+    """ Function for loading the model to measure (an untrained ResNet152 of the same architecture is used if the model
+    file is not available, the time of a forward pass does not depend on the weights)
+    Args:
+        1) model_filepath - model file path (including HDF5 file name)
+        2) n_classes - the number of classes of the untrained model
+    Returns:
+        the model
+    """
+    if os.path.exists(model_filepath):
+        return nn_model.get_nn_model(model_filepath=model_filepath)
+    print(f"{model_filepath} is not found, an untrained ResNet152 is used")
+    import tensorflow as tf
+    return tf.keras.applications.ResNet152(weights=None, classes=n_classes)
+
+
+def run_load_test(classify_function, images, concurrency):
+    """ Function for sending the images to classify_function from concurrency client threads at once
+    Args:
+        1) classify_function - a function: prepared image of shape (1, 224, 224, 3) -> result
+        2) images - a list of prepared images (one request for each image)
+        3) concurrency - the number of concurrent clients
+    Returns:
+        dictionary: 'images_per_s', 'p50_ms', 'p99_ms', 'mean_ms', 'total_s'
+    """
+    def request(image):
+        start_time = time.perf_counter()
+        classify_function(image)
+        return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = np.asarray(list(executor.map(request, images))) * 1000
+    total_time = time.perf_counter() - start_time
+    return {'images_per_s': len(images) / total_time, 'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)), 'mean_ms': float(latencies.mean()), 'total_s': total_time}
+
+
+def main():
+    """python -m benchmarks.inference_benchmark [--model models/...h5] [--requests 256] [--concurrency 1 8 32]
+    [--max-batch-size 16] [--max-delay-ms 10] [--output results.json]
+    """
+    parser = argparse.ArgumentParser(description="Load test of the garbage classifier: model.predict for each image "
+                                                 "against the micro-batching inference engine")
+    parser.add_argument('--model', default='models/6_resnet152_garbage_classification_6_classes_model.h5')
+    parser.add_argument('--requests', type=int, default=256, help="the number of classified images")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32],
+                        help="the numbers of concurrent clients")
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-delay-ms', type=float, default=10)
+    parser.add_argument('--output', default=None, help="the JSON file for the results")
+    args = parser.parse_args()
+
+    nn_model.configure_tensorflow()
+    model = get_model(model_filepath=args.model)
+    rng = np.random.default_rng(0)
+    images = [rng.uniform(-120, 150, size=(1, 224, 224, 3)).astype(np.float32) for _ in range(args.requests)]
+
+    results = []
+    with InferenceEngine(model=model, max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms) as engine:
+        paths = {'predict': lambda image: nn_model.classify_image(model=model, image=image),
+                 'engine': engine.classify_image}
+        # Warm-up of both paths
+        for classify_function in paths.values():
+            classify_function(images[0])
+        for concurrency in args.concurrency:
+            for path, classify_function in paths.items():
+                engine.batch_sizes.clear()
+                result = {'path': path, 'concurrency': concurrency,
+                          **run_load_test(classify_function=classify_function, images=images,
+                                          concurrency=concurrency)}
+                if path == 'engine':
+                    result['mean_batch_size'] = float(np.mean(engine.batch_sizes))
+                results.append(result)
+                print(f"{path:>8}, {concurrency:>3} clients: {result['images_per_s']:7.1f} images/s, "
+                      f"p50 = {result['p50_ms']:8.1f} ms, p99 = {result['p99_ms']:8.1f} ms"
+                      + (f", mean batch = {result['mean_batch_size']:.1f}" if path == 'engine' else ''))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'max_batch_size': args.max_batch_size, 'max_delay_ms': args.max_delay_ms,
+                       'requests': args.requests, 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
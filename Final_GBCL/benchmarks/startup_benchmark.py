@@ -0,0 +1,80 @@
+import time
+# The clock starts before the other imports, so the measured times include importing the modules of the application
+START_TIME = time.perf_counter()
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+def measure_startup(model_filepath, backend, image_path):
+    """ Function for measuring the cold start of the application in the current (new) process: the imports of the page,
+    the background loading and warm-up of the model and the classification of the first uploaded image
+    Args:
+        1) model_filepath - model file path (including HDF5 file name)
+        2) backend - the backend of the model (see nn_model.get_nn_model)
+        3) image_path - the image classified first
+    Returns:
+        dictionary: the times from the start of the process, seconds
+    """
+    import main
+    page_ready_s = time.perf_counter() - START_TIME
+    tensorflow_imported_by_page = 'tensorflow' in sys.modules
+
+    from modules import preprocess_image
+    from modules.inference_engine import start_inference_engine_in_background
+    engine_future = start_inference_engine_in_background(model_filepath=model_filepath, backend=backend)
+    # The image is prepared while the model is loading, as on the page
+    _, x = preprocess_image.read_preprocess_resnet_image(image_path=image_path)
+    engine = engine_future.result()
+    model_ready_s = time.perf_counter() - START_TIME
+    engine.classify_image(image=x)
+    first_prediction_s = time.perf_counter() - START_TIME
+    engine.stop()
+    return {'backend': backend, 'time_to_first_page_s': page_ready_s, 'model_ready_s': model_ready_s,
+            'time_to_first_prediction_s': first_prediction_s,
+            'tensorflow_imported_by_page': tensorflow_imported_by_page,
+            'tensorflow_imported': 'tensorflow' in sys.modules}
+
+
+def main():
+    """python -m benchmarks.startup_benchmark [--model models/...h5] [--backends keras savedmodel tflite] [--runs 3]
+    [--output results.json]
+
+    The SavedModel and the .tflite model are created by export_model.py
+    """
+    parser = argparse.ArgumentParser(description="Cold start of the garbage classifier: time to the first page and "
+                                                 "to the first prediction in a new process")
+    parser.add_argument('--model', default='models/6_resnet152_garbage_classification_6_classes_model.h5')
+    parser.add_argument('--backends', nargs='+', default=['keras'], choices=['keras', 'savedmodel', 'tflite'])
+    parser.add_argument('--image', default='../Final_Project/Analysis/data/my_test_data/metal/metal_1.jpg')
+    parser.add_argument('--runs', type=int, default=3, help="the number of new processes for each backend")
+    parser.add_argument('--output', default=None, help="the JSON file for the results")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(measure_startup(model_filepath=args.model, backend=args.worker, image_path=args.image)))
+        return
+
+    results = []
+    for backend in args.backends:
+        for run in range(args.runs):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.startup_benchmark', '--model', args.model,
+                                     '--image', args.image, '--worker', backend],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{backend:>10}, run {run + 1}: first page = {result['time_to_first_page_s']:5.2f} s "
+                  f"(tensorflow imported: {result['tensorflow_imported_by_page']}), "
+                  f"model ready = {result['model_ready_s']:5.2f} s, "
+                  f"first prediction = {result['time_to_first_prediction_s']:5.2f} s")
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'model': args.model, 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
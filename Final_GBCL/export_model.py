@@ -0,0 +1,39 @@
+import argparse
+import json
+
+from modules import nn_model
+from modules import model_export
+
+
+def main():
+    """python export_model.py [--model models/...h5] [--format tflite|savedmodel] [--quantization float16|int8|dynamic]
+    [--calibration-path ../Final_Project/Analysis/data/my_test_data] [--min-agreement 0.98]
+
+    The exported model is written next to the HDF5 model (models/...tflite or models/..._savedmodel) and is used by the
+    application when GBCL_MODEL_BACKEND=tflite or GBCL_MODEL_BACKEND=savedmodel
+    """
+    parser = argparse.ArgumentParser(description="Export of the garbage classifier to a SavedModel or to a quantized "
+                                                 "TensorFlow Lite model (gated on the top-1 agreement with the Keras "
+                                                 "model)")
+    parser.add_argument('--model', default='models/6_resnet152_garbage_classification_6_classes_model.h5')
+    parser.add_argument('--format', default='tflite', choices=['tflite', 'savedmodel'])
+    parser.add_argument('--output', default=None, help="the .tflite file or the SavedModel folder (by default next to "
+                                                       "the HDF5 model)")
+    parser.add_argument('--quantization', default='float16', choices=model_export.QUANTIZATIONS)
+    parser.add_argument('--calibration-path', default=model_export.CALIBRATION_PATH)
+    parser.add_argument('--min-agreement', type=float, default=model_export.MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    nn_model.configure_tensorflow()
+    if args.format == 'savedmodel':
+        output_path = model_export.export_saved_model(model_filepath=args.model, output_path=args.output)
+        print(f"The SavedModel is written to {output_path}")
+        return
+    report = model_export.export_tflite_model(model_filepath=args.model, output_filepath=args.output,
+                                              quantization=args.quantization, calibration_path=args.calibration_path,
+                                              min_agreement=args.min_agreement)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
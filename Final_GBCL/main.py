@@ -1,14 +1,14 @@
-import numpy as np
 from PIL import Image
 
 import cv2
 
 import os
 
+import requests
 import streamlit as st
 
 from modules import preprocess_image
-from modules import nn_model
+from modules.inference_engine import start_inference_engine_in_background
 
 
 def configure_streamlit(layout="centered", css_filepath=None):
@@ -25,15 +25,19 @@ def configure_streamlit(layout="centered", css_filepath=None):
 
 
 @st.cache_resource
-def load_nn_model(model_filepath):
-    """ Function for loading a neural network model
+def get_inference_engine(model_filepath, max_batch_size=16, max_delay_ms=10):
+    """ Function for starting the inference engine shared by all the sessions (the uploads of concurrent users are
+    classified together in micro-batches). The model is loaded and warmed up in a background thread, so the page is
+    displayed without waiting for it
         Args:
             1) model_filepath: model file path (including HDF5 file name)
+            2) max_batch_size - the maximum number of images in one forward pass
+            3) max_delay_ms - the maximum time an image waits for other images, milliseconds
         Returns:
-            nn_model
+            concurrent.futures.Future with the started InferenceEngine
     """
-    model = nn_model.get_nn_model(model_filepath=model_filepath)
-    return model
+    return start_inference_engine_in_background(model_filepath=model_filepath, max_batch_size=max_batch_size,
+                                                max_delay_ms=max_delay_ms)
 
 
 @st.cache_data
@@ -59,11 +63,31 @@ def get_classes_images(images_path):
     return class_images_dict
 
 
+def classify_with_api(api_url, uploaded_file):
+    """ Function for image classification by the HTTP inference service (server.py)
+    Args:
+        1) api_url - the address of the service, e.g. http://localhost:8080
+        2) uploaded_file - the file returned by st.file_uploader
+    Returns:
+        Tuple containing:
+        1) predicted_class - the name of the predicted class
+        2) confidence - the probability of the predicted class
+    """
+    response = requests.post(f"{api_url.rstrip('/')}/classify",
+                             files={'image': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)},
+                             timeout=60)
+    response.raise_for_status()
+    prediction = response.json()['predictions'][0]
+    return prediction['class'], prediction['confidence']
+
+
 def main():
     configure_streamlit(layout="wide", css_filepath='styles/styles.css')
-    nn_model.configure_tensorflow()
-    garbage_classification_model = load_nn_model(model_filepath=
-                                                 'models/6_resnet152_garbage_classification_6_classes_model.h5')
+    # If GBCL_API_URL is set, the page is a client of the HTTP inference service and does not load the model itself
+    api_url = os.environ.get('GBCL_API_URL')
+    if api_url is None:
+        inference_engine_future = get_inference_engine(model_filepath=
+                                                'models/6_resnet152_garbage_classification_6_classes_model.h5')
     target_size = (224, 224)
     classes_path = 'images/classes_images'
     class_labels = os.listdir(path=classes_path)
@@ -75,16 +99,21 @@ def main():
     if uploaded_file is not None:
         st.image(uploaded_file, width=300, caption="Uploaded Image")
 
-        pil_image = Image.open(uploaded_file)
-        image_array = np.array(pil_image)
+        if api_url is None:
+            pil_image = Image.open(uploaded_file)
 
-        _, x = preprocess_image.preprocess_resnet_image(img=image_array, target_size=target_size)
+            _, x = preprocess_image.preprocess_resnet_image(img=pil_image, target_size=target_size)
 
-        predictions, predicted_class_index = nn_model.classify_image(model=garbage_classification_model, image=x)
+            with st.spinner("Loading the model..."):
+                inference_engine = inference_engine_future.result()
+            predictions, predicted_class_index = inference_engine.classify_image(image=x)
+            predicted_class, confidence = class_labels[predicted_class_index], predictions.max()
+        else:
+            predicted_class, confidence = classify_with_api(api_url=api_url, uploaded_file=uploaded_file)
         col1, col2, col3 = st.columns([0.38, 0.35, 0.27])
         with col2:
-            st.subheader(f"Predicted class: {class_labels[predicted_class_index]}")
-            st.subheader(f"Confidence: {predictions.max():.2f}")
+            st.subheader(f"Predicted class: {predicted_class}")
+            st.subheader(f"Confidence: {confidence:.2f}")
 
     images_path = 'images/classes_images'
     st.markdown('<hr class="above-hr">', unsafe_allow_html=True)
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+from aiohttp import web
+
+from modules import preprocess_image
+
+
+MODEL_FILEPATH = 'models/6_resnet152_garbage_classification_6_classes_model.h5'
+CLASSES_PATH = 'images/classes_images'
+TARGET_SIZE = (224, 224)
+# The maximum size of a request body (several photos from a phone camera)
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+
+def decode_image(image_bytes, target_size=TARGET_SIZE):
+    """ Function for decoding an uploaded image and preparing it for the model (the same steps as the Streamlit page)
+    Args:
+        1) image_bytes - the content of the uploaded image file
+        2) target_size - the size of the image used to train the model
+    Returns:
+        the image prepared for use in the model, array of shape (1, *target_size, 3)
+    """
+    _, x = preprocess_image.preprocess_resnet_image(img=Image.open(io.BytesIO(image_bytes)), target_size=target_size)
+    return x
+
+
+def get_prediction_dict(predictions, predicted_class_index, class_labels, filename=None):
+    """ Function for converting the result of the classification of one image to a JSON-serialisable dictionary
+    Args:
+        1) predictions - probabilities of the image belonging to each target class, shape (1, n_classes)
+        2) predicted_class_index - index of the predicted class
+        3) class_labels - the list of names of the classes
+        4) filename - the name of the uploaded file
+    Returns:
+        dictionary: 'filename', 'class', 'class_index', 'confidence', 'probabilities' (class name -> probability)
+    """
+    probabilities = np.asarray(predictions, dtype=np.float64).reshape(-1)
+    return {'filename': filename, 'class': class_labels[predicted_class_index],
+            'class_index': int(predicted_class_index), 'confidence': float(probabilities.max()),
+            'probabilities': dict(zip(class_labels, probabilities.tolist()))}
+
+
+async def read_uploads(request):
+    """ Function for reading the uploaded images of a request: every file field of a multipart/form-data body (one or
+    several images), or the whole body of any other request (one image)
+    Args:
+        1) request - aiohttp.web.Request
+    Returns:
+        a list of tuples (filename, image_bytes)
+    """
+    if request.content_type != 'multipart/form-data':
+        body = await request.read()
+        return [(None, body)] if body else []
+    uploads = []
+    reader = await request.multipart()
+    async for part in reader:
+        if part.filename is not None:
+            uploads.append((part.filename, await part.read()))
+    return uploads
+
+
+def get_engine(app):
+    """ Function for getting the engine of the application once the model has been loaded
+    Args:
+        1) app - the application created by get_app
+    Returns:
+        the started InferenceEngine (aiohttp.web.HTTPServiceUnavailable is raised while the model is loading or if it
+        cannot be loaded)
+    """
+    engine_future = app['engine_future']
+    if not engine_future.done():
+        raise web.HTTPServiceUnavailable(text="The model is loading", headers={'Retry-After': '5'})
+    if engine_future.exception() is not None:
+        raise web.HTTPServiceUnavailable(text=f"The model cannot be loaded: {str(engine_future.exception())}")
+    return engine_future.result()
+
+
+async def classify_handler(request):
+    """ POST /classify: classification of one or several uploaded images
+    Returns:
+        JSON: {'predictions': [get_prediction_dict(...) for each image in the order of the upload]}
+    """
+    engine = get_engine(request.app)
+    executor = request.app['executor']
+    class_labels = request.app['class_labels']
+    uploads = await read_uploads(request)
+    if not uploads:
+        raise web.HTTPBadRequest(text="No image has been uploaded")
+
+    loop = asyncio.get_running_loop()
+    # The images are decoded in the thread pool, so the event loop keeps accepting requests
+    try:
+        images = await asyncio.gather(*[loop.run_in_executor(executor, decode_image, image_bytes)
+                                        for _, image_bytes in uploads])
+    except (UnidentifiedImageError, ValueError, OSError) as e:
+        raise web.HTTPBadRequest(text=f"The image cannot be decoded: {str(e)}")
+
+    # The images of all the requests are classified together in micro-batches by the engine
+    results = await asyncio.gather(*[asyncio.wrap_future(engine.submit(image)) for image in images])
+    return web.json_response({'predictions': [get_prediction_dict(predictions=predictions,
+                                                                  predicted_class_index=predicted_class_index,
+                                                                  class_labels=class_labels, filename=filename)
+                                              for (filename, _), (predictions, predicted_class_index)
+                                              in zip(uploads, results)]})
+
+
+async def classes_handler(request):
+    """ GET /classes: the names of the classes in the order of the probability vectors
+    """
+    return web.json_response({'classes': request.app['class_labels']})
+
+
+async def health_handler(request):
+    """ GET /health: the readiness of the service
+    Returns:
+        JSON: {'status': 'ok'} (200) once the model is loaded; {'status': 'loading'} or {'status': 'error',
+        'error': ...} (503) otherwise
+    """
+    engine_future = request.app['engine_future']
+    if not engine_future.done():
+        return web.json_response({'status': 'loading'}, status=503)
+    if engine_future.exception() is not None:
+        return web.json_response({'status': 'error', 'error': str(engine_future.exception())}, status=503)
+    return web.json_response({'status': 'ok'})
+
+
+def get_app(engine_future, class_labels, decode_workers=None):
+    """ Function for creating the aiohttp application of the inference service (the requests are answered with 503
+    until the engine is ready)
+    Args:
+        1) engine_future - concurrent.futures.Future with the started InferenceEngine (see
+        inference_engine.start_inference_engine_in_background)
+        2) class_labels - the list of names of the classes
+        3) decode_workers - the number of threads decoding the images (None - the default of ThreadPoolExecutor)
+    Returns:
+        aiohttp.web.Application
+    """
+    app = web.Application(client_max_size=MAX_REQUEST_SIZE)
+    app['engine_future'] = engine_future
+    app['executor'] = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='decode')
+    app['class_labels'] = class_labels
+    app.add_routes([web.post('/classify', classify_handler),
+                    web.get('/classes', classes_handler),
+                    web.get('/health', health_handler)])
+
+    async def on_cleanup(app):
+        app['executor'].shutdown(wait=False)
+        # An engine that is still loading is stopped as soon as it is ready
+        app['engine_future'].add_done_callback(lambda future: future.exception() is None and future.result().stop())
+
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def get_class_labels(classes_path=CLASSES_PATH):
+    """ Function for getting the names of the classes (the subfolders of the folder of the example images, in the same
+    order as on the Streamlit page)
+    Args:
+        1) classes_path - the path to the images folder (the folder that contains the subfolders of each class)
+    Returns:
+        the list of names of the classes
+    """
+    return os.listdir(path=classes_path)
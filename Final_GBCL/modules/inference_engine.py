@@ -0,0 +1,201 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+from modules import nn_model
+
+
+class InferenceEngine:
+    """ Dynamic micro-batching of classification requests: the requests of concurrent callers are put into a queue, a
+    worker thread collects them into a batch until max_batch_size images are waiting or max_delay_ms milliseconds have
+    passed since the first image of the batch arrived, runs one forward pass of the model for the whole batch and
+    returns the result of each image to its caller
+    """
+
+    def __init__(self, model, max_batch_size=16, max_delay_ms=10, input_shape=(224, 224, 3), batch_function=None):
+        """
+        Args:
+            1) model - the model that will perform the classification
+            2) max_batch_size - the maximum number of images in one forward pass
+            3) max_delay_ms - the maximum time the first image of a batch waits for other images, milliseconds
+            4) input_shape - the shape of one prepared image
+            5) batch_function - the forward pass for a batch (if None, nn_model.get_batch_function(model) is used)
+        """
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.input_shape = tuple(input_shape)
+        self.batch_function = batch_function if batch_function is not None else \
+            nn_model.get_batch_function(model=model, input_shape=input_shape)
+        # The batch is assembled in a preallocated buffer, so no new arrays are allocated for each batch
+        self.batch_buffer = np.empty((max_batch_size,) + self.input_shape, dtype=np.float32)
+        self.requests = queue.Queue()
+        self.worker = None
+        # The requests submitted after stop() are rejected (the lock keeps them from getting behind the stop marker)
+        self.stopped = False
+        self.lock = threading.Lock()
+        # The sizes of the processed batches (to inspect the batching)
+        self.batch_sizes = []
+
+    def start(self):
+        """ Method for starting the worker thread (the compiled forward pass is traced on a dummy image first)
+        Returns:
+            self
+        """
+        if self.worker is None:
+            self.batch_function(self.batch_buffer[:1])
+            self.stopped = False
+            self.worker = threading.Thread(target=self._run, name='inference-engine', daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        """ Method for stopping the worker thread after the requests that are already in the queue are processed (the
+        images submitted after that are rejected)
+        Returns:
+            None
+        """
+        with self.lock:
+            self.stopped = True
+            if self.worker is not None:
+                self.requests.put(None)
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+        # The requests submitted to an engine that has never been started are not processed
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and request[1].set_running_or_notify_cancel():
+                request[1].set_exception(RuntimeError("The inference engine has been stopped"))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def submit(self, image):
+        """ Method for adding an image to the queue
+        Args:
+            1) image - an image prepared for the model, array of shape input_shape or (1, *input_shape)
+        Returns:
+            concurrent.futures.Future with the result: tuple (predictions, predicted_class_index) as returned by
+            nn_model.classify_image (predictions of shape (1, n_classes)); RuntimeError is raised if the engine has been
+            stopped
+        """
+        image = np.asarray(image)
+        if image.shape == (1,) + self.input_shape:
+            image = image[0]
+        if image.shape != self.input_shape:
+            raise ValueError(f"Expected an image of shape {self.input_shape}, got {image.shape}")
+        future = Future()
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("The inference engine has been stopped")
+            self.requests.put((image, future))
+        return future
+
+    def classify_image(self, image, timeout=None):
+        """ Function for image classification through the engine (the same result as nn_model.classify_image)
+        Args:
+            1) image - an image that has been previously prepared for a model and needs to be classified
+            2) timeout - the maximum waiting time in seconds (None - no limit)
+        Returns:
+            Tuple containing:
+            1) predictions - probabilities of the image belonging to a certain target class
+            2) predicted_class_index - index of the target class to which this image belongs
+        """
+        return self.submit(image).result(timeout=timeout)
+
+    def _get_batch(self):
+        """ Method for collecting the next batch of requests from the queue (the requests whose futures have been
+        cancelled by their callers are dropped)
+        Returns:
+            Tuple containing:
+            1) batch - a list of tuples (image, future)
+            2) stop - True if the engine has been stopped
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch_size:
+            if not batch:
+                request = self.requests.get()
+            else:
+                # The requests that are already waiting are taken without waiting for the deadline
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+            if request is None:
+                return batch, True
+            # A running future can no longer be cancelled, so its result can always be set
+            if not request[1].set_running_or_notify_cancel():
+                continue
+            if not batch:
+                deadline = time.perf_counter() + self.max_delay
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        """ The loop of the worker thread: one forward pass for each collected batch
+        """
+        stop = False
+        while not stop:
+            batch, stop = self._get_batch()
+            if not batch:
+                continue
+            n_images = len(batch)
+            for position, (image, _) in enumerate(batch):
+                self.batch_buffer[position] = image
+            try:
+                predictions, predicted_class_indices = nn_model.classify_images(
+                    batch_function=self.batch_function, images=self.batch_buffer[:n_images])
+            except Exception as e:
+                for _, future in batch:
+                    try:
+                        future.set_exception(e)
+                    except InvalidStateError:
+                        pass
+                continue
+            self.batch_sizes.append(n_images)
+            # Fan the results back out to the callers (a future in an unexpected state does not stop the worker)
+            for position, (_, future) in enumerate(batch):
+                try:
+                    future.set_result((predictions[position:position + 1], int(predicted_class_indices[position])))
+                except InvalidStateError:
+                    pass
+
+
+def start_inference_engine_in_background(model_filepath, backend=None, max_batch_size=16, max_delay_ms=10,
+                                         input_shape=(224, 224, 3)):
+    """ Function for loading the model and starting the engine (including the warm-up forward pass) in a background
+    thread, so the application can be displayed while the model is loading
+    Args:
+        1) model_filepath - model file path (including HDF5 file name)
+        2) backend - the backend of the model (see nn_model.get_nn_model)
+        3) max_batch_size - the maximum number of images in one forward pass
+        4) max_delay_ms - the maximum time the first image of a batch waits for other images, milliseconds
+        5) input_shape - the shape of one prepared image
+    Returns:
+        concurrent.futures.Future with the started InferenceEngine
+    """
+    future = Future()
+
+    def load():
+        try:
+            model = nn_model.get_nn_model(model_filepath=model_filepath, backend=backend)
+            if model is None:
+                raise ValueError(f"The model {model_filepath} cannot be loaded")
+            future.set_result(InferenceEngine(model=model, max_batch_size=max_batch_size, max_delay_ms=max_delay_ms,
+                                              input_shape=input_shape).start())
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=load, name='model-loader', daemon=True).start()
+    return future
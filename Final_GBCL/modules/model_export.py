@@ -0,0 +1,154 @@
+import json
+import os
+
+import numpy as np
+
+from modules import preprocess_image
+from modules import nn_model
+
+
+QUANTIZATIONS = ['float16', 'int8', 'dynamic']
+CALIBRATION_PATH = '../Final_Project/Analysis/data/my_test_data'
+# The minimum share of the images for which the converted model predicts the same class as the Keras model
+MIN_AGREEMENT = 0.98
+
+
+def get_calibration_images(data_path=CALIBRATION_PATH, target_size=(224, 224)):
+    """ Function for reading the calibration images (the folder that contains a subfolder of images for each class)
+    Args:
+        1) data_path - the path to the images folder
+        2) target_size - the size of the image used to train the model
+    Returns:
+        Tuple containing:
+            1) images - float32 array of shape (n_images, *target_size, 3) prepared for the model;
+            2) image_paths - the list of paths of the images
+    """
+    image_paths = sorted(os.path.join(root, filename) for root, _, filenames in os.walk(data_path)
+                         for filename in filenames if filename.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not image_paths:
+        raise ValueError(f"No calibration images are found in {data_path}")
+    # The images are written into the slots of one batch tensor
+    images = preprocess_image.get_batch_buffer(batch_size=len(image_paths), target_size=target_size)
+    for slot, image_path in enumerate(image_paths):
+        images[slot] = preprocess_image.read_preprocess_resnet_image(image_path=image_path,
+                                                                     target_size=target_size)[1][0]
+    return images, image_paths
+
+
+def convert_to_tflite(model, quantization='float16', calibration_images=None):
+    """ Function for post-training quantization of the Keras model to TensorFlow Lite (the input and the output of the
+    converted model stay float32, so the images are prepared in the same way)
+    Args:
+        1) model - the Keras model
+        2) quantization - 'float16' (float16 weights), 'int8' (int8 weights and activations, calibrated on
+        calibration_images) or 'dynamic' (int8 weights, float activations)
+        3) calibration_images - float32 array of prepared images (required for 'int8')
+    Returns:
+        the content of the .tflite file (bytes)
+    """
+    tf = nn_model.get_tensorflow()
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_images is None:
+            raise ValueError("int8 quantization requires calibration images")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != 'dynamic':
+        raise ValueError(f"Unknown quantization: {quantization}")
+    return converter.convert()
+
+
+def get_top1_agreement(reference_predictions, predictions):
+    """ Function for comparing the predicted classes of two models
+    Args:
+        1) reference_predictions - the probabilities predicted by the reference (Keras) model, (n_images, n_classes)
+        2) predictions - the probabilities predicted by the converted model, (n_images, n_classes)
+    Returns:
+        Tuple containing:
+            1) agreement - the share of the images with the same predicted class;
+            2) max_abs_difference - the maximum absolute difference between the probabilities
+    """
+    reference_classes = np.argmax(reference_predictions, axis=1)
+    classes = np.argmax(predictions, axis=1)
+    return float(np.mean(reference_classes == classes)), float(np.abs(reference_predictions - predictions).max())
+
+
+def export_tflite_model(model_filepath, output_filepath=None, quantization='float16',
+                        calibration_path=CALIBRATION_PATH, min_agreement=MIN_AGREEMENT, batch_size=8):
+    """ Function for converting the HDF5 model to a quantized TensorFlow Lite model: the converted model is written only
+    if its top-1 agreement with the Keras model on the calibration images is at least min_agreement
+    Args:
+        1) model_filepath - the HDF5 model file path
+        2) output_filepath - the .tflite file path (None - next to the HDF5 model, see nn_model.get_model_filepath)
+        3) quantization - 'float16', 'int8' or 'dynamic' (see convert_to_tflite)
+        4) calibration_path - the folder of the calibration images (one subfolder for each class)
+        5) min_agreement - the minimum top-1 agreement with the Keras model
+        6) batch_size - the batch size of the reference predictions
+    Returns:
+        dictionary: the report of the conversion (it is also written next to the .tflite file as JSON)
+    """
+    output_filepath = output_filepath or nn_model.get_model_filepath(model_filepath=model_filepath, backend='tflite')
+    keras_model = nn_model.get_nn_model(model_filepath=model_filepath, backend='keras')
+    if keras_model is None:
+        raise ValueError(f"The model {model_filepath} cannot be loaded")
+    images, image_paths = get_calibration_images(data_path=calibration_path)
+    batch_function = nn_model.get_batch_function(model=keras_model, input_shape=images.shape[1:])
+    reference_predictions = np.concatenate([batch_function(images[start:start + batch_size])
+                                            for start in range(0, len(images), batch_size)])
+
+    tflite_content = convert_to_tflite(model=keras_model, quantization=quantization, calibration_images=images)
+    # The converted model is checked with the same interpreter that serves it
+    tflite_model = nn_model.TFLiteModel(model_content=tflite_content)
+    predictions = np.concatenate([tflite_model(images[start:start + 1]) for start in range(len(images))])
+    agreement, max_abs_difference = get_top1_agreement(reference_predictions=reference_predictions,
+                                                       predictions=predictions)
+    report = {'model_filepath': model_filepath, 'output_filepath': output_filepath, 'quantization': quantization,
+              'calibration_path': calibration_path, 'n_images': len(images), 'top1_agreement': agreement,
+              'min_agreement': min_agreement, 'max_abs_probability_difference': max_abs_difference,
+              'keras_model_size_bytes': os.path.getsize(model_filepath), 'tflite_model_size_bytes': len(tflite_content),
+              'disagreements': [image_paths[i] for i in np.flatnonzero(np.argmax(reference_predictions, axis=1)
+                                                                       != np.argmax(predictions, axis=1))]}
+    if agreement < min_agreement:
+        raise ValueError(f"The {quantization} model agrees with the Keras model on {agreement:.1%} of the images "
+                         f"(the minimum is {min_agreement:.1%}), the model has not been exported")
+
+    # The file is replaced atomically, so a running application never reads a partially written model
+    temporary_filepath = f'{output_filepath}.tmp'
+    with open(temporary_filepath, 'wb') as file:
+        file.write(tflite_content)
+    os.replace(temporary_filepath, output_filepath)
+    with open(f'{os.path.splitext(output_filepath)[0]}.json', 'w') as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+def export_saved_model(model_filepath, output_path=None, input_shape=(224, 224, 3)):
+    """ Function for exporting the HDF5 model to the SavedModel format with a serving signature for float32 batches of
+    any size (the application loads the traced signature instead of rebuilding the Keras model from HDF5)
+    Args:
+        1) model_filepath - the HDF5 model file path
+        2) output_path - the SavedModel folder (None - next to the HDF5 model, see nn_model.get_model_filepath)
+        3) input_shape - the shape of one prepared image
+    Returns:
+        the SavedModel folder
+    """
+    tf = nn_model.get_tensorflow()
+    output_path = output_path or nn_model.get_model_filepath(model_filepath=model_filepath, backend='savedmodel')
+    keras_model = nn_model.get_nn_model(model_filepath=model_filepath, backend='keras')
+    if keras_model is None:
+        raise ValueError(f"The model {model_filepath} cannot be loaded")
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None,) + tuple(input_shape), dtype=tf.float32)])
+    def serving_default(images):
+        return {'predictions': keras_model(images, training=False)}
+
+    tf.saved_model.save(keras_model, output_path, signatures={'serving_default': serving_default})
+    return output_path
@@ -1,25 +1,143 @@
 import numpy as np
-import tensorflow as tf
 import os
+import threading
+
+
+# The backend used by get_nn_model: 'keras' (the HDF5 model), 'savedmodel' or 'tflite' (the models exported by
+# export_model.py)
+MODEL_BACKEND = os.environ.get('GBCL_MODEL_BACKEND', 'keras')
+BACKENDS = ['keras', 'savedmodel', 'tflite']
 
 
 def configure_tensorflow():
-    """ Function to configure tensorflow for use in an application
+    """ Function to configure tensorflow for use in an application (the settings take effect only if they are made
+    before tensorflow is imported, see get_tensorflow)
     Returns:
          None
     """
     os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 
-def get_nn_model(model_filepath):
+def get_tensorflow():
+    """ Function for importing tensorflow on first use (importing it takes seconds, so it is not imported until a model
+    is loaded, and the application page is displayed without waiting for it)
+    Returns:
+        the tensorflow module
+    """
+    configure_tensorflow()
+    import tensorflow as tf
+    return tf
+
+
+def get_tflite_interpreter_class():
+    """ Function for getting the TensorFlow Lite interpreter: the tflite_runtime package if it is installed (it does not
+    import tensorflow), otherwise tf.lite.Interpreter
+    Returns:
+        the Interpreter class
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        return get_tensorflow().lite.Interpreter
+
+
+class TFLiteModel:
+    """ A converted TensorFlow Lite model with the interface of the Keras model used by this module (model.predict and
+    model(images)): the input tensor is resized when the batch size changes
+    """
+
+    def __init__(self, model_filepath=None, num_threads=None, model_content=None):
+        """
+        Args:
+            1) model_filepath - the path of the .tflite file
+            2) num_threads - the number of threads of the interpreter (None - the number of CPUs)
+            3) model_content - the content of the .tflite file (instead of model_filepath)
+        """
+        interpreter_class = get_tflite_interpreter_class()
+        self.interpreter = interpreter_class(model_path=model_filepath, model_content=model_content,
+                                             num_threads=num_threads or os.cpu_count())
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.input_shape = tuple(self.interpreter.get_input_details()[0]['shape'][1:])
+        self.batch_size = None
+        # The interpreter must not be invoked from several threads at once
+        self.lock = threading.Lock()
+
+    def __call__(self, images, training=False):
+        images = np.asarray(images, dtype=np.float32)
+        with self.lock:
+            if images.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, images.shape, strict=True)
+                self.interpreter.allocate_tensors()
+                self.batch_size = images.shape[0]
+            self.interpreter.set_tensor(self.input_index, images)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+    def predict(self, images, verbose=0):
+        return self(images)
+
+
+class SavedModel:
+    """ A model exported in the SavedModel format (model_export.export_saved_model) with the interface of the Keras model
+    used by this module: the serving signature is a traced graph, so loading it does not rebuild the Keras layers and
+    calling it does not trace the model again
+    """
+
+    def __init__(self, model_path):
+        """
+        Args:
+            1) model_path - the SavedModel folder
+        """
+        self.tf = get_tensorflow()
+        self.saved_model = self.tf.saved_model.load(model_path)
+        self.serving_function = self.saved_model.signatures['serving_default']
+
+    def __call__(self, images, training=False):
+        outputs = self.serving_function(self.tf.convert_to_tensor(images, dtype=self.tf.float32))
+        return next(iter(outputs.values())).numpy()
+
+    def predict(self, images, verbose=0):
+        return self(images)
+
+
+def get_model_filepath(model_filepath, backend=None):
+    """ Function for finding the file of the model of the backend (the exported models are stored next to the HDF5
+    model: the .tflite file and the _savedmodel folder)
+    Args:
+        1) model_filepath: model file path (including HDF5 file name)
+        2) backend - 'keras', 'savedmodel' or 'tflite' (None - MODEL_BACKEND)
+    Returns:
+        the path of the model file of the backend
+    """
+    backend = backend or MODEL_BACKEND
+    if backend == 'keras':
+        return model_filepath
+    if backend == 'savedmodel':
+        return os.path.splitext(model_filepath)[0] + '_savedmodel'
+    if backend == 'tflite':
+        return model_filepath if model_filepath.endswith('.tflite') else os.path.splitext(model_filepath)[0] + '.tflite'
+    raise ValueError(f"Unknown model backend: {backend}")
+
+
+def get_nn_model(model_filepath, backend=None):
     """ Function for loading a neural network model
     Args:
         1) model_filepath: model file path (including HDF5 file name)
+        2) backend - 'keras' (the HDF5 model), 'savedmodel' or 'tflite' (the exported models next to the HDF5 model,
+        see get_model_filepath); None - the GBCL_MODEL_BACKEND environment variable ('keras' if it is not set)
     Returns:
         nn_model
     """
+    backend = backend or MODEL_BACKEND
     try:
-        nn_model = tf.keras.models.load_model(model_filepath)
+        if backend == 'tflite':
+            return TFLiteModel(model_filepath=get_model_filepath(model_filepath=model_filepath, backend=backend))
+        if backend == 'savedmodel':
+            return SavedModel(model_path=get_model_filepath(model_filepath=model_filepath, backend=backend))
+        nn_model = get_tensorflow().keras.models.load_model(get_model_filepath(model_filepath=model_filepath,
+                                                                                backend=backend))
         return nn_model
     except Exception as e:
         print(f"Error occurred while loading the model: {str(e)}")
@@ -39,3 +157,41 @@ def classify_image(model, image):
     predictions = model.predict(image)
     predicted_class_index = np.argmax(predictions)
     return predictions, predicted_class_index
+
+
+def get_batch_function(model, input_shape=(224, 224, 3)):
+    """ Function for getting a compiled forward pass of the model for batches of any size (the model is called directly,
+    without the per-call overhead of model.predict: creating a data adapter, callbacks and a new step function)
+    Args:
+        1) model - the model that will perform the classification
+        2) input_shape - the shape of one prepared image
+    Returns:
+        a function: float32 array of shape (batch_size, *input_shape) -> numpy array of predictions of shape
+        (batch_size, n_classes)
+    """
+    # The exported models are already compiled forward passes
+    if isinstance(model, (TFLiteModel, SavedModel)):
+        return model
+    tf = get_tensorflow()
+    # The batch axis is left undefined, so batches of different sizes do not cause retracing
+    forward = tf.function(lambda x: model(x, training=False),
+                          input_signature=[tf.TensorSpec(shape=(None,) + tuple(input_shape), dtype=tf.float32)])
+
+    def batch_function(images):
+        return forward(tf.convert_to_tensor(images, dtype=tf.float32)).numpy()
+
+    return batch_function
+
+
+def classify_images(batch_function, images):
+    """ Function for classification of a batch of images with one forward pass
+    Args:
+        1) batch_function - the forward pass of the model (see get_batch_function)
+        2) images - images that have been previously prepared for a model, array of shape (batch_size, *input_shape)
+    Returns:
+        Tuple containing:
+        1) predictions - probabilities of each image belonging to a certain target class, (batch_size, n_classes)
+        2) predicted_class_indices - indices of the target classes to which the images belong, (batch_size,)
+    """
+    predictions = batch_function(images)
+    return predictions, np.argmax(predictions, axis=1)
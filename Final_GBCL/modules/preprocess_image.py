@@ -1,10 +1,27 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from PIL import Image, ImageOps
 
-from tensorflow.keras.applications.resnet50 import preprocess_input
 import cv2
 
 
+# The mean values of the channels (B, G, R) of the ImageNet images, subtracted by the ResNet preprocessing
+IMAGENET_BGR_MEAN = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+# The first bytes of a JPEG file
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+
+
+def preprocess_input(x):
+    """ Function for preparing RGB images for the ResNet model in NumPy (the same result as
+    tensorflow.keras.applications.resnet50.preprocess_input, 'caffe' mode, without importing TensorFlow)
+    Args:
+        1) x - an array of RGB images, shape (..., 3)
+    Returns:
+        float32 array: the images converted to BGR with the ImageNet mean of each channel subtracted
+    """
+    return np.asarray(x, dtype=np.float32)[..., ::-1] - IMAGENET_BGR_MEAN
+
+
 def get_plt_image(img, title=None, figsize=(12, 4)):
     """ Function to get a plt.figure that displays an array-like image
     Args:
@@ -43,6 +60,98 @@ def get_plt_images(images, titles=None, figsize=(12, 4)):
     return fig
 
 
+def get_rgb_image(img, background=(255, 255, 255), draft_size=None):
+    """ Function for converting a decoded image to a 3-channel RGB uint8 array: 16-bit images are scaled to 8 bits,
+    greyscale images are repeated over the channels, and the transparent pixels of RGBA/LA images are blended with the
+    background
+    Args:
+        1) img - a PIL image (its EXIF orientation is applied) or an array-like RGB(A)/greyscale image
+        2) background - the RGB colour that the transparent pixels are blended with
+        3) draft_size - opt-in faster decoding: the minimum size (width, height) the image is going to be resized to, a
+        JPEG file that has not been decoded yet is decoded at a reduced scale that is still at least twice as large
+        (the result differs slightly from the full-scale decoding); None (default) - full scale
+    Returns:
+        uint8 array of shape (height, width, 3)
+    """
+    if isinstance(img, Image.Image):
+        if draft_size is not None and img.format == 'JPEG':
+            # Downscaling in the JPEG decoder (by 2, 4 or 8) is much faster than decoding all the pixels
+            img.draft('RGB', (2 * max(draft_size), 2 * max(draft_size)))
+        img = ImageOps.exif_transpose(img)
+        if img.mode.startswith('I'):
+            # 16-bit greyscale ('I;16*', and 'I' that PIL uses for 16-bit PNG files) is scaled to 8 bits below
+            img = np.clip(np.asarray(img), 0, 65535).astype(np.uint16)
+        elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            # Palette, CMYK, 16-bit and other modes (a palette with transparency becomes RGBA)
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode.endswith('A') else 'RGB')
+    img = np.asarray(img)
+    if img.dtype == np.uint16:
+        # The same scaling as read_preprocess_resnet_image applies to 16-bit files
+        img = (img >> 8).astype(np.uint8)
+    elif img.dtype != np.uint8:
+        img = np.clip(img, 0, 255).astype(np.uint8)
+    if img.ndim == 2:
+        img = img[:, :, np.newaxis]
+    if img.shape[2] in (2, 4):
+        # Blending with the background: color * alpha + background * (1 - alpha)
+        alpha = img[:, :, -1:].astype(np.float32) / 255
+        color = img[:, :, :-1].astype(np.float32)
+        img = (color * alpha + np.asarray(background, dtype=np.float32)[:color.shape[2]] * (1 - alpha) + 0.5)
+        img = img.astype(np.uint8)
+    if img.shape[2] == 1:
+        img = np.repeat(img, 3, axis=2)
+    return np.ascontiguousarray(img)
+
+
+def get_batch_buffer(batch_size, target_size=(224, 224)):
+    """ Function for allocating a batch tensor that the prepared images are written into (see write_resnet_input)
+    Args:
+        1) batch_size - the number of images in the batch
+        2) target_size - the size (width, height) of the image used to train the model
+    Returns:
+        float32 array of shape (batch_size, height, width, 3)
+    """
+    return np.empty((batch_size, target_size[1], target_size[0], 3), dtype=np.float32)
+
+
+def write_resnet_input(img, out, target_size=(224, 224), bgr=False):
+    """ Function for preparing an image for use in the ResNet model directly in a slot of a batch tensor: one resize
+    (area interpolation for downscaling), then the swap of the channels to BGR, the conversion to float32 and the
+    subtraction of the ImageNet mean in one pass (the same result as preprocess_input)
+    Args:
+        1) img - uint8 array of shape (height, width, 3), RGB (or BGR if bgr is True)
+        2) out - float32 array of shape (target_size[1], target_size[0], 3), e.g. a slot of get_batch_buffer
+        3) target_size - the size (width, height) of the image used to train the model
+        4) bgr - True if the channels of img are in BGR order (e.g. read by cv2.imread)
+    Returns:
+        the resized image (in the channel order of img)
+    """
+    height, width = img.shape[:2]
+    downscaling = width >= target_size[0] and height >= target_size[1]
+    img = cv2.resize(img, target_size, interpolation=cv2.INTER_AREA if downscaling else cv2.INTER_LINEAR)
+    np.subtract(img if bgr else img[:, :, ::-1], IMAGENET_BGR_MEAN, out=out, casting='unsafe')
+    return img
+
+
+def preprocess_resnet_batch(images, target_size=(224, 224), out=None, draft=False):
+    """ Function for preparing several images for use in the ResNet model as one batch tensor
+    Args:
+        1) images - a list of decoded images (PIL images or array-like RGB(A)/greyscale images, see get_rgb_image)
+        2) target_size - the size (width, height) of the image used to train the model
+        3) out - the batch tensor to write the images into (None - a new one is allocated with get_batch_buffer); it must
+        have at least len(images) slots
+        4) draft - True to decode the JPEG files at a reduced scale (see get_rgb_image)
+    Returns:
+        float32 array of shape (len(images), height, width, 3): the first len(images) slots of out
+    """
+    if out is None:
+        out = get_batch_buffer(batch_size=len(images), target_size=target_size)
+    draft_size = target_size if draft else None
+    for slot, img in enumerate(images):
+        write_resnet_input(img=get_rgb_image(img, draft_size=draft_size), out=out[slot], target_size=target_size)
+    return out[:len(images)]
+
+
 def read_preprocess_resnet_image(image_path, target_size=(224, 224)):
     """ Function for reading and preparing an image for use in the ResNet model
     Args:
@@ -53,28 +162,44 @@ def read_preprocess_resnet_image(image_path, target_size=(224, 224)):
             1) image - the read image in the form of a numpy array;
             2) x - the image prepared for use in the model
     """
-    img = cv2.imread(image_path)
-    img = cv2.cvtColor(img,  cv2.COLOR_BGR2RGB)
-    img = cv2.resize(img, target_size)
-    x = np.expand_dims(img, axis=0)
-    x = preprocess_input(x)
+    x = get_batch_buffer(batch_size=1, target_size=target_size)
+    data = np.fromfile(image_path, dtype=np.uint8)
+    if data[:3].tobytes() == JPEG_SIGNATURE:
+        # A JPEG image has no alpha channel: cv2.imdecode applies the EXIF orientation and returns BGR, the order
+        # expected by the model
+        img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"The image {image_path} cannot be read")
+        img = write_resnet_input(img=img, out=x[0], target_size=target_size, bgr=True)
+        return img[:, :, ::-1], x
+
+    # Other formats are decoded with the alpha channel, which is blended with the background as on the page
+    img = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError(f"The image {image_path} cannot be read")
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA if img.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+    img = write_resnet_input(img=get_rgb_image(img), out=x[0], target_size=target_size)
     return img, x
 
 
-def preprocess_resnet_image(img, target_size=(224, 224)):
+def preprocess_resnet_image(img, target_size=(224, 224), draft=False):
     """ Function for preparing an image for use in the ResNet model
     Args:
-        1) img - an array-like image
+        1) img - a decoded image: a PIL image (RGB, RGBA, greyscale, palette; its EXIF orientation is applied) or an
+        array-like RGB(A)/greyscale image, e.g. np.array(PIL.Image)
         2) target_size - the size of the image used to train the model (the original image will be resized to this size)
+        3) draft - True to decode a JPEG file at a reduced scale (see get_rgb_image)
     Returns:
         Tuple containing:
             1) image - the read image in the form of a numpy array (to display image);
             2) x - the image prepared for use in the model
     """
-    img = cv2.cvtColor(img,  cv2.COLOR_BGR2RGB)
-    img = cv2.resize(img, target_size)
-    x = np.expand_dims(img, axis=0)
-    x = preprocess_input(x)
+    x = get_batch_buffer(batch_size=1, target_size=target_size)
+    img = write_resnet_input(img=get_rgb_image(img, draft_size=target_size if draft else None), out=x[0],
+                             target_size=target_size)
     return img, x
 
 
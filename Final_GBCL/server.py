@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+
+from aiohttp import web
+
+from modules import nn_model
+from modules import inference_api
+from modules.inference_engine import start_inference_engine_in_background
+
+
+async def serve(app, host, port):
+    """ Function for running the service: the requests are accepted while the model is loading (GET /health reports
+    the readiness), and the service stops with an error if the model cannot be loaded
+    Args:
+        1) app - the application created by inference_api.get_app
+        2) host - the host to listen on
+        3) port - the port to listen on
+    Returns:
+        None (runs until it is cancelled)
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+        print(f"Serving on http://{host}:{port}, the model is loading")
+        try:
+            await asyncio.wrap_future(app['engine_future'])
+        except Exception as e:
+            raise SystemExit(f"Error: the inference engine cannot be started: {str(e)}")
+        print("The model is ready")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """python server.py [--host 0.0.0.0] [--port 8080] [--model models/...h5] [--max-batch-size 16] [--max-delay-ms 10]
+
+    POST /classify - one image as the request body, or one or several images as multipart/form-data files
+    GET /classes, GET /health (503 until the model is loaded)
+    """
+    parser = argparse.ArgumentParser(description="HTTP inference service of the garbage classifier")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model', default=inference_api.MODEL_FILEPATH)
+    parser.add_argument('--classes-path', default=inference_api.CLASSES_PATH)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-delay-ms', type=float, default=10)
+    parser.add_argument('--decode-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    nn_model.configure_tensorflow()
+    # The model is loaded in the background, so the service answers /health while it is loading
+    engine_future = start_inference_engine_in_background(model_filepath=args.model, max_batch_size=args.max_batch_size,
+                                                         max_delay_ms=args.max_delay_ms)
+    app = inference_api.get_app(engine_future=engine_future,
+                                class_labels=inference_api.get_class_labels(args.classes_path),
+                                decode_workers=args.decode_workers)
+    try:
+        asyncio.run(serve(app=app, host=args.host, port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
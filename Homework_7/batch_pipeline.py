@@ -0,0 +1,33 @@
+import sys
+import time
+
+from modules import batch_processing
+
+
+def main():
+    """Batch mode of the pipeline: python batch_pipeline.py <folder or glob of recordings> [workers] [features.csv]
+    The per-recording stages run in parallel worker processes; the split and the scaling are performed once for the
+    features of all the recordings
+    """
+    filenames = batch_processing.get_recording_filenames(sys.argv[1])
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    output_filename = sys.argv[3] if len(sys.argv) > 3 else None
+    if not filenames:
+        print(f"no recordings found: {sys.argv[1]}")
+        return
+
+    start_time = time.perf_counter()
+    results = batch_processing.perform_batch_pipeline(filenames_arg=filenames, max_workers_arg=max_workers)
+    elapsed_time = time.perf_counter() - start_time
+
+    print(f"recordings = {len(filenames)}, windows = {len(results['features_df'])}, "
+          f"time = {elapsed_time:.3f} seconds ({len(filenames) / elapsed_time:.2f} recordings/s)")
+    print(f"X_train: {results['X_train'].shape}, X_valid: {results['X_valid'].shape}")
+    if output_filename is not None:
+        features_df = results['features_df'].copy()
+        features_df['recording'] = [filenames[recording] for recording in results['recordings']]
+        features_df.to_csv(output_filename, index=False)
+
+
+if __name__ == "__main__":
+    main()
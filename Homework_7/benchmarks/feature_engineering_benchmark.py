@@ -0,0 +1,92 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from modules import frequency_stability, data_filtering, windowing, feature_engineering
+
+
+def get_windowed_train_df(filename):
+    """Function for preparing the windowed dataframe (the input of the feature engineering stage) from a recording
+    :param filename: the path to the recording CSV file
+    :return: windowed dataframe
+    """
+    df = pd.read_csv(filename)
+    df = df[df['time'].diff() <= frequency_stability.get_avg_period(df, 'time') * 1.5].copy()
+    df[['accX_filtered', 'accY_filtered', 'accZ_filtered', 'gyrZ_filtered']] \
+        = data_filtering.median_filter_data(df_arg=df,
+                                            filter_columns_arg=['accX', 'accY', 'accZ', 'gyrZ'],
+                                            window_size_arg=10)
+    df = df[df['activity'] != 'No activity']
+    return windowing.get_windowed_df(df_arg=df, window_duration_arg=2)
+
+
+def get_apply_features_df(windowed_df_arg):
+    """Function for calculating the features the old way: one Series.apply per (statistical measure, channel) pair
+    :param windowed_df_arg: windowed dataframe
+    :return: features dataframe
+    """
+    functions_list = [
+        lambda x: x.mean(),  # mean
+        lambda x: x.std(),  # std deviation
+        lambda x: np.mean(np.absolute(x - np.mean(x))),  # avg absolute diff
+        lambda x: x.min(),  # min
+        lambda x: x.max(),  # max
+        lambda x: x.max() - x.min(),  # range = max-min diff
+        lambda x: np.median(x),  # median
+        lambda x: np.percentile(x, 75) - np.percentile(x, 25),  # interquartile range
+        lambda x: np.sum(x < 0),  # negative count
+        lambda x: np.sum(x > 0),  # positive count
+        lambda x: stats.skew(x),  # skewness = assymetry
+        lambda x: stats.kurtosis(x)  # kurtosis
+    ]
+    return feature_engineering.get_statistical_measures_df(windowed_data_df=windowed_df_arg,
+                                                           functions=functions_list,
+                                                           data_df_columns=['accX', 'accY', 'accZ', 'gyrZ'],
+                                                           result_df_columns=feature_engineering.STATISTICAL_MEASURES)
+
+
+def get_batch_features_df(windowed_df_arg):
+    """Function for calculating the features with the vectorized statistics kernel
+    :param windowed_df_arg: windowed dataframe
+    :return: features dataframe
+    """
+    return feature_engineering.get_statistical_measures_batch_df(windowed_data_df=windowed_df_arg,
+                                                                 data_df_columns=['accX', 'accY', 'accZ', 'gyrZ'])
+
+
+def get_median_time(function, df_arg, number_of_experiments):
+    """Function for measuring the median execution time of function(df_arg) (after one warm-up run)
+    :return: the median execution time in seconds
+    """
+    function(df_arg)
+    time_list = []
+    for i in range(number_of_experiments):
+        start_time = time.perf_counter()
+        function(df_arg)
+        time_list.append(time.perf_counter() - start_time)
+    return float(np.median(time_list))
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'data/Train/Train_activities_1_2023-08-23.csv'
+    number_of_experiments = 5
+    windowed_df = get_windowed_train_df(filename=filename)
+
+    # Make sure that both ways give the same features
+    apply_df = get_apply_features_df(windowed_df)
+    batch_df = get_batch_features_df(windowed_df)
+    assert list(apply_df.columns) == list(batch_df.columns)
+    assert np.allclose(apply_df.to_numpy(dtype=float), batch_df.to_numpy(dtype=float), equal_nan=True)
+
+    apply_time = get_median_time(get_apply_features_df, windowed_df, number_of_experiments)
+    batch_time = get_median_time(get_batch_features_df, windowed_df, number_of_experiments)
+    print(f"number of windows = {len(windowed_df)}")
+    print(f"Series.apply features: median time = {apply_time:.4f} seconds")
+    print(f"batched features: median time = {batch_time:.4f} seconds")
+    print(f"speed-up = {apply_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from modules import data_filtering
+
+
+def get_pandas_median(df_arg, window_size_arg):
+    """The previous implementation of data_filtering.median_filter_data: one rolling median per column"""
+    df = pd.DataFrame()
+    for column in df_arg.columns:
+        df[f'{column}_filtered'] = df_arg[column].rolling(window=window_size_arg, center=True, min_periods=1).median()
+    return df
+
+
+def get_median_time(function, number_of_experiments=3):
+    """Function for measuring the median execution time of function() (after one warm-up run)
+    :return: the median execution time in seconds
+    """
+    function()
+    time_list = []
+    for i in range(number_of_experiments):
+        start_time = time.perf_counter()
+        function()
+        time_list.append(time.perf_counter() - start_time)
+    return float(np.median(time_list))
+
+
+def main():
+    """python -m benchmarks.median_filter_benchmark [number_of_rows]"""
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(n_rows, 6)), columns=['accX', 'accY', 'accZ', 'gyrX', 'gyrY', 'gyrZ'])
+    values_float32 = df.to_numpy(dtype=np.float32)
+
+    print(f"number of rows = {n_rows}, 6 channels")
+    for window_size in [5, 10, 11, 21, 51, 101]:
+        # Make sure that both implementations give the same result
+        assert np.array_equal(get_pandas_median(df, window_size).to_numpy(),
+                              data_filtering.median_filter_data(df, list(df.columns), window_size).to_numpy())
+
+        pandas_time = get_median_time(lambda: get_pandas_median(df, window_size))
+        float64_time = get_median_time(lambda: data_filtering.median_filter_data(df, list(df.columns), window_size))
+        float32_time = get_median_time(lambda: data_filtering.get_running_median(values_float32, window_size))
+        print(f"window = {window_size:3d}: pandas rolling = {pandas_time:.3f} s, "
+              f"running median float64 = {float64_time:.3f} s ({pandas_time / float64_time:.1f}x), "
+              f"float32 = {float32_time:.3f} s ({pandas_time / float32_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
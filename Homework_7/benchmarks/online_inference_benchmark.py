@@ -0,0 +1,81 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from modules import online_inference, streaming, pipeline
+
+
+def get_ingest_latencies(samples_arg, window_size_arg, sampling_frequency_arg=1.0):
+    """Function for measuring the latency of ingesting each sample into one ActivityStream
+    :param samples_arg: an array of shape (n_samples, n_channels)
+    :param window_size_arg: the number of data points within a window
+    :param sampling_frequency_arg: the sampling frequency of the stream, Hz
+    :return: an array of latencies in microseconds
+    """
+    stream = online_inference.ActivityStream(window_size=window_size_arg, sampling_frequency=sampling_frequency_arg)
+    latencies = np.empty(len(samples_arg))
+    for i, sample in enumerate(samples_arg):
+        start_time = time.perf_counter_ns()
+        stream.push(sample)
+        latencies[i] = (time.perf_counter_ns() - start_time) / 1000
+    return latencies
+
+
+def get_throughput(classifier_arg, samples_arg, number_of_streams_arg):
+    """Function for measuring the throughput of the classifier fed by number_of_streams_arg concurrent streams (every
+    stream receives the same samples; after each round of samples all the ready windows are classified at once)
+    :return: the number of ingested samples per second
+    """
+    start_time = time.perf_counter()
+    for sample in samples_arg:
+        for stream_id in range(number_of_streams_arg):
+            classifier_arg.ingest(stream_id, sample)
+        if classifier_arg.model is not None:
+            classifier_arg.classify_ready()
+    return len(samples_arg) * number_of_streams_arg / (time.perf_counter() - start_time)
+
+
+def main():
+    """python -m benchmarks.online_inference_benchmark [recording.csv] [model.h5]
+    Without a model only the online feature extraction is measured
+    """
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'data/Train/Train_activities_1_2023-08-23.csv'
+    model_filename = sys.argv[2] if len(sys.argv) > 2 else None
+
+    df = pd.read_csv(filename)
+    # The windows and the sampling frequency are the same as in the batch and the streaming pipelines
+    parameters = streaming.get_stream_parameters(filename=filename)
+    window_size, sampling_frequency = parameters['window_size'], parameters['sampling_frequency']
+    samples = df[['accX', 'accY', 'accZ', 'gyrZ']].to_numpy()
+
+    model = None
+    scaler = StandardScaler()
+    if model_filename is not None:
+        from keras.models import load_model
+        model = load_model(model_filename)
+    # The scaler is fitted on the features of the recording itself
+    features_df = pd.concat(list(streaming.stream_features(filename=filename)))
+    scaler.fit(features_df.drop(columns='activity'))
+
+    latencies = get_ingest_latencies(samples_arg=samples, window_size_arg=window_size,
+                                     sampling_frequency_arg=sampling_frequency)
+    print(f"window size = {window_size}, sampling frequency = {sampling_frequency:.1f} Hz")
+    print(f"ingest latency: median = {np.median(latencies):.1f} us, p99 = {np.percentile(latencies, 99):.1f} us, "
+          f"max = {latencies.max():.1f} us")
+
+    for number_of_streams in [1, 10, 100, 1000]:
+        classifier = online_inference.OnlineActivityClassifier(model=model, scaler=scaler, window_size=window_size,
+                                                               class_labels=list(pipeline.ACTIVITY_DICT),
+                                                               sampling_frequency=sampling_frequency)
+        # About 100k ingested samples per measurement
+        n_samples = max(1000, 100_000 // number_of_streams)
+        throughput = get_throughput(classifier_arg=classifier, samples_arg=samples[:n_samples],
+                                    number_of_streams_arg=number_of_streams)
+        print(f"{number_of_streams} streams: {throughput:.0f} samples/s = "
+              f"{throughput / sampling_frequency:.0f} real-time device streams on one core")
+
+
+if __name__ == "__main__":
+    main()
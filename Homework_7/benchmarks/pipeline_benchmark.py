@@ -0,0 +1,157 @@
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from modules import data_filtering, exploratory_data_analysis, windowing, feature_engineering, model_training, \
+    pipeline
+from benchmarks import synthetic_recordings
+
+
+def get_timings(function_arg, number_of_runs_arg=5, number_of_warmup_runs_arg=1):
+    """Function for measuring the execution time of function_arg() with time.perf_counter
+    :param function_arg: the function without arguments to measure
+    :param number_of_runs_arg: the number of measured runs
+    :param number_of_warmup_runs_arg: the number of runs before the measured ones (not measured)
+    :return: a list of the execution times in seconds
+    """
+    for _ in range(number_of_warmup_runs_arg):
+        function_arg()
+    time_list = []
+    for _ in range(number_of_runs_arg):
+        start_time = time.perf_counter()
+        function_arg()
+        time_list.append(time.perf_counter() - start_time)
+    return time_list
+
+
+def get_statistics(time_list_arg, n_rows_arg):
+    """Function for summarising the execution times of one benchmark
+    :param time_list_arg: a list of the execution times in seconds
+    :param n_rows_arg: the number of rows of the input recording
+    :return: dictionary: 'median_s', 'p95_s', 'min_s', 'mean_s', 'rows_per_s' (for the median time), 'runs_s'
+    """
+    times = np.asarray(time_list_arg)
+    median = float(np.median(times))
+    return {'median_s': median, 'p95_s': float(np.percentile(times, 95)), 'min_s': float(times.min()),
+            'mean_s': float(times.mean()), 'rows_per_s': n_rows_arg / median if median > 0 else None,
+            'runs_s': [float(value) for value in times]}
+
+
+def get_stage_benchmarks(df_arg, stages_arg=None):
+    """Function for preparing the inputs of the selected stages of the pipeline (the outputs of the previous stages are
+    calculated once, outside the measurements, and only if a selected stage needs them)
+    :param df_arg: the recording dataframe
+    :param stages_arg: a list of the names of the stages to measure (if None, all the stages)
+    :return: a list of tuples (stage name, function without arguments)
+    """
+    # The function that calculates each input from the recording or from the inputs of the previous stages
+    input_functions = {
+        'recording': lambda: df_arg,
+        'sensor_values': lambda: df_arg[pipeline.SENSOR_COLUMNS].to_numpy(),
+        'df': lambda: pipeline.preprocess_df(df_arg=df_arg),
+        'balanced_df': lambda: exploratory_data_analysis.get_undersampled_df(df_arg=get_input('df'),
+                                                                             column_name_arg='activity'),
+        'filtered_df': lambda: pipeline.column_selection_stage({'df': get_input('balanced_df')})['filtered_df'],
+        'windowed_df': lambda: windowing.get_windowed_df(df_arg=get_input('filtered_df'), window_duration_arg=2),
+        'features_df': lambda: pipeline.feature_engineering_stage(
+            {'windowed_df': get_input('windowed_df'), 'filtered_df': get_input('filtered_df')},
+            feature_names_arg=feature_engineering.STATISTICAL_MEASURES,
+            channels_arg=windowing.DATA_CHANNELS)['features_df'],
+        'X_train': lambda: model_training.split_train_data(train_df_arg=get_input('features_df'))[0]}
+    inputs = {}
+
+    def get_input(name):
+        if name not in inputs:
+            inputs[name] = input_functions[name]()
+        return inputs[name]
+
+    # The stages with the names of their inputs
+    stages = [('median_filter', 'sensor_values', lambda x: data_filtering.get_running_median(x, window_size_arg=10)),
+              ('preprocessing', 'recording', lambda x: pipeline.preprocess_df(df_arg=x)),
+              ('undersampling', 'df', lambda x: exploratory_data_analysis.get_undersampled_df(
+                  df_arg=x, column_name_arg='activity')),
+              ('column_selection', 'balanced_df', lambda x: pipeline.column_selection_stage({'df': x})),
+              ('windowing', 'filtered_df', lambda x: windowing.get_windowed_df(df_arg=x, window_duration_arg=2)),
+              ('features', 'windowed_df', lambda x: pipeline.perform_feature_engineering(df_arg=x)),
+              ('split', 'features_df', lambda x: model_training.split_train_data(train_df_arg=x)),
+              ('scaling', 'X_train', lambda x: StandardScaler().fit_transform(x)),
+              ('end_to_end', 'recording', lambda x: pipeline.perform_pipeline(df_arg=x))]
+    return [(stage, functools.partial(function, get_input(input_name))) for stage, input_name, function in stages
+            if stages_arg is None or stage in stages_arg]
+
+
+def get_environment():
+    """Function for describing the environment of the measurements (to compare the results of different commits)
+    :return: dictionary
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count()}
+
+
+def compare_results(results_arg, baseline_arg):
+    """Function for printing the ratio of the median times of the current and the baseline results
+    :param results_arg: the list of the current results
+    :param baseline_arg: the list of the baseline results (from a JSON file of an earlier run)
+    :return: None
+    """
+    baseline = {(result['stage'], result['n_rows']): result for result in baseline_arg}
+    for result in results_arg:
+        baseline_result = baseline.get((result['stage'], result['n_rows']))
+        if baseline_result is not None:
+            ratio = result['median_s'] / baseline_result['median_s']
+            print(f"{result['stage']:>16} {result['n_rows']:>11,} rows: {baseline_result['median_s']:.4f} s -> "
+                  f"{result['median_s']:.4f} s (x{ratio:.2f}{', REGRESSION' if ratio > 1.1 else ''})")
+
+
+def main():
+    """python -m benchmarks.pipeline_benchmark [--sizes 10000 100000 ...] [--stages ...] [--runs 5] [--warmup 1]
+    [--output results.json] [--baseline previous_results.json]
+    """
+    parser = argparse.ArgumentParser(description="Per-stage and end-to-end benchmarks of the pipeline on synthetic "
+                                                 "recordings")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="the numbers of rows of the synthetic recordings (up to 100M rows, memory permitting)")
+    parser.add_argument('--stages', nargs='+', default=None, help="the stages to measure (all by default)")
+    parser.add_argument('--runs', type=int, default=5, help="the number of measured runs")
+    parser.add_argument('--warmup', type=int, default=1, help="the number of warm-up runs")
+    parser.add_argument('--output', default=None, help="the JSON file for the results")
+    parser.add_argument('--baseline', default=None, help="the JSON file of earlier results to compare with")
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.sizes:
+        df = synthetic_recordings.get_synthetic_recording(n_rows_arg=n_rows)
+        for stage, function in get_stage_benchmarks(df_arg=df, stages_arg=args.stages):
+            time_list = get_timings(function_arg=function, number_of_runs_arg=args.runs,
+                                    number_of_warmup_runs_arg=args.warmup)
+            result = {'stage': stage, 'n_rows': n_rows, **get_statistics(time_list_arg=time_list, n_rows_arg=n_rows)}
+            results.append(result)
+            print(f"{stage:>16} {n_rows:>11,} rows: median = {result['median_s']:.4f} s, "
+                  f"p95 = {result['p95_s']:.4f} s, {result['rows_per_s']:,.0f} rows/s")
+        del df
+
+    report = {'environment': get_environment(), 'runs': args.runs, 'warmup': args.warmup, 'results': results}
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            compare_results(results_arg=results, baseline_arg=json.load(file)['results'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import numpy as np
+
+from modules import windowing, feature_engineering
+from benchmarks import synthetic_recordings, pipeline_benchmark
+
+
+# The feature families measured by the benchmark
+FEATURE_FAMILIES = {'statistical': feature_engineering.STATISTICAL_MEASURES,
+                    'spectral': feature_engineering.SPECTRAL_FEATURES,
+                    'jerk': feature_engineering.JERK_FEATURES,
+                    'sma': ['sma'],
+                    'all': feature_engineering.STATISTICAL_MEASURES + feature_engineering.SPECTRAL_FEATURES
+                    + feature_engineering.JERK_FEATURES + ['sma']}
+
+
+def get_windows(n_rows_arg, channels_arg, window_size_arg):
+    """Function for dividing a synthetic recording into the windows x samples x channels tensor
+    :param n_rows_arg: the number of rows of the synthetic recording
+    :param channels_arg: the channels divided into windows
+    :param window_size_arg: the number of data points within a window
+    :return: tuple (windows, sampling_frequency): windows - a contiguous float64 array of shape
+    (n_windows, window_size, len(channels_arg))
+    """
+    df = synthetic_recordings.get_synthetic_recording(n_rows_arg=n_rows_arg)
+    windows, _ = windowing.get_window_views(values_arg=df[channels_arg].to_numpy(dtype=np.float64),
+                                            window_size_arg=window_size_arg, step_size_arg=window_size_arg // 2)
+    return np.ascontiguousarray(windows), windowing.get_sampling_frequency(df_arg=df)
+
+
+def main():
+    """python -m benchmarks.spectral_feature_benchmark [--rows 1000000] [--channels accX accY ...] [--window-size 61]
+    [--families statistical spectral ...] [--runs 5] [--output results.json]
+    """
+    parser = argparse.ArgumentParser(description="Throughput of the batched feature families over the windows x "
+                                                 "samples x channels tensor")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="the number of rows of the synthetic recording")
+    parser.add_argument('--channels', nargs='+', default=windowing.DATA_CHANNELS,
+                        help="the channels divided into windows (e.g. accX accY accZ gyrX gyrY gyrZ)")
+    parser.add_argument('--window-size', type=int, default=61, help="the number of data points within a window "
+                                                                    "(61 is 2 seconds at about 30 Hz)")
+    parser.add_argument('--families', nargs='+', default=list(FEATURE_FAMILIES), choices=list(FEATURE_FAMILIES),
+                        help="the feature families to measure")
+    parser.add_argument('--runs', type=int, default=5, help="the number of measured runs")
+    parser.add_argument('--output', default=None, help="the JSON file for the results")
+    args = parser.parse_args()
+
+    windows, sampling_frequency = get_windows(n_rows_arg=args.rows, channels_arg=args.channels,
+                                              window_size_arg=args.window_size)
+    # The samples of all the windows and channels (the windows overlap by 50%, so each row is counted twice)
+    n_samples = windows.size
+    print(f"windows = {windows.shape[0]:,}, window size = {windows.shape[1]}, channels = {args.channels}, "
+          f"samples = {n_samples:,}, sampling frequency = {sampling_frequency:.2f} Hz")
+
+    results = []
+    for family in args.families:
+        feature_names = FEATURE_FAMILIES[family]
+        time_list = pipeline_benchmark.get_timings(
+            function_arg=lambda: feature_engineering.get_features(windows_arg=windows, feature_names_arg=feature_names,
+                                                                  sampling_frequency_arg=sampling_frequency),
+            number_of_runs_arg=args.runs)
+        result = {'family': family, 'n_features': len(feature_engineering.get_feature_columns(args.channels,
+                                                                                            feature_names)),
+                  **pipeline_benchmark.get_statistics(time_list_arg=time_list, n_rows_arg=n_samples)}
+        result['seconds_per_million_samples'] = result['median_s'] / n_samples * 1e6
+        results.append(result)
+        print(f"{family:>12}: {result['n_features']:>3} features, median = {result['median_s']:.4f} s, "
+              f"{result['seconds_per_million_samples'] * 1000:.2f} ms per million samples, "
+              f"{result['rows_per_s'] / 1e6:.1f}M samples/s")
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'environment': pipeline_benchmark.get_environment(), 'channels': args.channels,
+                       'window_size': args.window_size, 'n_windows': windows.shape[0], 'n_samples': n_samples,
+                       'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from modules import pipeline
+
+
+def get_synthetic_recording(n_rows_arg, seed_arg=0, period_arg=0.033, class_probabilities_arg=None):
+    """Function for generating a recording with the same columns as the device recordings
+    (timestamp,time,accX,accY,accZ,gyrX,gyrY,gyrZ,activity): the activities (including 'No activity') follow in segments
+    of 10 to 60 seconds, the signals are noisy oscillations whose frequency depends on the activity and the channel,
+    the measurement periods have a jitter of up to 10%, and about 1% of them are too long (so that the period filter
+    removes some measurements)
+    :param n_rows_arg: the number of measurements
+    :param seed_arg: the seed of the random generator
+    :param period_arg: the average measurement period in seconds
+    :param class_probabilities_arg: the probabilities of the activities of the segments ('No activity' first, then
+    pipeline.ACTIVITY_DICT); if None, the activities are equally likely
+    :return: the recording dataframe
+    """
+    rng = np.random.default_rng(seed_arg)
+    activities = np.array(['No activity'] + list(pipeline.ACTIVITY_DICT), dtype=object)
+
+    # Measurement times with jitter and occasional gaps
+    periods = period_arg * (1 + 0.1 * rng.uniform(-1, 1, size=n_rows_arg))
+    periods[0] = 0
+    periods[rng.random(n_rows_arg) < 0.01] *= 3
+    time = np.round(np.cumsum(periods), 3)
+
+    # Activity segments
+    segment_lengths = rng.integers(int(10 / period_arg), int(60 / period_arg), size=n_rows_arg // 300 + 1)
+    segment_classes = rng.choice(len(activities), size=len(segment_lengths), p=class_probabilities_arg)
+    classes = np.repeat(segment_classes, segment_lengths)[:n_rows_arg]
+
+    df = pd.DataFrame({'timestamp': 1_692_513_112_541 + np.round(time * 1000).astype(np.int64), 'time': time})
+    frequencies = 0.5 + 0.5 * classes
+    for channel, column in enumerate(pipeline.SENSOR_COLUMNS):
+        df[column] = (np.sin(2 * np.pi * frequencies * (1 + 0.31 * channel) * time)
+                      + 0.3 * rng.standard_normal(n_rows_arg) + (9.8 if column == 'accZ' else 0))
+    # The gyroscope X and Y axes are correlated with the accelerometer (as in the real recordings, where they are
+    # discarded after the correlation analysis)
+    df['gyrX'] += df['accX']
+    df['gyrY'] += df['accY']
+    df['activity'] = activities[classes]
+    return df
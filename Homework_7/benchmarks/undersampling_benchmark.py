@@ -0,0 +1,56 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from modules import exploratory_data_analysis
+from benchmarks import synthetic_recordings
+
+
+def get_undersampled_df_loop(df_arg, column_name_arg):
+    """The previous implementation of exploratory_data_analysis.get_undersampled_df (a boolean mask and a concatenation
+    per class), kept for comparison
+    """
+    min_samples = df_arg[column_name_arg].value_counts().min()
+    undersampled_df = pd.DataFrame()
+    for activity_class in df_arg[column_name_arg].unique():
+        class_subset = df_arg[df_arg[column_name_arg] == activity_class].iloc[:min_samples]
+        undersampled_df = pd.concat([undersampled_df, class_subset])
+    return undersampled_df
+
+
+def get_median_time(function_arg, number_of_runs_arg=3):
+    """Function for measuring the median execution time of function_arg
+    :return: the median time in seconds
+    """
+    times = []
+    for _ in range(number_of_runs_arg):
+        start_time = time.perf_counter()
+        function_arg()
+        times.append(time.perf_counter() - start_time)
+    return float(np.median(times))
+
+
+def main():
+    """python -m benchmarks.undersampling_benchmark [max_rows]
+    The previous implementation is measured up to 10 million rows
+    """
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000_000
+    n_rows = 100_000
+    while n_rows <= max_rows:
+        # Unequal class frequencies without 'No activity' (the classes of the model)
+        df = synthetic_recordings.get_synthetic_recording(n_rows_arg=n_rows,
+                                                          class_probabilities_arg=[0, 0.3, 0.25, 0.2, 0.15, 0.1])
+        new_time = get_median_time(lambda: exploratory_data_analysis.get_undersampled_df(df, 'activity'))
+        random_time = get_median_time(lambda: exploratory_data_analysis.get_undersampled_df(df, 'activity', 0))
+        line = f"{n_rows:>11,} rows: indices {new_time:.3f} s, random {random_time:.3f} s"
+        if n_rows <= 10_000_000:
+            loop_time = get_median_time(lambda: get_undersampled_df_loop(df, 'activity'), number_of_runs_arg=1)
+            line += f", loop {loop_time:.3f} s (x{loop_time / new_time:.1f})"
+        print(line)
+        n_rows = n_rows * 10 if n_rows * 10 <= max_rows or n_rows == max_rows else max_rows
+        del df
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sys
+import time
+
+from modules import batch_processing, feature_cache
+
+
+def main():
+    """Out-of-core preparation of the training data: python build_feature_cache.py <folder or glob of recordings>
+    <cache folder> [chunk_size]
+    The recordings are processed in chunks and their features are written to the cache, which
+    training_feed.get_training_datasets streams into tf.data without loading it into memory
+    """
+    filenames = batch_processing.get_recording_filenames(sys.argv[1])
+    cache_path = sys.argv[2]
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    if not filenames:
+        print(f"no recordings found: {sys.argv[1]}")
+        return
+
+    start_time = time.perf_counter()
+    meta = feature_cache.write_feature_cache(filenames_arg=filenames, cache_path_arg=cache_path,
+                                             chunk_size_arg=chunk_size)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"recordings = {len(filenames)}, windows = {meta['n_rows']}, features = {len(meta['feature_columns'])}, "
+          f"time = {elapsed_time:.3f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import numpy as np
+import pandas as pd
+
+from modules import pipeline, streaming, feature_engineering, windowing
+
+
+def get_pre_balancing_features_df(df_arg, window_duration_arg=2, median_window_size_arg=10,
+                                  feature_names_arg=feature_engineering.STATISTICAL_MEASURES,
+                                  channels_arg=windowing.DATA_CHANNELS):
+    """Function for performing the stages of pipeline.perform_pipeline before balancing (preprocessing -> column
+    selection -> windowing -> feature engineering) on the whole recording
+    :return: the features dataframe
+    """
+    results = pipeline.preprocessing_stage({'raw_df': df_arg}, median_window_size_arg=median_window_size_arg)
+    results.update(pipeline.column_selection_stage(results))
+    results.update(pipeline.windowing_stage(results, window_duration_arg=window_duration_arg,
+                                            balance_level_arg='rows', channels_arg=channels_arg))
+    results.update(pipeline.feature_engineering_stage(results, feature_names_arg=feature_names_arg,
+                                                      channels_arg=channels_arg))
+    return results['features_df']
+
+
+def main():
+    """Check that the streaming pipeline produces the same windows and features as the batch pipeline:
+    python check_stream_features.py <recording.csv> [chunk_size]
+    """
+    filename = sys.argv[1]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    feature_names = feature_engineering.STATISTICAL_MEASURES + feature_engineering.SPECTRAL_FEATURES \
+        + feature_engineering.JERK_FEATURES + ['sma']
+
+    batch_df = get_pre_balancing_features_df(df_arg=pd.read_csv(filename), feature_names_arg=feature_names)
+    stream_df = pd.concat(list(streaming.stream_features(filename=filename, chunk_size_arg=chunk_size,
+                                                         feature_names_arg=feature_names)), ignore_index=True)
+    feature_columns = [column for column in stream_df.columns if column != 'activity']
+    print(f"windows: batch = {len(batch_df)}, stream = {len(stream_df)}; parameters: "
+          f"{streaming.get_stream_parameters(filename=filename)}")
+    assert len(batch_df) == len(stream_df), "different numbers of windows"
+    assert (batch_df['activity'].astype(str).to_numpy() == stream_df['activity'].astype(str).to_numpy()).all(), \
+        "different window labels"
+    # Both pipelines filter float32 channels and calculate the features in float64, so the features are equal exactly
+    batch_values = batch_df[feature_columns].to_numpy(dtype=np.float64)
+    stream_values = stream_df[feature_columns].to_numpy(dtype=np.float64)
+    different = ~((batch_values == stream_values) | (np.isnan(batch_values) & np.isnan(stream_values)))
+    print(f"different feature values: {np.count_nonzero(different)}")
+    assert not different.any(), \
+        f"different features: {sorted({feature_columns[column] for column in np.flatnonzero(different.any(axis=0))})}"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
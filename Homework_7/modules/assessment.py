@@ -0,0 +1,29 @@
+import time
+
+from modules import instrumentation, pipeline
+
+
+def get_time_usage(df_arg, number_of_experiments=5):
+    """Function for measuring the execution time of the pipeline (instrumentation disabled, after one warm-up run)
+    :param df_arg: the recording dataframe
+    :param number_of_experiments: the number of measured runs
+    :return: a list of the execution times in seconds
+    """
+    pipeline.perform_pipeline(df_arg=df_arg)
+    time_list = []
+    for i in range(number_of_experiments):
+        start_time = time.perf_counter()
+        pipeline.perform_pipeline(df_arg=df_arg)
+        time_list.append(time.perf_counter() - start_time)
+    return time_list
+
+
+def get_pipeline_spans(df_arg, trace_memory=True):
+    """Function for running the pipeline once with the instrumentation enabled
+    :param df_arg: the recording dataframe
+    :param trace_memory: if True, the peak allocated memory of each stage is traced (this slows the run down)
+    :return: the dataframe of the spans (see instrumentation.Instrumentation.get_spans_df)
+    """
+    with instrumentation.Instrumentation(trace_memory=trace_memory) as pipeline_instrumentation:
+        pipeline.perform_pipeline(df_arg=df_arg)
+    return pipeline_instrumentation.get_spans_df()
@@ -0,0 +1,165 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pandas as pd
+
+from modules import recording_cache, exploratory_data_analysis, windowing, feature_engineering, pipeline
+
+
+def get_recording_filenames(path_arg):
+    """Function for finding the recording files
+    :param path_arg: a folder (all the CSV files in it are used) or a glob pattern
+    :return: a sorted list of the filenames
+    """
+    if os.path.isdir(path_arg):
+        path_arg = os.path.join(path_arg, '*.csv')
+    return sorted(glob.glob(path_arg))
+
+
+def get_recording_features_df(filename, median_window_size_arg=10, window_duration_arg=2,
+                              feature_names_arg=feature_engineering.STATISTICAL_MEASURES,
+                              channels_arg=windowing.DATA_CHANNELS):
+    """Function that performs the stages of the pipeline that depend only on one recording: reading (through the
+    recording cache), period filter, median filter, windowing and feature engineering
+    :param filename: the recording CSV file
+    :param median_window_size_arg: window size for the median filter
+    :param window_duration_arg: the duration of one window in seconds
+    :param feature_names_arg: a list of names of the registered features (feature_engineering.FEATURES)
+    :param channels_arg: the channels divided into windows (any of pipeline.SENSOR_COLUMNS)
+    :return: the features dataframe of the recording (the columns are the same as pipeline.perform_feature_engineering
+    returns)
+    """
+    df = recording_cache.read_recording(filename=filename)
+    df = pipeline.preprocess_df(df_arg=df, median_window_size_arg=median_window_size_arg)
+    windowed_df = windowing.get_windowed_df(df_arg=df, window_duration_arg=window_duration_arg,
+                                            channels_arg=channels_arg)
+    return pipeline.perform_feature_engineering(df_arg=windowed_df, feature_names_arg=feature_names_arg,
+                                                channels_arg=channels_arg,
+                                                sampling_frequency_arg=windowing.get_sampling_frequency(df_arg=df))
+
+
+def process_recording(filename, median_window_size_arg=10, window_duration_arg=2,
+                      feature_names_arg=feature_engineering.STATISTICAL_MEASURES, channels_arg=windowing.DATA_CHANNELS):
+    """Function for the worker processes: calculates the features of one recording and puts them into a new shared
+    memory block (a float32 matrix of the features followed by the int8 class numbers), so that only the name of the
+    block is sent back to the main process
+    :return: tuple (shared memory name, number of windows, feature columns); the block must be unlinked by the caller
+    """
+    features_df = get_recording_features_df(filename=filename, median_window_size_arg=median_window_size_arg,
+                                            window_duration_arg=window_duration_arg,
+                                            feature_names_arg=feature_names_arg, channels_arg=channels_arg)
+    feature_columns = [column for column in features_df.columns if column != 'activity']
+    n_windows = len(features_df)
+    features_size = n_windows * len(feature_columns) * np.dtype(np.float32).itemsize
+
+    shared_memory = SharedMemory(create=True, size=max(1, features_size + n_windows))
+    # The block belongs to the main process: otherwise the resource tracker of the worker unlinks it when the pool shuts
+    # down, before the main process has read it
+    resource_tracker.unregister(shared_memory._name, 'shared_memory')
+    features = np.ndarray((n_windows, len(feature_columns)), dtype=np.float32, buffer=shared_memory.buf)
+    for column_number, column in enumerate(feature_columns):
+        features[:, column_number] = features_df[column].to_numpy()
+    class_numbers = np.ndarray(n_windows, dtype=np.int8, buffer=shared_memory.buf, offset=features_size)
+    # The labels that are not classes of the model get -1
+    class_numbers[:] = pipeline.get_activity_numbers(features_df['activity'])
+    del features, class_numbers
+    shared_memory.close()
+    return shared_memory.name, n_windows, feature_columns
+
+
+def get_batch_features_df(filenames_arg, max_workers_arg=None, median_window_size_arg=10, window_duration_arg=2,
+                          feature_names_arg=feature_engineering.STATISTICAL_MEASURES,
+                          channels_arg=windowing.DATA_CHANNELS):
+    """Function for calculating the features of many recordings in parallel worker processes. The features of each
+    recording are passed back through shared memory and copied once into the common feature matrix
+    :param filenames_arg: a list of the recording CSV files
+    :param max_workers_arg: the number of worker processes (if None, the number of CPUs; if 0, the recordings are
+    processed in the main process)
+    :param median_window_size_arg: window size for the median filter
+    :param window_duration_arg: the duration of one window in seconds
+    :param feature_names_arg: a list of names of the registered features (feature_engineering.FEATURES)
+    :param channels_arg: the channels divided into windows (any of pipeline.SENSOR_COLUMNS)
+    :return: tuple (features_df, recordings): features_df - the features of all the recordings (in the order of the
+    files) with the 'activity' and 'activity_number' columns; recordings - an array of the file number of each row
+    """
+    parameters = {'median_window_size_arg': median_window_size_arg, 'window_duration_arg': window_duration_arg,
+                  'feature_names_arg': feature_names_arg, 'channels_arg': channels_arg}
+    if max_workers_arg == 0:
+        results = [process_recording(filename, **parameters) for filename in filenames_arg]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers_arg) as executor:
+            futures = [executor.submit(process_recording, filename, **parameters) for filename in filenames_arg]
+            try:
+                for future in futures:
+                    results.append(future.result())
+            except BaseException:
+                # The recordings that have not started are cancelled, and the running ones are waited for, so the
+                # blocks of all the recordings that have been processed are freed
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                for future in futures:
+                    if not future.cancelled() and future.exception() is None:
+                        shared_memory = SharedMemory(name=future.result()[0])
+                        shared_memory.close()
+                        shared_memory.unlink()
+                raise
+
+    feature_columns = results[0][2] if results else []
+    n_windows = [result[1] for result in results]
+    features = np.empty((sum(n_windows), len(feature_columns)), dtype=np.float32)
+    class_numbers = np.empty(sum(n_windows), dtype=np.int8)
+    start = 0
+    for name, n_rows, _ in results:
+        shared_memory = SharedMemory(name=name)
+        features_size = n_rows * len(feature_columns) * features.itemsize
+        features[start:start + n_rows] = np.ndarray((n_rows, len(feature_columns)), dtype=np.float32,
+                                                    buffer=shared_memory.buf)
+        class_numbers[start:start + n_rows] = np.ndarray(n_rows, dtype=np.int8, buffer=shared_memory.buf,
+                                                         offset=features_size)
+        shared_memory.close()
+        shared_memory.unlink()
+        start += n_rows
+
+    features_df = pd.DataFrame(features, columns=feature_columns, copy=False)
+    # The class numbers are the codes of the categorical labels (-1 gives a missing label)
+    features_df['activity'] = pd.Categorical.from_codes(class_numbers, categories=list(pipeline.ACTIVITY_DICT))
+    features_df['activity_number'] = class_numbers
+    recordings = np.repeat(np.arange(len(results)), n_windows)
+    return features_df, recordings
+
+
+def perform_batch_pipeline(filenames_arg, max_workers_arg=None, median_window_size_arg=10, window_duration_arg=2,
+                           feature_names_arg=feature_engineering.STATISTICAL_MEASURES, balance_arg=True,
+                           channels_arg=windowing.DATA_CHANNELS):
+    """Function that performs the pipeline on many recordings: the per-recording stages run in parallel, and the
+    balancing, the split and the scaling are performed once for the features of all the recordings
+    :param filenames_arg: a list of the recording CSV files
+    :param max_workers_arg: the number of worker processes (see get_batch_features_df)
+    :param median_window_size_arg: window size for the median filter
+    :param window_duration_arg: the duration of one window in seconds
+    :param feature_names_arg: a list of names of the registered features (feature_engineering.FEATURES)
+    :param balance_arg: if True, the windows are undersampled to the same number of each class
+    :param channels_arg: the channels divided into windows (any of pipeline.SENSOR_COLUMNS)
+    :return: dictionary: 'features_df', 'recordings', 'X_train', 'y_train', 'X_valid', 'y_valid', 'scaler'
+    """
+    features_df, recordings = get_batch_features_df(filenames_arg=filenames_arg, max_workers_arg=max_workers_arg,
+                                                    median_window_size_arg=median_window_size_arg,
+                                                    window_duration_arg=window_duration_arg,
+                                                    feature_names_arg=feature_names_arg,
+                                                    channels_arg=channels_arg)
+    # The windows of the labels that are not classes of the model are not used for training
+    features_df = features_df[features_df['activity_number'].to_numpy() >= 0]
+    if balance_arg:
+        features_df = exploratory_data_analysis.get_undersampled_df(df_arg=features_df, column_name_arg='activity')
+    # The index of the features dataframe is the position of the row in the features of all the recordings
+    recordings = recordings[features_df.index]
+
+    X_train, y_train, X_valid, y_valid, scaler = pipeline.model_training_data_preparation(df_arg=features_df,
+                                                                                         return_scaler_arg=True)
+    return {'features_df': features_df, 'recordings': recordings, 'X_train': X_train, 'y_train': y_train,
+            'X_valid': X_valid, 'y_valid': y_valid, 'scaler': scaler}
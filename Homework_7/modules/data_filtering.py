@@ -1,8 +1,13 @@
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
 
+from modules import plot_downsampling
 
-def get_three_axes_graph(df, y, x=None, title=None, x_label=None, y_label=None, filename=None):
+
+def get_three_axes_graph(df, y, x=None, title=None, x_label=None, y_label=None, filename=None,
+                         n_points=plot_downsampling.DEFAULT_N_POINTS):
     """ Function for creating a graph of three axes (X, Y, Z) of the measurement results of the device
     :param df: a dataframe containing the results of the device measurement
     :param y: the list containing the dataframe column names corresponding to the OX, OY, and OZ axis measurements,
@@ -14,18 +19,19 @@ def get_three_axes_graph(df, y, x=None, title=None, x_label=None, y_label=None,
     :param y_label: the name of the OY axis of the graph
     :param filename: the relative path where the file will be saved (with the file name, the file extension is not
     required) or just the filename
+    :param n_points: the maximum number of plotted points of each line (the lines are downsampled with min/max
+    bucketing; if None, all the points are plotted)
     :return: matplolib.figure object
     """
     fig = plt.figure(figsize=(12, 6))
     axes = fig.add_axes([0.1, 0.1, 1, 1])
-    if x is None:
-        axes.plot(df[y[0]], label='X')
-        axes.plot(df[y[1]], label='Y')
-        axes.plot(df[y[2]], label='Z')
-    else:
-        axes.plot(df[x], df[y[0]], label='X')
-        axes.plot(df[x], df[y[1]], label='Y', color='orange')
-        axes.plot(df[x], df[y[2]], label='Z', color='green')
+    x_values = df.index.to_numpy() if x is None else df[x].to_numpy()
+    # The default colours are kept for the graph without the OX column
+    colors = [None, None, None] if x is None else [None, 'orange', 'green']
+    for column, label, color in zip(y, ['X', 'Y', 'Z'], colors):
+        axes.plot(*plot_downsampling.get_downsampled_series(x_arg=x_values, y_arg=df[column].to_numpy(),
+                                                            n_points_arg=n_points),
+                  label=label, color=color)
 
     axes.set_title(title)
     axes.set_xlabel(x_label)
@@ -37,6 +43,93 @@ def get_three_axes_graph(df, y, x=None, title=None, x_label=None, y_label=None,
     return fig
 
 
+def get_running_median(values_arg, window_size_arg, block_size_arg=1024, out_arg=None):
+    """Function for calculating the centred running median of each column of an array in one pass over the whole block
+    of channels (the result is the same as rolling(window=window_size_arg, center=True, min_periods=1).median() of
+    each column, so the windows are truncated at the edges of the array). The data must not contain NaN values
+    :param values_arg: an array of shape (n_rows,) or (n_rows, n_channels)
+    :param window_size_arg: window size for the median filter
+    :param block_size_arg: the number of windows sorted at once (limits the memory used for the partial sorts)
+    :param out_arg: an array of the same shape as values_arg to write the result to (if None, a new array is created)
+    :return: an array of the same shape as values_arg (float32 for float32 data, float64 otherwise)
+    """
+    values = np.asarray(values_arg)
+    if values.dtype != np.float32:
+        values = np.asarray(values, dtype=np.float64)
+    result = np.empty(values.shape, dtype=values.dtype) if out_arg is None else out_arg
+    n_rows = len(values)
+    # The centred window of the row i contains the rows from i - left to i + right
+    left, right = window_size_arg // 2, (window_size_arg - 1) // 2
+    middle = window_size_arg // 2
+
+    if n_rows >= window_size_arg:
+        # Channels-first contiguous block, so that the data points of each window are adjacent in memory
+        channels = np.ascontiguousarray(values.reshape(n_rows, -1).T)
+        windows = sliding_window_view(channels, window_size_arg, axis=1)
+        core_result = result[left:n_rows - right]
+        if core_result.ndim == 1:
+            core_result = core_result[:, np.newaxis]
+        for start in range(0, windows.shape[1], block_size_arg):
+            # A partial sort of each window puts its middle value in place (the smaller values go to the left)
+            block = np.partition(windows[:, start:start + block_size_arg], middle, axis=-1)
+            if window_size_arg % 2:
+                median = block[..., middle]
+            else:
+                median = (block[..., :middle].max(axis=-1) + block[..., middle]) / 2
+            core_result[start:start + block.shape[1]] = median.T
+        edge_rows = list(range(left)) + list(range(n_rows - right, n_rows))
+    else:
+        edge_rows = range(n_rows)
+
+    # Truncated windows at the edges of the array
+    for row in edge_rows:
+        result[row] = np.median(values[max(0, row - left):row + right + 1], axis=0)
+    return result
+
+
+class RunningMedianFilter:
+    """Incremental (append-only) centred running median: the rows are returned as soon as the whole window around them
+    has been appended, and the result of all the appends and the final flush is the same as get_running_median of the
+    concatenated data
+    """
+
+    def __init__(self, window_size):
+        """
+        :param window_size: window size for the median filter
+        """
+        self.window_size = window_size
+        self.left, self.right = window_size // 2, (window_size - 1) // 2
+        self.buffer = None
+        self.n_context = 0  # the number of rows at the beginning of the buffer that have already been returned
+
+    def append(self, values_arg):
+        """Method for adding new rows
+        :param values_arg: an array of shape (n_rows,) or (n_rows, n_channels)
+        :return: the filtered values of the rows whose windows are complete (may be empty)
+        """
+        values = np.asarray(values_arg)
+        self.buffer = values if self.buffer is None else np.concatenate([self.buffer, values])
+        n_ready = max(len(self.buffer) - self.right, self.n_context)
+        filtered = get_running_median(self.buffer[:n_ready + self.right], self.window_size)[self.n_context:n_ready]
+
+        # Keep the rows needed as the left part of the windows of the rows that are not ready yet
+        context_start = max(0, n_ready - self.left)
+        self.buffer = self.buffer[context_start:]
+        self.n_context = n_ready - context_start
+        return filtered
+
+    def flush(self):
+        """Method for getting the filtered values of the last rows (their windows are truncated at the end)
+        :return: the filtered values of the rows that have not been returned yet
+        """
+        if self.buffer is None:
+            return np.empty(0)
+        filtered = get_running_median(self.buffer, self.window_size)[self.n_context:]
+        self.buffer = None
+        self.n_context = 0
+        return filtered
+
+
 def median_filter_data(df_arg, filter_columns_arg, window_size_arg):
     """Function to filter data using a median filter with a selected window of the specified columns of the transmitted
     dataframe
@@ -45,14 +138,13 @@ def median_filter_data(df_arg, filter_columns_arg, window_size_arg):
     :param window_size_arg: window size for the median filter
     :return: a dataframe that contains the filtered column values
     """
-    df = pd.DataFrame()
-    for column in filter_columns_arg:
-        # Apply median filtering to column data
-        df[f'{column}_filtered'] = df_arg[column].rolling(window=window_size_arg, center=True, min_periods=1).median()
-    return df
+    # Apply median filtering to the data of all the columns at once
+    filtered = get_running_median(df_arg[filter_columns_arg].to_numpy(), window_size_arg=window_size_arg)
+    return pd.DataFrame(filtered, index=df_arg.index, columns=[f'{column}_filtered' for column in filter_columns_arg])
 
 
-def get_raw_filtered_data_zoom_graph(df, x, y, x_lims, y_lims, title=None, x_label=None, y_label=None, filename=None, zoom_axes=None):
+def get_raw_filtered_data_zoom_graph(df, x, y, x_lims, y_lims, title=None, x_label=None, y_label=None, filename=None, zoom_axes=None,
+                                     n_points=plot_downsampling.DEFAULT_N_POINTS):
     """Function to get a graph that displays the raw and filtered data on a single graph with scaling to better display the filtering
     :param df: a dataframe containing the results of the device measurement
     :param x: the name of the column of the dataframe that contains the data for the OX axis of the graph
@@ -67,11 +159,20 @@ def get_raw_filtered_data_zoom_graph(df, x, y, x_lims, y_lims, title=None, x_lab
     required) or just the filename
     :param zoom_axes: the list containing the placement coordinates (x, y) and dimensions (width, height) of the smaller graph that contains the zoomed-in image for the specified limits (x_lims and y_lims)
     zoom_axes = [x, y, width, height]
+    :param n_points: the maximum number of plotted points of each line (the lines of the main graph are downsampled
+    with min/max bucketing, the zoomed-in graph gets the full-resolution data of its range; if None, all the points are
+    plotted)
     :return: matplotlib.figure object
     """
+    x_values = df[x].to_numpy()
+    raw_values = df[y[0]].to_numpy()
+    filtered_values = df[y[1]].to_numpy()
+
     fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(df[x], df[y[0]], label='Raw Data', color='green')
-    ax.plot(df[x], df[y[1]], label='Filtered_data', color='orange')
+    ax.plot(*plot_downsampling.get_downsampled_series(x_arg=x_values, y_arg=raw_values, n_points_arg=n_points),
+            label='Raw Data', color='green')
+    ax.plot(*plot_downsampling.get_downsampled_series(x_arg=x_values, y_arg=filtered_values, n_points_arg=n_points),
+            label='Filtered_data', color='orange')
     plt.xlabel(x_label)
     plt.ylabel(y_label)
     plt.title(title)
@@ -82,8 +183,14 @@ def get_raw_filtered_data_zoom_graph(df, x, y, x_lims, y_lims, title=None, x_lab
         inset_ax = fig.add_axes(zoom_axes)
     else:
         inset_ax = fig.add_axes([0.25, 0.20, 0.20, 0.20])
-    inset_ax.plot(df[x], df[y[0]], label='Raw Data', color='green')
-    inset_ax.plot(df[x], df[y[1]], label='Filtered_data', color='orange')
+    # Only the rows of the zoomed-in range are plotted (the time column is sorted)
+    zoom_rows = plot_downsampling.get_range_slice(x_arg=x_values, x_min_arg=x_lims[0], x_max_arg=x_lims[1])
+    inset_ax.plot(*plot_downsampling.get_downsampled_series(x_arg=x_values[zoom_rows], y_arg=raw_values[zoom_rows],
+                                                            n_points_arg=n_points),
+                  label='Raw Data', color='green')
+    inset_ax.plot(*plot_downsampling.get_downsampled_series(x_arg=x_values[zoom_rows],
+                                                            y_arg=filtered_values[zoom_rows], n_points_arg=n_points),
+                  label='Filtered_data', color='orange')
     inset_ax.set_xlim(x_lims[0], x_lims[1])
     inset_ax.set_ylim(y_lims[0], y_lims[1])
     inset_ax.set_title('zoom near origin')
@@ -4,6 +4,28 @@ from modules import display_df
 from modules import frequency_stability
 from modules import data_filtering
 from modules import exploratory_data_analysis, windowing
+from modules import figure_cache, stage_cache
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Function for getting the cache of the rendered figures shared by all the reruns and sessions of the app
+    :return: stage_cache.StageCache (in memory only)
+    """
+    return stage_cache.StageCache(max_items=256, max_bytes=256 << 20)
+
+
+def show_figure(figure_function_arg, data_key_arg=None, **kwargs):
+    """Function to display a figure on the Streamlit page: the figure is rendered to PNG once for the same data and
+    parameters, and the following reruns of the page display the cached image
+    :param figure_function_arg: the function that creates the figure
+    :param data_key_arg: the key of the plotted data (if None, the figure is rendered on every rerun)
+    :param kwargs: the keyword arguments of figure_function_arg
+    :return: None
+    """
+    st.image(figure_cache.get_figure_png(figure_function_arg, data_key_arg=data_key_arg, cache_arg=get_figure_cache(),
+                                         **kwargs),
+             use_column_width=True)
 
 
 def show_freq_info(df_arg, column_name_arg):
@@ -20,77 +42,95 @@ def show_freq_info(df_arg, column_name_arg):
             f"{frequency_stability.get_avg_frequency(df_arg, column_name_arg):.3f} Hz")
 
 
-def show_freq_stability(df_arg, column_name_arg='time'):
+def show_freq_stability(df_arg, column_name_arg='time', data_key_arg=None):
     """Function for displaying the results of the 'Exploring measurement period and frequency stability' stage
     :param df_arg: the original dataframe, which contains all the necessary information
     :param column_name_arg: the name of the column that contains information about the time of the measurements
     (e.g., the 'time' column)
+    :param data_key_arg: the key of df_arg for the cache of the rendered figures (if None, the figures are not cached)
     :return: None
     """
     st.write("##### Exploring measurement period and frequency stability")
     time_diffs = df_arg[column_name_arg].diff()
     avg_period = time_diffs.mean()
-    st.pyplot(frequency_stability.get_stability_graph(time_diffs.values,
-                                                      title=f"Stability of Data Collection (Raw Data)\nAverage "
-                                                            f"frequency: "
-                                                            f"{1.0 / avg_period:.3f} Hz"))
-    st.pyplot(frequency_stability.get_stability_graph(time_diffs.values[time_diffs.values <= avg_period * 1.5],
-                                                      zoom_near_origin=False,
-                                                      title=f"Stability of Data Collection (Filtered Data)\n"
-                                                            f"Average frequency: "
-                                                            f"{1.0 / avg_period:.3f} Hz"))
-
-
-def show_filtering_results(df_arg):
+    show_figure(frequency_stability.get_stability_graph, data_key_arg=data_key_arg,
+                time_diffs_arg=time_diffs.values,
+                title=f"Stability of Data Collection (Raw Data)\nAverage "
+                      f"frequency: "
+                      f"{1.0 / avg_period:.3f} Hz")
+    show_figure(frequency_stability.get_stability_graph, data_key_arg=data_key_arg,
+                time_diffs_arg=time_diffs.values[time_diffs.values <= avg_period * 1.5],
+                zoom_near_origin=False,
+                title=f"Stability of Data Collection (Filtered Data)\n"
+                      f"Average frequency: "
+                      f"{1.0 / avg_period:.3f} Hz")
+
+
+def show_filtering_results(df_arg, data_key_arg=None):
+    """Function for displaying the results of the 'Data Filtering' stage (the graphs are rendered only when their
+    checkboxes are selected)
+    :param df_arg: the dataframe with the raw and the filtered columns
+    :param data_key_arg: the key of df_arg for the cache of the rendered figures (if None, the figures are not cached)
+    :return: None
+    """
     if st.checkbox("Display raw data"):
-        st.pyplot(data_filtering.get_three_axes_graph(df=df_arg,
-                                                      x='time',
-                                                      y=['accX', 'accY', 'accZ'],
-                                                      title='Time Dependence of Linear Acceleration (Raw Data)',
-                                                      x_label='Time, s',
-                                                      y_label='Linear acceleration, m/s^2'))
-        st.pyplot(data_filtering.get_three_axes_graph(df=df_arg,
-                                                      x='time',
-                                                      y=['gyrX', 'gyrY', 'gyrZ'],
-                                                      title='Time Dependence of Angular Velocity (Raw Data)',
-                                                      x_label='Time, s',
-                                                      y_label='Angular velocity, rad/s'))
-    st.pyplot(data_filtering.get_three_axes_graph(df=df_arg,
-                                                  x='time',
-                                                  y=['accX_filtered', 'accY_filtered', 'accZ_filtered'],
-                                                  title='Time Dependence of Linear Acceleration (Filtered Data)',
-                                                  x_label='Time, s',
-                                                  y_label='Linear acceleration, m/s^2'))
-    st.pyplot(data_filtering.get_three_axes_graph(df=df_arg,
-                                                  x='time',
-                                                  y=['gyrX_filtered', 'gyrY_filtered', 'gyrZ_filtered'],
-                                                  title='Time Dependence of Angular Velocity (Filtered Data)',
-                                                  x_label='Time, s',
-                                                  y_label='Angular velocity, rad/s'))
+        show_figure(data_filtering.get_three_axes_graph, data_key_arg=data_key_arg,
+                    df=df_arg,
+                    x='time',
+                    y=['accX', 'accY', 'accZ'],
+                    title='Time Dependence of Linear Acceleration (Raw Data)',
+                    x_label='Time, s',
+                    y_label='Linear acceleration, m/s^2')
+        show_figure(data_filtering.get_three_axes_graph, data_key_arg=data_key_arg,
+                    df=df_arg,
+                    x='time',
+                    y=['gyrX', 'gyrY', 'gyrZ'],
+                    title='Time Dependence of Angular Velocity (Raw Data)',
+                    x_label='Time, s',
+                    y_label='Angular velocity, rad/s')
+    if st.checkbox("Display filtered data"):
+        show_figure(data_filtering.get_three_axes_graph, data_key_arg=data_key_arg,
+                    df=df_arg,
+                    x='time',
+                    y=['accX_filtered', 'accY_filtered', 'accZ_filtered'],
+                    title='Time Dependence of Linear Acceleration (Filtered Data)',
+                    x_label='Time, s',
+                    y_label='Linear acceleration, m/s^2')
+        show_figure(data_filtering.get_three_axes_graph, data_key_arg=data_key_arg,
+                    df=df_arg,
+                    x='time',
+                    y=['gyrX_filtered', 'gyrY_filtered', 'gyrZ_filtered'],
+                    title='Time Dependence of Angular Velocity (Filtered Data)',
+                    x_label='Time, s',
+                    y_label='Angular velocity, rad/s')
     if st.checkbox("Consider the implications of data filtering"):
-        st.pyplot(data_filtering.get_raw_filtered_data_zoom_graph(df=df_arg,
-                                                                  x='time',
-                                                                  y=['accX', 'accX_filtered'],
-                                                                  x_lims=[14, 20],
-                                                                  y_lims=[-1.5, 1.5],
-                                                                  x_label='Time, s',
-                                                                  y_label='Linear acceleration, m/s^2',
-                                                                  title='Accelerometer OX: Raw vs Filtered',
-                                                                  zoom_axes=[0.18, 0.18, 0.15, 0.15]
-                                                                  ))
-
-
-def show_data_analysis_results(df_arg, corr_matrix_arg, discard_columns_arg):
+        show_figure(data_filtering.get_raw_filtered_data_zoom_graph, data_key_arg=data_key_arg,
+                    df=df_arg,
+                    x='time',
+                    y=['accX', 'accX_filtered'],
+                    x_lims=[14, 20],
+                    y_lims=[-1.5, 1.5],
+                    x_label='Time, s',
+                    y_label='Linear acceleration, m/s^2',
+                    title='Accelerometer OX: Raw vs Filtered',
+                    zoom_axes=[0.18, 0.18, 0.15, 0.15]
+                    )
+
+
+def show_data_analysis_results(df_arg, corr_matrix_arg, discard_columns_arg, data_key_arg=None):
     st.info("Results of undersampling")
     activity_counts = df_arg['activity'].value_counts()
+    # The categories without rows are not shown
+    activity_counts = activity_counts[activity_counts > 0]
     st.write(activity_counts)
     if st.checkbox("View correlation matrix"):
-        st.pyplot(exploratory_data_analysis.get_correlation_matrix(corr_matrix_df_arg=corr_matrix_arg))
+        show_figure(exploratory_data_analysis.get_correlation_matrix, data_key_arg=data_key_arg,
+                    corr_matrix_df_arg=corr_matrix_arg)
         st.write(f"discard_columns = {discard_columns_arg}")
     display_df.display_df_info(df_arg=df_arg, title_arg="##### filtered_df info")
 
 
-def show_train_spliting_results(X_train_arg, y_train_arg, X_valid_arg, y_valid_arg):
+def show_train_spliting_results(X_train_arg, y_train_arg, X_valid_arg, y_valid_arg, data_key_arg=None):
     display_df.display_df_info(df_arg=X_train_arg, title_arg="##### X_train info")
     st.write(f"len(y_train) = {len(y_train_arg)}")
 
@@ -104,6 +144,7 @@ def show_train_spliting_results(X_train_arg, y_train_arg, X_valid_arg, y_valid_a
     valid_df = X_valid_arg.copy()
     valid_df['activity_number'] = y_valid_arg
 
-    st.pyplot(windowing.get_pie_charts(first_df=train_df, second_df=valid_df, column='activity_number',
-                                       first_chart_title='Train_df class label distribution',
-                                       second_chart_title='Validation_df class label distribution'))
\ No newline at end of file
+    show_figure(windowing.get_pie_charts, data_key_arg=data_key_arg,
+                first_df=train_df, second_df=valid_df, column='activity_number',
+                first_chart_title='Train_df class label distribution',
+                second_chart_title='Validation_df class label distribution')
\ No newline at end of file
@@ -1,21 +1,85 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 
-def get_undersampled_df(df_arg, column_name_arg):
-    # First, calculate the minimum number of samples across all classes
-    min_samples = df_arg[column_name_arg].value_counts().min()
+def get_class_indices(labels_arg):
+    """Function for grouping the row positions by class in one pass over the labels
+    :param labels_arg: an array (or a Series) of the class labels of the rows (rows without a label are ignored)
+    :return: tuple (classes, class_indices): classes - the class labels in the order of their first appearance;
+    class_indices - a list of arrays of the row positions of each class (in the original order of the rows)
+    """
+    codes, classes = pd.factorize(labels_arg)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=len(classes))
+    # Rows without a label (code -1) are sorted first
+    order = order[len(codes) - counts.sum():]
+    return classes, np.split(order, np.cumsum(counts)[:-1])
 
-    # Initialize an empty DataFrame to store the undersampled data
-    undersampled_df = pd.DataFrame()
 
-    # Loop through each unique activity class and select the first min_samples for each class
-    for activity_class in df_arg[column_name_arg].unique():
-        class_subset = df_arg[df_arg[column_name_arg] == activity_class].iloc[:min_samples]
-        undersampled_df = pd.concat([undersampled_df, class_subset])
+def get_sample_indices(indices_arg, n_samples_arg, rng_arg=None):
+    """Function for selecting n_samples_arg row positions of one class
+    :param indices_arg: an array of the row positions of the class
+    :param n_samples_arg: the number of positions to select
+    :param rng_arg: np.random.Generator for random selection (if None, the first positions are selected; if there
+    are fewer positions than required, they are repeated cyclically)
+    :return: an array of the selected row positions (in the original order of the rows, if the class is not
+    oversampled)
+    """
+    if n_samples_arg <= len(indices_arg):
+        if rng_arg is None:
+            return indices_arg[:n_samples_arg]
+        return np.sort(rng_arg.choice(indices_arg, size=n_samples_arg, replace=False))
+    if rng_arg is None:
+        return np.resize(indices_arg, n_samples_arg)
+    # All the rows of the class and the missing number of randomly repeated rows
+    return np.concatenate([indices_arg, rng_arg.choice(indices_arg, size=n_samples_arg - len(indices_arg))])
 
-    return undersampled_df
+
+def get_balanced_df(df_arg, column_name_arg, n_samples_function_arg, random_state_arg=None):
+    """Function for getting a dataframe with the same number of rows of each class
+    :param df_arg: the dataframe to balance
+    :param column_name_arg: the name of the column that contains the class labels
+    :param n_samples_function_arg: the function that gets the list of the class sizes and returns the number of rows of
+    each class in the result (e.g. min or max)
+    :param random_state_arg: the seed for random selection of the rows (if None, the first rows of each class are
+    selected)
+    :return: the balanced dataframe (the classes follow in the order of their first appearance)
+    """
+    classes, class_indices = get_class_indices(df_arg[column_name_arg])
+    if not class_indices:
+        return df_arg.iloc[:0]
+    n_samples = n_samples_function_arg([len(indices) for indices in class_indices])
+    rng = None if random_state_arg is None else np.random.default_rng(random_state_arg)
+    indices = np.concatenate([get_sample_indices(indices_arg=indices, n_samples_arg=n_samples, rng_arg=rng)
+                              for indices in class_indices])
+    # All the selected rows are gathered at once
+    return df_arg.take(indices)
+
+
+def get_undersampled_df(df_arg, column_name_arg, random_state_arg=None):
+    """Function for undersampling: each class keeps as many rows as the smallest class has
+    :param df_arg: the dataframe to balance
+    :param column_name_arg: the name of the column that contains the class labels
+    :param random_state_arg: the seed for random selection of the rows (if None, the first rows of each class are
+    kept)
+    :return: the undersampled dataframe
+    """
+    return get_balanced_df(df_arg=df_arg, column_name_arg=column_name_arg, n_samples_function_arg=min,
+                           random_state_arg=random_state_arg)
+
+
+def get_oversampled_df(df_arg, column_name_arg, random_state_arg=None):
+    """Function for oversampling: the rows of each class are repeated until it has as many rows as the largest class
+    :param df_arg: the dataframe to balance
+    :param column_name_arg: the name of the column that contains the class labels
+    :param random_state_arg: the seed for random selection of the repeated rows (if None, the rows of each class are
+    repeated cyclically)
+    :return: the oversampled dataframe
+    """
+    return get_balanced_df(df_arg=df_arg, column_name_arg=column_name_arg, n_samples_function_arg=max,
+                           random_state_arg=random_state_arg)
 
 
 def get_correlation_matrix(corr_matrix_df_arg, filename=None):
@@ -31,26 +95,127 @@ def get_correlation_matrix(corr_matrix_df_arg, filename=None):
     return fig
 
 
-def get_discard_columns(corr_matrix_arg, important_columns_arg, df_arg):
-
-    columns_to_discard = set()
-    for column in corr_matrix_arg.columns:
-        correlated_columns = corr_matrix_arg.index[
-            (corr_matrix_arg[column] > 0.5) | (corr_matrix_arg[column] < -0.5)
-            ]
-
-        for correlated_column in correlated_columns:
-            if column != correlated_column:
-                # Prioritize which column to keep based on your criteria
-                # For example, keep the column with higher variance
-                if column not in important_columns_arg:
-                    columns_to_discard.add(column)
-                elif (column in important_columns_arg) and (correlated_column in important_columns_arg):
-                    pass
-                elif (column in important_columns_arg) and (correlated_column not in important_columns_arg):
-                    columns_to_discard.add(correlated_column)
-                else:  # both columns are not in important_columns
-                    columns_to_discard.add(
-                        correlated_column if df_arg[correlated_column].var() < df_arg[column].var() else column)
-
-    return columns_to_discard
+class CorrelationAccumulator:
+    """Single-pass accumulator of the means and the covariance matrix of several columns: the chunks of the data are
+    added one by one (the statistics of each chunk are merged with the accumulated ones as in the parallel algorithm
+    of Chan et al.), so the correlation matrix of data that does not fit into memory can be calculated. The data must
+    not contain NaN values
+    """
+
+    def __init__(self, columns):
+        """
+        :param columns: a list of the names of the columns
+        """
+        self.columns = list(columns)
+        self.n_rows = 0
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros((len(self.columns), len(self.columns)))  # the sums of the products of the deviations
+
+    def update(self, values_arg):
+        """Method for adding a chunk of the data
+        :param values_arg: an array of shape (n_rows, n_columns) or a dataframe with the columns
+        :return: None
+        """
+        if isinstance(values_arg, pd.DataFrame):
+            values_arg = values_arg[self.columns].to_numpy(dtype=np.float64)
+        values = np.asarray(values_arg, dtype=np.float64)
+        n_chunk_rows = len(values)
+        if not n_chunk_rows:
+            return
+        chunk_mean = values.mean(axis=0)
+        deviations = values - chunk_mean
+        chunk_m2 = deviations.T @ deviations
+
+        n_rows = self.n_rows + n_chunk_rows
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + np.outer(delta, delta) * (self.n_rows * n_chunk_rows / n_rows)
+        self.mean += delta * (n_chunk_rows / n_rows)
+        self.n_rows = n_rows
+
+    def get_covariance(self):
+        """Method for getting the sample covariance matrix (ddof=1, as DataFrame.cov calculates it)
+        :return: an array of shape (n_columns, n_columns)
+        """
+        if self.n_rows < 2:
+            return np.full_like(self.m2, np.nan)
+        return self.m2 / (self.n_rows - 1)
+
+    def get_variances(self):
+        """Method for getting the sample variances of the columns
+        :return: Series indexed by the column names
+        """
+        return pd.Series(np.diag(self.get_covariance()).copy(), index=self.columns)
+
+    def get_correlation_df(self):
+        """Method for getting the Pearson correlation matrix
+        :return: dataframe indexed by the column names (as DataFrame.corr returns it)
+        """
+        covariance = self.get_covariance()
+        std = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.clip(covariance / np.outer(std, std), -1, 1)
+        # A non-constant column is exactly correlated with itself
+        correlation[np.diag_indices_from(correlation)] = np.where(std > 0, 1.0, np.nan)
+        return pd.DataFrame(correlation, index=self.columns, columns=self.columns)
+
+
+def get_correlation_accumulator(df_arg, columns_arg, chunk_size_arg=1_000_000):
+    """Function for calculating the correlation statistics of the columns of a dataframe in one pass over its chunks
+    :param df_arg: the dataframe
+    :param columns_arg: a list of the columns
+    :param chunk_size_arg: the number of rows converted to a float64 array at once
+    :return: CorrelationAccumulator (its get_correlation_df() gives the same matrix as df_arg[columns_arg].corr() for
+    data without NaN values)
+    """
+    accumulator = CorrelationAccumulator(columns=columns_arg)
+    for start in range(0, len(df_arg), chunk_size_arg):
+        # The rows are sliced first, so only the chunk of the columns is copied
+        accumulator.update(df_arg.iloc[start:start + chunk_size_arg][columns_arg])
+    return accumulator
+
+
+def get_discard_mask(correlation_arg, important_arg, variances_arg, threshold_arg=0.5):
+    """Function for choosing the channels to discard: a channel is discarded if its absolute correlation with an
+    important channel exceeds threshold_arg; of two correlated channels that are not important the one with the lower
+    variance is discarded (the pairs are resolved greedily in the order of the upper triangle of the correlation
+    matrix, and a pair is skipped if one of its channels has already been discarded). The important channels are never
+    discarded
+    :param correlation_arg: the correlation matrix (an array of shape (n_channels, n_channels))
+    :param important_arg: a boolean array that marks the important channels
+    :param variances_arg: an array of the variances of the channels
+    :param threshold_arg: the threshold of the absolute correlation
+    :return: a boolean array that marks the channels to discard
+    """
+    important = np.asarray(important_arg, dtype=bool)
+    variances = np.asarray(variances_arg)
+    # NaN correlations (constant channels) do not exceed the threshold
+    correlated = np.abs(np.asarray(correlation_arg)) > threshold_arg
+    np.fill_diagonal(correlated, False)
+
+    discard = ~important & correlated[:, important].any(axis=1)
+    candidates = ~important & ~discard
+    for first, second in np.argwhere(np.triu(correlated & candidates[:, np.newaxis] & candidates, k=1)):
+        if discard[first] or discard[second]:
+            continue
+        # The channel with the lower variance is discarded (the second one if the variances are equal)
+        discard[first if variances[first] < variances[second] else second] = True
+    return discard
+
+
+def get_discard_columns(corr_matrix_arg, important_columns_arg, df_arg, variances_arg=None, threshold_arg=0.5):
+    """Function for choosing the columns to discard after the correlation analysis (see get_discard_mask)
+    :param corr_matrix_arg: the correlation matrix dataframe
+    :param important_columns_arg: a list of the columns that are never discarded
+    :param df_arg: the dataframe whose columns are analysed (used for the variances if variances_arg is None)
+    :param variances_arg: a Series of the variances of the columns (e.g. CorrelationAccumulator.get_variances())
+    :param threshold_arg: the threshold of the absolute correlation
+    :return: the set of the names of the columns to discard
+    """
+    columns = list(corr_matrix_arg.columns)
+    if variances_arg is None:
+        variances_arg = df_arg[columns].var()
+    discard = get_discard_mask(correlation_arg=corr_matrix_arg.loc[columns, columns].to_numpy(),
+                               important_arg=np.isin(columns, list(important_columns_arg)),
+                               variances_arg=pd.Series(variances_arg)[columns].to_numpy(),
+                               threshold_arg=threshold_arg)
+    return {column for column, discarded in zip(columns, discard) if discarded}
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from modules import streaming, pipeline
+
+
+# The version of the layout of the feature cache (the caches of other versions must be written again; the caches of
+# version 1 used windows and sampling frequencies that differed from the batch pipeline)
+FEATURE_CACHE_VERSION = 2
+
+
+def write_feature_cache(filenames_arg, cache_path_arg, window_duration_arg=2, median_window_size_arg=10,
+                        chunk_size_arg=100_000):
+    """Function for writing the features of the windows of many recordings to disk without keeping them in memory: the
+    recordings are processed in chunks by streaming.stream_features, and the feature rows are appended to a raw float32
+    file as the windows are completed (the class numbers go to a separate int8 file)
+    :param filenames_arg: a list of the recording CSV files
+    :param cache_path_arg: the folder of the feature cache (it is replaced)
+    :param window_duration_arg: the duration of one window in seconds
+    :param median_window_size_arg: window size for the median filter
+    :param chunk_size_arg: the number of rows read from a recording at once
+    :return: the metadata of the cache (see load_feature_cache)
+    """
+    # The cache is written to a temporary folder and renamed, so a reader never sees a partial cache
+    temp_path = f'{cache_path_arg}.tmp{os.getpid()}'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    feature_columns = None
+    n_rows = 0
+    recording_rows = []
+    recording_parameters = []
+    with open(os.path.join(temp_path, 'features.f32'), 'wb') as features_file, \
+            open(os.path.join(temp_path, 'labels.i8'), 'wb') as labels_file:
+        for filename in filenames_arg:
+            n_recording_rows = 0
+            # The same windows and sampling frequency as the batch pipeline finds for the recording
+            parameters = streaming.get_stream_parameters(filename=filename, window_duration_arg=window_duration_arg,
+                                                         chunk_size_arg=chunk_size_arg)
+            recording_parameters.append({'window_size': int(parameters['window_size']),
+                                         'max_period': float(parameters['max_period']),
+                                         'sampling_frequency': float(parameters['sampling_frequency'])})
+            for features_df in streaming.stream_features(filename=filename, window_duration_arg=window_duration_arg,
+                                                         window_size_arg=parameters['window_size'],
+                                                         max_period_arg=parameters['max_period'],
+                                                         sampling_frequency_arg=parameters['sampling_frequency'],
+                                                         median_window_size_arg=median_window_size_arg,
+                                                         chunk_size_arg=chunk_size_arg):
+                # The windows of the labels that are not classes of the model are not used for training
+                class_numbers = pipeline.get_activity_numbers(features_df['activity'])
+                features_df = features_df[class_numbers >= 0]
+                class_numbers = class_numbers[class_numbers >= 0]
+                if feature_columns is None:
+                    feature_columns = [column for column in features_df.columns if column != 'activity']
+                features_file.write(features_df[feature_columns].to_numpy(dtype=np.float32).tobytes())
+                labels_file.write(class_numbers.tobytes())
+                n_recording_rows += len(class_numbers)
+            recording_rows.append(n_recording_rows)
+            n_rows += n_recording_rows
+
+    meta = {'version': FEATURE_CACHE_VERSION, 'n_rows': n_rows, 'feature_columns': feature_columns or [],
+            'classes': list(pipeline.ACTIVITY_DICT), 'recordings': list(filenames_arg),
+            'recording_rows': recording_rows, 'recording_parameters': recording_parameters,
+            'window_duration': window_duration_arg, 'median_window_size': median_window_size_arg}
+    with open(os.path.join(temp_path, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    shutil.rmtree(cache_path_arg, ignore_errors=True)
+    os.replace(temp_path, cache_path_arg)
+    return meta
+
+
+def load_feature_cache(cache_path_arg):
+    """Function for opening a feature cache without reading it into memory
+    :param cache_path_arg: the folder of the feature cache
+    :return: tuple (features, labels, meta): features - a read-only memory-mapped float32 array of shape
+    (n_rows, n_features); labels - a memory-mapped int8 array of the class numbers; meta - the dictionary with the
+    'n_rows', 'feature_columns', 'classes', 'recordings', 'recording_rows' and 'recording_parameters' (the
+    'window_size', 'max_period' and 'sampling_frequency' used for each recording, see streaming.get_stream_parameters)
+    keys
+    """
+    with open(os.path.join(cache_path_arg, 'meta.json')) as file:
+        meta = json.load(file)
+    if meta['version'] != FEATURE_CACHE_VERSION:
+        raise ValueError(f"The feature cache {cache_path_arg} has version {meta['version']}, expected "
+                         f"{FEATURE_CACHE_VERSION}")
+    n_features = len(meta['feature_columns'])
+    if not meta['n_rows']:
+        return np.empty((0, n_features), dtype=np.float32), np.empty(0, dtype=np.int8), meta
+    features = np.memmap(os.path.join(cache_path_arg, 'features.f32'), dtype=np.float32, mode='r',
+                         shape=(meta['n_rows'], n_features))
+    labels = np.memmap(os.path.join(cache_path_arg, 'labels.i8'), dtype=np.int8, mode='r', shape=(meta['n_rows'],))
+    return features, labels, meta
+
+
+def get_streaming_scaler(features_arg, indices_arg=None, chunk_size_arg=65_536):
+    """Function for fitting the scaler of the features in one pass over the chunks of the rows: the mean and the
+    variance of each chunk are merged with the accumulated ones (StandardScaler.partial_fit performs the chunked Welford
+    update of Chan et al. in float64), so only one chunk is in memory at once
+    :param features_arg: an array (e.g. memory-mapped) of shape (n_rows, n_features)
+    :param indices_arg: the positions of the rows to fit the scaler to (if None, all the rows)
+    :param chunk_size_arg: the number of rows read at once
+    :return: the fitted StandardScaler (the same mean_, var_ and scale_ as StandardScaler().fit of the rows)
+    """
+    scaler = StandardScaler()
+    if indices_arg is None:
+        for start in range(0, len(features_arg), chunk_size_arg):
+            scaler.partial_fit(np.asarray(features_arg[start:start + chunk_size_arg], dtype=np.float64))
+        return scaler
+    # The rows are read in the order of their positions, so the file is read sequentially
+    indices = np.sort(indices_arg)
+    for start in range(0, len(indices), chunk_size_arg):
+        scaler.partial_fit(np.asarray(features_arg[indices[start:start + chunk_size_arg]], dtype=np.float64))
+    return scaler
+
+
+def get_batch(features_arg, labels_arg, indices_arg, mean_arg, scale_arg):
+    """Function for reading one batch of the scaled feature rows
+    :param features_arg: an array (e.g. memory-mapped) of shape (n_rows, n_features)
+    :param labels_arg: an array of the class numbers of the rows
+    :param indices_arg: the positions of the rows of the batch
+    :param mean_arg: the mean of each feature (the mean_ of the fitted scaler)
+    :param scale_arg: the scale of each feature (the scale_ of the fitted scaler)
+    :return: tuple (X, y): X - a float32 array of shape (len(indices_arg), n_features); y - an int32 array of the
+    class numbers (sparse labels)
+    """
+    X = np.asarray(features_arg[indices_arg], dtype=np.float32)
+    X -= mean_arg
+    X /= scale_arg
+    return X, np.asarray(labels_arg[indices_arg], dtype=np.int32)
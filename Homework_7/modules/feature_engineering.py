@@ -1,6 +1,49 @@
+import numpy as np
 import pandas as pd
 
 
+# Registered intermediates: name -> (function, names of the intermediates passed to the function as arguments).
+# 'windows' is not registered: it is the windows x samples x channels array the features are calculated for
+INTERMEDIATES = {}
+# Registered features: name -> (function, names of the intermediates passed to the function as arguments).
+# Each function returns an array of shape (n_windows, n_channels)
+FEATURES = {}
+# The names of the registered features calculated across all the channels (their functions return an array of shape
+# (n_windows,), and the output dataframe has one column named as the feature)
+ACROSS_CHANNEL_FEATURES = set()
+
+
+def register_intermediate(name, dependencies=('windows',)):
+    """Decorator for registering a function that calculates an intermediate result shared by several features (for
+    example, the sorted windows). The intermediate is calculated only once per batch of windows
+    :param name: the name of the intermediate
+    :param dependencies: the names of the intermediates (or 'windows') the function takes as arguments
+    :return: decorator
+    """
+    def decorator(function):
+        INTERMEDIATES[name] = (function, tuple(dependencies))
+        return function
+    return decorator
+
+
+def register_feature(name, intermediates=('windows',), across_channels=False):
+    """Decorator for registering a function that calculates a feature of each channel of each window
+    :param name: the name of the feature (the suffix of the output dataframe column name)
+    :param intermediates: the names of the intermediates (or 'windows', or 'sampling_frequency') the function takes as
+    arguments
+    :param across_channels: if True, the function calculates one value of each window from all its channels
+    :return: decorator
+    """
+    def decorator(function):
+        FEATURES[name] = (function, tuple(intermediates))
+        if across_channels:
+            ACROSS_CHANNEL_FEATURES.add(name)
+        else:
+            ACROSS_CHANNEL_FEATURES.discard(name)
+        return function
+    return decorator
+
+
 def get_statistical_measures_df(windowed_data_df, functions, data_df_columns, result_df_columns):
     """Function for creating a dataframe X_df, the columns of which correspond to the required statistical measures for
     the windows of the windowed_data_df dataframe
@@ -31,4 +74,332 @@ def get_statistical_measures_df(windowed_data_df, functions, data_df_columns, re
     for [function, res_column] in zip(functions, result_df_columns):
         for data_column in data_df_columns:
             X_df[f'{data_column}_{res_column}'] = windowed_data_df[data_column].apply(function)
-    return X_df
\ No newline at end of file
+    return X_df
+
+
+def get_sorted_percentile(sorted_windows_arg, percentile_arg):
+    """Function for finding the percentile of each window from the windows sorted along the sample axis (linear
+    interpolation between the closest data points, as np.percentile does by default)
+    :param sorted_windows_arg: an array of shape (n_windows, window_size, n_channels) sorted along axis 1
+    :param percentile_arg: the percentile to compute (from 0 to 100)
+    :return: an array of shape (n_windows, n_channels)
+    """
+    position = percentile_arg / 100 * (sorted_windows_arg.shape[1] - 1)
+    lower_index = int(np.floor(position))
+    upper_index = min(lower_index + 1, sorted_windows_arg.shape[1] - 1)
+    fraction = position - lower_index
+    lower = sorted_windows_arg[:, lower_index]
+    upper = sorted_windows_arg[:, upper_index]
+    if fraction >= 0.5:
+        return upper - (upper - lower) * (1 - fraction)
+    return lower + (upper - lower) * fraction
+
+
+@register_intermediate('mean')
+def get_mean(windows):
+    return windows.mean(axis=1)
+
+
+@register_intermediate('centred', dependencies=('windows', 'mean'))
+def get_centred(windows, mean):
+    return windows - mean[:, np.newaxis]
+
+
+@register_intermediate('squared_centred', dependencies=('centred',))
+def get_squared_centred(centred):
+    return centred * centred
+
+
+@register_intermediate('variance', dependencies=('squared_centred',))
+def get_variance(squared_centred):
+    return squared_centred.mean(axis=1)
+
+
+@register_intermediate('zero_variance', dependencies=('variance', 'mean'))
+def get_zero_variance(variance, mean):
+    # Skewness and kurtosis are undefined for (almost) constant windows (as in scipy.stats.skew/kurtosis)
+    return variance <= (np.finfo(variance.dtype).resolution * mean) ** 2
+
+
+@register_intermediate('sorted')
+def get_sorted(windows):
+    return np.sort(windows, axis=1)
+
+
+@register_intermediate('first_difference')
+def get_first_difference(windows):
+    return np.diff(windows, axis=1)
+
+
+@register_intermediate('fft')
+def get_fft(windows):
+    return np.fft.rfft(windows, axis=1)
+
+
+@register_feature('mean', intermediates=('mean',))
+def get_mean_feature(mean):
+    return mean
+
+
+@register_feature('std', intermediates=('variance',))
+def get_std_feature(variance):
+    return np.sqrt(variance)
+
+
+@register_feature('aad', intermediates=('centred',))
+def get_aad_feature(centred):
+    return np.abs(centred).mean(axis=1)
+
+
+@register_feature('min', intermediates=('sorted',))
+def get_min_feature(sorted_windows):
+    return sorted_windows[:, 0]
+
+
+@register_feature('max', intermediates=('sorted',))
+def get_max_feature(sorted_windows):
+    return sorted_windows[:, -1]
+
+
+@register_feature('range', intermediates=('sorted',))
+def get_range_feature(sorted_windows):
+    return sorted_windows[:, -1] - sorted_windows[:, 0]
+
+
+@register_feature('median', intermediates=('sorted',))
+def get_median_feature(sorted_windows):
+    middle = sorted_windows.shape[1] // 2
+    if sorted_windows.shape[1] % 2:
+        return sorted_windows[:, middle]
+    return (sorted_windows[:, middle - 1] + sorted_windows[:, middle]) / 2
+
+
+@register_feature('iqr', intermediates=('sorted',))
+def get_iqr_feature(sorted_windows):
+    return get_sorted_percentile(sorted_windows, 75) - get_sorted_percentile(sorted_windows, 25)
+
+
+@register_feature('neg_count')
+def get_neg_count_feature(windows):
+    return np.count_nonzero(windows < 0, axis=1)
+
+
+@register_feature('pos_count')
+def get_pos_count_feature(windows):
+    return np.count_nonzero(windows > 0, axis=1)
+
+
+@register_feature('assymetry', intermediates=('centred', 'squared_centred', 'variance', 'zero_variance'))
+def get_skewness_feature(centred, squared_centred, variance, zero_variance):
+    with np.errstate(all='ignore'):
+        return np.where(zero_variance, np.nan, (squared_centred * centred).mean(axis=1) / variance ** 1.5)
+
+
+@register_feature('kurtosis', intermediates=('squared_centred', 'variance', 'zero_variance'))
+def get_kurtosis_feature(squared_centred, variance, zero_variance):
+    with np.errstate(all='ignore'):
+        return np.where(zero_variance, np.nan, (squared_centred * squared_centred).mean(axis=1) / variance ** 2.0) - 3
+
+
+@register_intermediate('power_spectrum', dependencies=('fft',))
+def get_power_spectrum(fft):
+    # The constant component (the mean of the window) is not a part of the spectrum of the movement
+    power_spectrum = fft[:, 1:].real ** 2
+    power_spectrum += fft[:, 1:].imag ** 2
+    return power_spectrum
+
+
+@register_intermediate('total_power', dependencies=('power_spectrum',))
+def get_total_power(power_spectrum):
+    return power_spectrum.sum(axis=1)
+
+
+@register_intermediate('frequencies', dependencies=('windows', 'sampling_frequency'))
+def get_frequencies(windows, sampling_frequency):
+    # The frequencies of the bins of the power spectrum, Hz
+    return np.fft.rfftfreq(windows.shape[1], d=1.0 / sampling_frequency)[1:]
+
+
+@register_intermediate('jerk', dependencies=('first_difference', 'sampling_frequency'))
+def get_jerk(first_difference, sampling_frequency):
+    # The rate of change of the signal per second
+    return first_difference * sampling_frequency
+
+
+@register_feature('dominant_frequency', intermediates=('power_spectrum', 'frequencies'))
+def get_dominant_frequency_feature(power_spectrum, frequencies):
+    if not len(frequencies):
+        return np.zeros((power_spectrum.shape[0], power_spectrum.shape[2]))
+    return frequencies[power_spectrum.argmax(axis=1)]
+
+
+@register_feature('spectral_energy', intermediates=('total_power', 'windows'))
+def get_spectral_energy_feature(total_power, windows):
+    # Normalised by the window length, so that the windows of different lengths are comparable
+    return total_power / windows.shape[1] ** 2
+
+
+@register_feature('spectral_entropy', intermediates=('power_spectrum', 'total_power'))
+def get_spectral_entropy_feature(power_spectrum, total_power):
+    # The Shannon entropy of the normalised power spectrum, divided by its maximum (0 - one frequency, 1 - white noise)
+    n_bins = power_spectrum.shape[1]
+    if n_bins < 2:
+        return np.zeros((power_spectrum.shape[0], power_spectrum.shape[2]))
+    with np.errstate(all='ignore'):
+        probabilities = power_spectrum / total_power[:, np.newaxis]
+        entropy = -np.where(probabilities > 0, probabilities * np.log(probabilities), 0).sum(axis=1) / np.log(n_bins)
+    return np.where(total_power > 0, entropy, 0)
+
+
+def register_band_power_feature(low_frequency, high_frequency):
+    """Function for registering the feature of the share of the spectral energy of a frequency band
+    :param low_frequency: the beginning of the band, Hz (included)
+    :param high_frequency: the end of the band, Hz (excluded)
+    :return: the name of the feature
+    """
+    name = f'band_power_{low_frequency:g}_{high_frequency:g}'
+
+    @register_feature(name, intermediates=('power_spectrum', 'total_power', 'frequencies'))
+    def get_band_power_feature(power_spectrum, total_power, frequencies):
+        band = (frequencies >= low_frequency) & (frequencies < high_frequency)
+        with np.errstate(all='ignore'):
+            return np.where(total_power > 0, power_spectrum[:, band].sum(axis=1) / total_power, 0)
+
+    return name
+
+
+@register_feature('jerk_mean', intermediates=('jerk',))
+def get_jerk_mean_feature(jerk):
+    return np.abs(jerk).mean(axis=1) if jerk.shape[1] else np.zeros((jerk.shape[0], jerk.shape[2]))
+
+
+@register_feature('jerk_std', intermediates=('jerk',))
+def get_jerk_std_feature(jerk):
+    return jerk.std(axis=1) if jerk.shape[1] else np.zeros((jerk.shape[0], jerk.shape[2]))
+
+
+@register_feature('jerk_max', intermediates=('jerk',))
+def get_jerk_max_feature(jerk):
+    return np.abs(jerk).max(axis=1) if jerk.shape[1] else np.zeros((jerk.shape[0], jerk.shape[2]))
+
+
+@register_feature('sma', across_channels=True)
+def get_sma_feature(windows):
+    # Signal magnitude area: the mean over the samples of the sum of the absolute values of all the channels
+    return np.abs(windows).sum(axis=2).mean(axis=1)
+
+
+# The time-domain statistical measures used by the pipeline (in the order of the output dataframe columns)
+STATISTICAL_MEASURES = ['mean', 'std', 'aad', 'min', 'max', 'range', 'median', 'iqr', 'neg_count', 'pos_count',
+                        'assymetry', 'kurtosis']
+# The frequency bands of the band power features, Hz (the sampling frequency of the recordings is about 30 Hz, so the
+# last band reaches beyond the Nyquist frequency and the shares of the bands sum to 1)
+SPECTRAL_BANDS = [(0, 1), (1, 3), (3, 5), (5, 8), (8, 16)]
+# The frequency-domain features (calculated from one real FFT of each channel of each window)
+SPECTRAL_FEATURES = ['dominant_frequency', 'spectral_energy', 'spectral_entropy'] + \
+                    [register_band_power_feature(low, high) for low, high in SPECTRAL_BANDS]
+# The statistics of the first difference of the signal (per second)
+JERK_FEATURES = ['jerk_mean', 'jerk_std', 'jerk_max']
+
+
+def get_intermediate(name, intermediates_arg):
+    """Function for getting an intermediate result: it is calculated (together with the intermediates it depends on)
+    only if it is not in intermediates_arg yet
+    :param name: the name of the registered intermediate (or 'windows')
+    :param intermediates_arg: dictionary of the intermediates already calculated for the batch of windows (must
+    contain the 'windows' key); the calculated intermediates are added to it
+    :return: the intermediate result
+    """
+    if name not in intermediates_arg:
+        function, dependencies = INTERMEDIATES[name]
+        intermediates_arg[name] = function(*[get_intermediate(dependency, intermediates_arg)
+                                            for dependency in dependencies])
+    return intermediates_arg[name]
+
+
+def get_features(windows_arg, feature_names_arg=STATISTICAL_MEASURES, sampling_frequency_arg=1.0):
+    """Function for calculating the registered features of the windows in one vectorized pass along the sample axis;
+    every intermediate the features need is calculated once and shared between them
+    :param windows_arg: a float array of shape (n_windows, window_size, n_channels)
+    :param feature_names_arg: a list of names of the registered features
+    :param sampling_frequency_arg: the sampling frequency of the windows, Hz (used by the spectral and the jerk
+    features)
+    :return: dictionary: key - the name of the feature; value - an array of shape (n_windows, n_channels) (or
+    (n_windows,) for the features in ACROSS_CHANNEL_FEATURES)
+    """
+    intermediates = {'windows': np.asarray(windows_arg), 'sampling_frequency': sampling_frequency_arg}
+    features = {}
+    for feature_name in feature_names_arg:
+        function, feature_intermediates = FEATURES[feature_name]
+        features[feature_name] = function(*[get_intermediate(name, intermediates) for name in feature_intermediates])
+    return features
+
+
+def get_feature_columns(data_df_columns, result_df_columns):
+    """Function for naming the columns of the features dataframe
+    :param data_df_columns: a list of names of the channels
+    :param result_df_columns: a list of names of the registered features (FEATURES)
+    :return: a list of tuples (column name, feature name, channel number or None for the features calculated across
+    the channels)
+    """
+    columns = []
+    for res_column in result_df_columns:
+        if res_column in ACROSS_CHANNEL_FEATURES:
+            columns.append((res_column, res_column, None))
+        else:
+            columns.extend((f'{data_column}_{res_column}', res_column, channel)
+                           for channel, data_column in enumerate(data_df_columns))
+    return columns
+
+
+def get_features_df(windows_arg, data_df_columns, result_df_columns=STATISTICAL_MEASURES, sampling_frequency_arg=1.0):
+    """Function for creating a dataframe of the registered features of the windows
+    :param windows_arg: a float array of shape (n_windows, window_size, n_channels)
+    :param data_df_columns: a list of names of the channels (len(data_df_columns) == n_channels)
+    :param result_df_columns: a list of names of the registered features (FEATURES)
+    :param sampling_frequency_arg: the sampling frequency of the windows, Hz
+    :return: dataframe with the columns named '{data_column}_{feature}' (in the same order as
+    get_statistical_measures_df names them; the features calculated across the channels are named '{feature}')
+    """
+    features = get_features(windows_arg=windows_arg, feature_names_arg=result_df_columns,
+                            sampling_frequency_arg=sampling_frequency_arg)
+    return pd.DataFrame({column: features[res_column] if channel is None else features[res_column][:, channel]
+                         for column, res_column, channel in get_feature_columns(data_df_columns, result_df_columns)})
+
+
+def get_statistical_measures_batch_df(windowed_data_df, data_df_columns, result_df_columns=STATISTICAL_MEASURES,
+                                      sampling_frequency_arg=1.0):
+    """Vectorized analogue of get_statistical_measures_df for the registered features: the windows of the same length
+    are stacked into one windows x samples x channels array and all features are calculated for it at once
+    :param windowed_data_df: a dataframe whose rows contain arrays of data formed as a result of windowing
+    :param data_df_columns: a list of column names of the windowed_data_df dataframe for which to find statistical
+    measures
+    :param result_df_columns: a list of names of the registered features (FEATURES)
+    :param sampling_frequency_arg: the sampling frequency of the windows, Hz (used by the spectral and the jerk
+    features)
+    :return: dataframe with the columns named '{data_column}_{measure}' (in the same order as
+    get_statistical_measures_df names them; the features calculated across the channels are named '{measure}')
+    """
+    columns = get_feature_columns(data_df_columns, result_df_columns)
+    if windowed_data_df.empty:
+        return pd.DataFrame(columns=[column for column, _, _ in columns])
+
+    columns_windows = [windowed_data_df[data_column].to_numpy() for data_column in data_df_columns]
+    lengths = np.fromiter((len(window) for window in columns_windows[0]), dtype=np.int64,
+                          count=len(windowed_data_df))
+
+    results = {}
+    # The shorter windows at the end of the recording are processed as separate batches
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        # The features are calculated in float64 (the moments of float32 windows lose precision)
+        windows = np.stack([np.stack(column_windows[rows]) for column_windows in columns_windows],
+                           axis=-1).astype(np.float64, copy=False)
+        measures = get_features(windows_arg=windows, feature_names_arg=result_df_columns,
+                                sampling_frequency_arg=sampling_frequency_arg)
+        for column, res_column, channel in columns:
+            values = measures[res_column] if channel is None else measures[res_column][:, channel]
+            result = results.setdefault(column, np.empty(len(windowed_data_df), dtype=values.dtype))
+            result[rows] = values
+
+    return pd.DataFrame(results, index=windowed_data_df.index)
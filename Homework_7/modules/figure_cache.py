@@ -0,0 +1,55 @@
+import io
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from modules import stage_cache
+
+
+def get_figure_key(data_key_arg, figure_function_arg, parameters_arg):
+    """Function for calculating the key of a rendered figure: the key of the plotted data, the plotting function and
+    its parameters (the dataframes and the arrays among the parameters are identified by data_key_arg only)
+    :param data_key_arg: the key of the plotted data (e.g. the fingerprint of the dataframe)
+    :param figure_function_arg: the function that creates the figure
+    :param parameters_arg: a dictionary of the keyword arguments of the function
+    :return: the hexadecimal digest
+    """
+    parameters = {name: value for name, value in parameters_arg.items()
+                  if not isinstance(value, (pd.DataFrame, pd.Series, np.ndarray))}
+    return stage_cache.get_stage_key(parent_key_arg=data_key_arg,
+                                     stage_name_arg=f'{figure_function_arg.__module__}.'
+                                                    f'{figure_function_arg.__qualname__}',
+                                     parameters_arg=parameters)
+
+
+def get_png(fig_arg, dpi_arg=200):
+    """Function for rendering a figure to PNG bytes (the figure is closed, so pyplot does not keep it)
+    :param fig_arg: matplotlib.figure object
+    :param dpi_arg: the resolution of the image
+    :return: bytes
+    """
+    buffer = io.BytesIO()
+    fig_arg.savefig(buffer, format='png', dpi=dpi_arg, bbox_inches='tight')
+    plt.close(fig_arg)
+    return buffer.getvalue()
+
+
+def get_figure_png(figure_function_arg, data_key_arg=None, cache_arg=None, dpi_arg=200, **kwargs):
+    """Function for getting a figure rendered to PNG bytes: if the figure of the same data and parameters has been
+    rendered before, the cached bytes are returned without calling the plotting function
+    :param figure_function_arg: the function that creates the figure (e.g. data_filtering.get_three_axes_graph)
+    :param data_key_arg: the key of the plotted data (if None, the figure is not cached)
+    :param cache_arg: stage_cache.StageCache for the rendered figures (if None, the figure is not cached)
+    :param dpi_arg: the resolution of the image
+    :param kwargs: the keyword arguments of figure_function_arg
+    :return: bytes of the PNG image
+    """
+    if data_key_arg is None or cache_arg is None:
+        return get_png(fig_arg=figure_function_arg(**kwargs), dpi_arg=dpi_arg)
+    key = get_figure_key(data_key_arg=data_key_arg, figure_function_arg=figure_function_arg,
+                         parameters_arg={**kwargs, 'dpi': dpi_arg})
+    png = cache_arg.get(key)
+    if png is None:
+        png = get_png(fig_arg=figure_function_arg(**kwargs), dpi_arg=dpi_arg)
+        cache_arg.put(key, png)
+    return png
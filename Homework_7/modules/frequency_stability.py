@@ -1,6 +1,9 @@
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from modules import plot_downsampling
+
 
 def get_avg_period(df_arg, column_name_arg):
     """Function for finding the average value of the measurement period
@@ -23,28 +26,35 @@ def get_avg_frequency(df_arg, column_name_arg):
     return 1.0 / time_diffs.mean()
 
 
-def get_stability_graph(time_diffs_arg, zoom_near_origin=True, title=None):
+def get_stability_graph(time_diffs_arg, zoom_near_origin=True, title=None, n_points=plot_downsampling.DEFAULT_N_POINTS):
     """A function for plotting the stability graph of the data collection period
     :param time_diffs_arg: an array that contains the value of the differences between two consecutive time intervals
     for the studied dataframe
     :param zoom_near_origin: whether to scale the graph as a smaller subgraph
     :param title: the name of the graph
+    :param n_points: the maximum number of plotted points (the graph is downsampled with min/max bucketing, so the
+    irregular periods stay visible; if None, all the points are plotted)
     :return: matplotlib.figure object, which is a stability plot of the data collection period
     """
+    time_diffs = np.asarray(time_diffs_arg)
+    positions = np.arange(len(time_diffs))
+    # The NaN difference of the first row is not plotted
+    valid = ~np.isnan(time_diffs)
     fig, ax = plt.subplots(figsize=(12, 4))
     ax.set_title(title)
     ax.set_ylabel('measurement time, s')
-    sns.lineplot(x=range(len(time_diffs_arg)),
-                 y=time_diffs_arg)
+    x_values, y_values = plot_downsampling.get_downsampled_series(x_arg=positions[valid], y_arg=time_diffs[valid],
+                                                                  n_points_arg=n_points)
+    sns.lineplot(x=x_values,
+                 y=y_values)
 
     if zoom_near_origin:
         inset_axes = fig.add_axes([0.17, 0.35, 0.10, 0.25])
-        inset_axes.plot(range(len(time_diffs_arg)),
-                        time_diffs_arg)
+        # Only the rows of the zoomed-in range are plotted in full resolution
+        inset_axes.plot(positions[9:21],
+                        time_diffs[9:21])
         inset_axes.set_title('Zoom near origin')
         inset_axes.set_xlim(10, 20)
         inset_axes.set_ylim(0.01, 0.04)
 
     return fig
-
-
@@ -1,14 +1,43 @@
 import pandas as pd
 import streamlit as st
 
+from modules import recording_cache
+
 
 @st.cache_data
 def read_from_file(filename):
-    """Function for reading a dataset from a file
+    """Function for reading a dataset from a file (through the on-disk cache of the compact arrays of the recording, so
+    the CSV file is parsed only once)
     :param filename: The filename for the training dataset
-    :return: A dataset read from a file
+    :return: A dataset read from a file (float32 measurements, categorical activity)
     """
-    df_local = pd.read_csv(filename)
+    df_local = recording_cache.read_recording(filename=filename)
     return df_local
 
 
+def read_chunks_from_file(filename, chunk_size=100_000, columns=None):
+    """Function for reading a dataset from a file in chunks (without loading the whole file into memory)
+    :param filename: The filename for the dataset
+    :param chunk_size: The number of rows in each chunk
+    :param columns: The list of columns to read (if None, all the columns are read)
+    :return: An iterator over the dataframes of at most chunk_size rows
+    """
+    return pd.read_csv(filename, chunksize=chunk_size, usecols=columns)
+
+
+def get_avg_period_from_file(filename, column_name='time', chunk_size=1_000_000):
+    """Function for finding the average value of the measurement period of a dataset stored in a file without loading
+    the whole file into memory
+    :param filename: The filename for the dataset
+    :param column_name: The name of the column that contains information about the time of the measurements
+    :param chunk_size: The number of rows read at once
+    :return: The average value of the measurement period
+    """
+    first_time, last_time, n_rows = None, None, 0
+    for chunk in read_chunks_from_file(filename=filename, chunk_size=chunk_size, columns=[column_name]):
+        if first_time is None:
+            first_time = chunk[column_name].iloc[0]
+        last_time = chunk[column_name].iloc[-1]
+        n_rows += len(chunk)
+    # The sum of the consecutive differences is the difference between the last and the first values
+    return (last_time - first_time) / (n_rows - 1)
@@ -0,0 +1,208 @@
+import functools
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+
+# The collector of the spans that is currently recording (None - the instrumentation is disabled)
+active_collector = None
+
+
+class Span:
+    """One measured region of code: wall time, CPU time, peak traced memory allocated inside it and the numbers of the
+    input and output rows
+    """
+
+    def __init__(self, collector, name, rows_in=None):
+        self.collector = collector
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.cached = False
+        self.depth = 0
+        self.start_s = self.wall_s = self.cpu_s = 0.0
+        self.peak_bytes = None
+        self.start_memory = self.observed_peak = 0
+
+    def __enter__(self):
+        collector = self.collector
+        self.depth = len(collector.stack)
+        if collector.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for this span, so the outer spans keep the peak observed so far
+            for span in collector.stack:
+                span.observed_peak = max(span.observed_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = self.observed_peak = current
+        collector.stack.append(self)
+        collector.spans.append(self)
+        self.start_s = time.perf_counter() - collector.start_s
+        self.cpu_s = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_s = time.perf_counter() - self.collector.start_s - self.start_s
+        self.cpu_s = time.process_time() - self.cpu_s
+        self.collector.stack.pop()
+        if self.collector.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.observed_peak)
+            self.peak_bytes = peak - self.start_memory
+            for span in self.collector.stack:
+                span.observed_peak = max(span.observed_peak, peak)
+        return False
+
+
+class NullSpan:
+    """The span returned when the instrumentation is disabled (all the attributes can be set and nothing is recorded)
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Instrumentation:
+    """Collector of the spans: the spans of the code run inside `with Instrumentation() as instrumentation:` are
+    recorded; outside it span() and instrumented() cost one global lookup
+    """
+
+    def __init__(self, trace_memory=True):
+        """
+        :param trace_memory: if True, tracemalloc is started and the peak allocated memory of each span is recorded
+        """
+        self.trace_memory = trace_memory
+        self.spans = []
+        self.stack = []
+        self.start_s = 0.0
+        self.previous_collector = None
+        self.started_tracing = False
+
+    def __enter__(self):
+        global active_collector
+        self.previous_collector = active_collector
+        active_collector = self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.start_s = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global active_collector
+        active_collector = self.previous_collector
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return False
+
+    def get_spans_df(self):
+        """Method for getting the recorded spans as a table
+        :return: dataframe with the columns 'name', 'depth', 'start_s', 'wall_s', 'cpu_s', 'peak_mib', 'rows_in',
+        'rows_out', 'cached' (one row per span in the order of their beginnings)
+        """
+        return pd.DataFrame({'name': [span.name for span in self.spans],
+                             'depth': [span.depth for span in self.spans],
+                             'start_s': [span.start_s for span in self.spans],
+                             'wall_s': [span.wall_s for span in self.spans],
+                             'cpu_s': [span.cpu_s for span in self.spans],
+                             'peak_mib': [np.nan if span.peak_bytes is None else span.peak_bytes / 2 ** 20
+                                          for span in self.spans],
+                             'rows_in': pd.array([span.rows_in for span in self.spans], dtype='Int64'),
+                             'rows_out': pd.array([span.rows_out for span in self.spans], dtype='Int64'),
+                             'cached': [span.cached for span in self.spans]},
+                            columns=['name', 'depth', 'start_s', 'wall_s', 'cpu_s', 'peak_mib', 'rows_in',
+                                     'rows_out', 'cached'])
+
+
+def span(name, rows_in=None):
+    """Function for measuring a region of code: `with instrumentation.span('stage', rows_in=len(df)) as stage_span:`
+    (stage_span.rows_out can be set inside the region)
+    :param name: the name of the span
+    :param rows_in: the number of the input rows
+    :return: Span if the instrumentation is enabled, otherwise NullSpan
+    """
+    if active_collector is None:
+        return NULL_SPAN
+    return Span(collector=active_collector, name=name, rows_in=rows_in)
+
+
+NULL_SPAN = NullSpan()
+
+
+def instrumented(name=None):
+    """Decorator for measuring every call of a function as a span
+    :param name: the name of the span (the name of the function by default)
+    :return: decorator
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active_collector is None:
+                return function(*args, **kwargs)
+            with Span(collector=active_collector, name=span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_row_count(value_arg):
+    """Function for finding the number of rows of a stage input or output
+    :param value_arg: a dataframe, an array or a dictionary of them (the largest dataframe or array is used)
+    :return: the number of rows or None
+    """
+    if isinstance(value_arg, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value_arg)
+    if isinstance(value_arg, dict):
+        return max((len(value) for value in value_arg.values()
+                    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray))), default=None)
+    return None
+
+
+def format_spans(spans_df_arg, bar_width=40):
+    """Function for formatting the spans as a text table with a flame-style breakdown: the names are indented by the
+    nesting depth, and each bar shows the share of the span in the wall time of all the top-level spans
+    :param spans_df_arg: the dataframe returned by Instrumentation.get_spans_df
+    :param bar_width: the number of characters of a bar of the whole time
+    :return: string
+    """
+    total_s = spans_df_arg.loc[spans_df_arg['depth'] == 0, 'wall_s'].sum()
+    lines = [f"{'span':<36} {'wall, s':>9} {'cpu, s':>9} {'peak, MiB':>10} {'rows in':>10} {'rows out':>10}"]
+    for row in spans_df_arg.itertuples():
+        share = row.wall_s / total_s if total_s > 0 else 0
+        name = '  ' * row.depth + row.name + (' (cached)' if row.cached else '')
+        rows_in = '' if pd.isna(row.rows_in) else f'{row.rows_in:,}'
+        rows_out = '' if pd.isna(row.rows_out) else f'{row.rows_out:,}'
+        peak = '' if np.isnan(row.peak_mib) else f'{row.peak_mib:.2f}'
+        lines.append(f"{name:<36} {row.wall_s:>9.4f} {row.cpu_s:>9.4f} {peak:>10} {rows_in:>10} {rows_out:>10} "
+                     f"{'#' * round(share * bar_width):<{bar_width}} {share:6.1%}")
+    return '\n'.join(lines)
+
+
+def get_flame_graph(spans_df_arg, title=None):
+    """Function for drawing the spans as a flame graph: each span is a bar from its beginning to its end, and the
+    nested spans are drawn above the span that contains them
+    :param spans_df_arg: the dataframe returned by Instrumentation.get_spans_df
+    :param title: the title of the graph
+    :return: matplotlib.figure object
+    """
+    fig, ax = plt.subplots(figsize=(12, 1 + 0.6 * (spans_df_arg['depth'].max() + 1 if len(spans_df_arg) else 1)))
+    colors = plt.cm.tab20.colors
+    total_s = spans_df_arg['wall_s'].max() if len(spans_df_arg) else 0
+    for number, row in enumerate(spans_df_arg.itertuples()):
+        ax.barh(row.depth, row.wall_s, left=row.start_s, height=0.9, color=colors[number % len(colors)],
+                edgecolor='white')
+        # Only the spans wide enough for their names are labelled
+        if row.wall_s < 0.08 * total_s:
+            continue
+        ax.text(row.start_s + row.wall_s / 2, row.depth, row.name, ha='center', va='center', fontsize=8,
+                clip_on=True)
+    ax.set_yticks([])
+    ax.set_xlabel('time, s')
+    ax.set_title(title)
+    return fig
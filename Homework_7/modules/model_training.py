@@ -1,36 +1,115 @@
 import numpy as np
-import pandas as pd
 
 from keras.utils import to_categorical
 
+from modules import exploratory_data_analysis
 
-def split_train_data(train_df_arg, training_part=0.8):
-    X_train = pd.DataFrame()
-    y_train = []
 
-    X_valid = pd.DataFrame()
-    y_valid = []
+def get_purged_indices(train_indices_arg, valid_indices_arg, gap_arg):
+    """Function for removing the training rows that are closer than gap_arg + 1 rows to any validation row. Adjacent
+    windows overlap, so the windows next to the validation windows share data points with them
+    :param train_indices_arg: an array of the positions of the training rows
+    :param valid_indices_arg: an array of the positions of the validation rows
+    :param gap_arg: the number of rows on each side of a validation row that are removed from the training rows
+    :return: an array of the remaining positions of the training rows (in the same order)
+    """
+    if gap_arg <= 0 or not len(valid_indices_arg) or not len(train_indices_arg):
+        return train_indices_arg
+    sorted_valid = np.sort(valid_indices_arg)
+    # The nearest validation rows before and after each training row
+    positions = np.searchsorted(sorted_valid, train_indices_arg)
+    previous_valid = sorted_valid[np.maximum(positions - 1, 0)]
+    next_valid = sorted_valid[np.minimum(positions, len(sorted_valid) - 1)]
+    distances = np.minimum(np.abs(train_indices_arg - previous_valid), np.abs(next_valid - train_indices_arg))
+    return train_indices_arg[distances > gap_arg]
 
-    counter = 0
 
-    for activity in train_df_arg['activity'].unique():
-        activity_data = train_df_arg[train_df_arg['activity'] == activity].copy()
-        activity_data.reset_index(inplace=True)
-        activity_data.drop('index', axis=1, inplace=True)
-        split_index = int(training_part * len(activity_data))
-        if counter != 0:
-            X_train = pd.concat([X_train, activity_data[activity_data.columns[:-2]][:split_index]])
-            X_valid = pd.concat([X_valid, activity_data[activity_data.columns[:-2]][split_index:]])
-        else:
-            X_train = activity_data[activity_data.columns[:-2]][:split_index]
-            X_valid = activity_data[activity_data.columns[:-2]][split_index:]
+def get_window_gap(window_size_arg, step_size_arg):
+    """Function for finding the number of the following windows that share data points with a window
+    :param window_size_arg: the number of data points within a window
+    :param step_size_arg: the step between the beginnings of two adjacent windows
+    :return: the gap (in windows) to use for get_purged_indices
+    """
+    return -(-window_size_arg // step_size_arg) - 1
 
-        y_train.extend(list(activity_data['activity_number'].values[:split_index]))
-        y_valid.extend(list(activity_data['activity_number'].values[split_index:]))
 
-        counter += 1
+def get_split_indices(labels_arg, training_part=0.8, gap_arg=0):
+    """Function for splitting the rows into training and validation parts: the first training_part of the rows of
+    each class go to the training part and the rest go to the validation part
+    :param labels_arg: an array (or a Series) of the class labels of the rows
+    :param training_part: the part of the rows of each class that goes to the training part
+    :param gap_arg: the number of rows around each validation row that are removed from the training part
+    :return: tuple (train_indices, valid_indices) of arrays of the row positions (the classes follow in the order of
+    their first appearance)
+    """
+    _, class_indices = exploratory_data_analysis.get_class_indices(labels_arg)
+    split_indices = [int(training_part * len(indices)) for indices in class_indices]
+    empty = np.empty(0, dtype=np.intp)
+    train_indices = np.concatenate([empty] + [indices[:split_index]
+                                              for indices, split_index in zip(class_indices, split_indices)])
+    valid_indices = np.concatenate([empty] + [indices[split_index:]
+                                              for indices, split_index in zip(class_indices, split_indices)])
+    return get_purged_indices(train_indices, valid_indices, gap_arg), valid_indices
 
-    return [X_train, y_train, X_valid, y_valid]
+
+def get_kfold_indices(labels_arg, n_folds=5, gap_arg=0, random_state_arg=None):
+    """Generator of stratified k-fold splits: the rows of each class are divided into n_folds parts, and each part is
+    the validation part of one fold
+    :param labels_arg: an array (or a Series) of the class labels of the rows
+    :param n_folds: the number of folds
+    :param gap_arg: the number of rows around each validation row that are removed from the training part
+    :param random_state_arg: the seed for random assignment of the rows to the folds (if None, the parts are
+    contiguous blocks of time, which keeps the overlapping windows together)
+    :return: generator of tuples (train_indices, valid_indices) of arrays of the row positions
+    """
+    _, class_indices = exploratory_data_analysis.get_class_indices(labels_arg)
+    if random_state_arg is not None:
+        rng = np.random.default_rng(random_state_arg)
+        class_indices = [rng.permutation(indices) for indices in class_indices]
+    class_folds = [np.array_split(indices, n_folds) for indices in class_indices]
+    empty = np.empty(0, dtype=np.intp)
+
+    for fold in range(n_folds):
+        valid_indices = np.sort(np.concatenate([empty] + [folds[fold] for folds in class_folds]))
+        train_indices = np.sort(np.concatenate([empty] + [folds[other_fold] for folds in class_folds
+                                                          for other_fold in range(n_folds) if other_fold != fold]))
+        yield get_purged_indices(train_indices, valid_indices, gap_arg), valid_indices
+
+
+def get_split_arrays(train_df_arg, train_indices_arg, valid_indices_arg, feature_columns_arg=None,
+                     target_column_arg='activity_number'):
+    """Function for slicing the feature matrix and the targets by the row positions of a split
+    :param train_df_arg: the features dataframe
+    :param train_indices_arg: an array of the positions of the training rows
+    :param valid_indices_arg: an array of the positions of the validation rows
+    :param feature_columns_arg: a list of the feature columns (if None, all the columns except 'activity' and
+    target_column_arg)
+    :param target_column_arg: the name of the column that contains the class numbers
+    :return: list [X_train, y_train, X_valid, y_valid]: X - contiguous float32 arrays, y - arrays of the class numbers
+    """
+    if feature_columns_arg is None:
+        feature_columns_arg = [column for column in train_df_arg.columns
+                               if column not in ('activity', target_column_arg)]
+    # The feature matrix is converted once, and each part is gathered into a new contiguous array
+    X = train_df_arg[feature_columns_arg].to_numpy(dtype=np.float32)
+    y = train_df_arg[target_column_arg].to_numpy()
+    return [X.take(train_indices_arg, axis=0), y.take(train_indices_arg),
+            X.take(valid_indices_arg, axis=0), y.take(valid_indices_arg)]
+
+
+def split_train_data(train_df_arg, training_part=0.8, feature_columns_arg=None, gap_arg=0):
+    """Function for splitting the features dataframe into training and validation parts (stratified by 'activity')
+    :param train_df_arg: the features dataframe with the 'activity' and 'activity_number' columns
+    :param training_part: the part of the rows of each class that goes to the training part
+    :param feature_columns_arg: a list of the feature columns (if None, all the columns except 'activity' and
+    'activity_number')
+    :param gap_arg: the number of rows around each validation row that are removed from the training part
+    :return: list [X_train, y_train, X_valid, y_valid]: X - contiguous float32 arrays, y - arrays of the class numbers
+    """
+    train_indices, valid_indices = get_split_indices(labels_arg=train_df_arg['activity'], training_part=training_part,
+                                                     gap_arg=gap_arg)
+    return get_split_arrays(train_df_arg=train_df_arg, train_indices_arg=train_indices,
+                            valid_indices_arg=valid_indices, feature_columns_arg=feature_columns_arg)
 
 
 def prepare_target_features(y_arg, one_hot_encoding):
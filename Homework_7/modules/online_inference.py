@@ -0,0 +1,148 @@
+import numpy as np
+
+from modules import feature_engineering
+
+
+class ActivityStream:
+    """Online feature extraction for one device: keeps fixed-size ring buffers of the raw and the median-filtered
+    samples and calculates the features of the last window every step_size samples (the windows are the same as the
+    full windows of windowing.get_windows for the filtered data)
+    """
+
+    def __init__(self, window_size, median_window_size=10, n_channels=4,
+                 feature_names=feature_engineering.STATISTICAL_MEASURES, sampling_frequency=1.0):
+        """
+        :param window_size: the number of data points within a window
+        :param median_window_size: window size for the median filter
+        :param n_channels: the number of values in each sample (e.g. 4 for accX, accY, accZ, gyrZ)
+        :param feature_names: a list of names of the registered features (feature_engineering.FEATURES)
+        :param sampling_frequency: the sampling frequency of the stream, Hz (used by the spectral and the jerk features)
+        """
+        self.window_size = window_size
+        self.step_size = window_size // 2
+        self.median_window_size = median_window_size
+        self.feature_names = feature_names
+        self.sampling_frequency = sampling_frequency
+        # The filtered value of the sample i is known when the sample i + median_lag has been received
+        self.median_lag = (median_window_size - 1) // 2
+
+        # Each sample is written twice (at k and k + size), so the last size samples are always the contiguous
+        # slice [k + 1, k + 1 + size) of the buffer
+        self.raw_buffer = np.zeros((2 * median_window_size, n_channels))
+        self.filtered_buffer = np.zeros((2 * window_size, n_channels))
+        self.n_raw = 0
+        self.n_filtered = 0
+
+    def push(self, sample):
+        """Method for adding a new sample to the stream
+        :param sample: a sequence of n_channels values
+        :return: the feature vector of the last window (ordered as the columns of
+        feature_engineering.get_statistical_measures_df) if a new window has been completed, otherwise None
+        """
+        k = self.n_raw % self.median_window_size
+        self.raw_buffer[k] = sample
+        self.raw_buffer[k + self.median_window_size] = sample
+        self.n_raw += 1
+        if self.n_raw <= self.median_lag:
+            return None
+
+        # Centred median of the raw sample n_raw - 1 - median_lag (the window is truncated at the beginning of the
+        # stream, as with min_periods=1)
+        length = min(self.n_raw, self.median_window_size)
+        end = k + 1 + self.median_window_size
+        window = np.sort(self.raw_buffer[end - length:end], axis=0)
+        middle = length // 2
+        filtered = window[middle] if length % 2 else (window[middle - 1] + window[middle]) / 2
+
+        k = self.n_filtered % self.window_size
+        self.filtered_buffer[k] = filtered
+        self.filtered_buffer[k + self.window_size] = filtered
+        self.n_filtered += 1
+        if self.n_filtered < self.window_size or (self.n_filtered - self.window_size) % self.step_size:
+            return None
+        return self.get_last_window_features()
+
+    def get_last_window(self):
+        """Method for getting the last window_size filtered samples
+        :return: a view of shape (window_size, n_channels)
+        """
+        start = self.n_filtered % self.window_size
+        return self.filtered_buffer[start:start + self.window_size]
+
+    def get_last_window_features(self):
+        """Method for calculating the features of the last window
+        :return: the feature vector (ordered as the columns of feature_engineering.get_statistical_measures_df)
+        """
+        features = feature_engineering.get_features(windows_arg=self.get_last_window()[np.newaxis],
+                                                    feature_names_arg=self.feature_names,
+                                                    sampling_frequency_arg=self.sampling_frequency)
+        # The features calculated across the channels have one value
+        return np.concatenate([np.atleast_1d(features[feature_name][0]) for feature_name in self.feature_names])
+
+
+class OnlineActivityClassifier:
+    """Online activity recognition for many concurrent device streams: the feature vectors completed by the streams
+    are scaled with the fitted StandardScaler and classified by the trained Keras model in one forward pass
+    """
+
+    def __init__(self, model, scaler, window_size, median_window_size=10, n_channels=4, class_labels=None,
+                 feature_names=feature_engineering.STATISTICAL_MEASURES, sampling_frequency=1.0):
+        """
+        :param model: the trained Keras model (called directly, without model.predict)
+        :param scaler: the StandardScaler fitted on the training features
+        :param window_size: the number of data points within a window
+        :param median_window_size: window size for the median filter
+        :param n_channels: the number of values in each sample
+        :param class_labels: the list of activity names ordered by the class number (if None, the class numbers are
+        returned)
+        :param feature_names: a list of names of the registered features the model was trained on
+        :param sampling_frequency: the sampling frequency of the streams, Hz
+        """
+        self.model = model
+        self.mean = scaler.mean_
+        self.scale = scaler.scale_
+        self.window_size = window_size
+        self.median_window_size = median_window_size
+        self.n_channels = n_channels
+        self.class_labels = class_labels
+        self.feature_names = feature_names
+        self.sampling_frequency = sampling_frequency
+        self.streams = {}
+        self.ready_stream_ids = []
+        self.ready_features = []
+
+    def ingest(self, stream_id, sample):
+        """Method for adding a new sample of the stream_id device
+        :param stream_id: the identifier of the device stream (a new stream is created on its first sample)
+        :param sample: a sequence of n_channels values
+        :return: True if a new feature vector is ready to be classified, otherwise False
+        """
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            stream = self.streams[stream_id] = ActivityStream(window_size=self.window_size,
+                                                              median_window_size=self.median_window_size,
+                                                              n_channels=self.n_channels,
+                                                              feature_names=self.feature_names,
+                                                              sampling_frequency=self.sampling_frequency)
+        features = stream.push(sample)
+        if features is None:
+            return False
+        self.ready_stream_ids.append(stream_id)
+        self.ready_features.append(features)
+        return True
+
+    def classify_ready(self):
+        """Method for classifying all the feature vectors that are ready (one forward pass of the model)
+        :return: a list of tuples (stream_id, activity, probabilities)
+        """
+        if not self.ready_features:
+            return []
+        X = (np.array(self.ready_features) - self.mean) / self.scale
+        probabilities = np.asarray(self.model(X.astype(np.float32), training=False))
+        predicted = probabilities.argmax(axis=1)
+        if self.class_labels is not None:
+            predicted = [self.class_labels[index] for index in predicted]
+
+        results = list(zip(self.ready_stream_ids, predicted, probabilities))
+        self.ready_stream_ids, self.ready_features = [], []
+        return results
@@ -1,45 +1,256 @@
 import numpy as np
-from scipy import stats
+import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from modules import feature_engineering, model_training
+from modules import data_filtering, exploratory_data_analysis, windowing, feature_engineering, model_training, \
+    stage_cache, instrumentation
 
 
-def perform_feature_engineering(df_arg):
+# Activity labels and their numbers (the classes of the model)
+ACTIVITY_DICT = {'Squat': 0, 'Leg land': 1, 'Walk': 2, 'Lateral squat slide': 3, 'Jogging': 4}
+# Accelerometer and gyroscope columns of the recordings
+SENSOR_COLUMNS = ['accX', 'accY', 'accZ', 'gyrX', 'gyrY', 'gyrZ']
+# The measurements whose period exceeds MAX_PERIOD_RATIO times the average period of the recording are removed
+MAX_PERIOD_RATIO = 1.5
+
+
+def get_max_period(mean_period_arg):
+    """Function for finding the maximum allowed measurement period (shared by the batch and the streaming pipelines)
+    :param mean_period_arg: the average measurement period of the raw recording (windowing.get_mean_period)
+    :return: the maximum allowed measurement period
+    """
+    return mean_period_arg * MAX_PERIOD_RATIO
+
+
+def get_activity_categorical(activities_arg):
+    """Function for decoding the activity labels once into a categorical array whose codes of the model classes are
+    their class numbers from ACTIVITY_DICT (the other labels, e.g. 'No activity', get the following codes)
+    :param activities_arg: an array, a Series or a Categorical of the activity labels
+    :return: pd.Categorical (int8 codes for fewer than 128 labels)
+    """
+    categorical = pd.Categorical(activities_arg)
+    categories = list(ACTIVITY_DICT) + [label for label in categorical.categories if label not in ACTIVITY_DICT]
+    if list(categorical.categories) == categories:
+        return categorical
+    # Only the categories are matched, the codes are recoded with one lookup table
+    return categorical.set_categories(categories)
+
+
+def get_activity_numbers(activities_arg):
+    """Function for converting the activity labels to the class numbers of the model without per-row Python calls
+    :param activities_arg: an array, a Series or a Categorical of the activity labels
+    :return: an int8 array of the class numbers (-1 for the labels that are not classes of the model)
+    """
+    codes = get_activity_categorical(activities_arg).codes
+    return np.where(codes < len(ACTIVITY_DICT), codes, -1).astype(np.int8)
+
+
+def preprocess_arrays(time_arg, sensor_columns_arg, activities_arg, median_window_size_arg=10,
+                      excluded_activity_arg='No activity'):
+    """Function that performs the preprocessing stages of the pipeline in one pass over the raw arrays: removing the
+    measurements with too long a period (more than 1.5 times the average one), median filtering of the remaining
+    measurements and removing the measurements of the excluded activity
+    :param time_arg: an array of the measurement times
+    :param sensor_columns_arg: a list of arrays of the raw measurements (one array per channel)
+    :param activities_arg: an array, a Series or a Categorical of the activity labels of the measurements
+    :param median_window_size_arg: window size for the median filter
+    :param excluded_activity_arg: the label of the measurements that are removed after filtering
+    :return: tuple (rows, time, block, activities):
+        1) rows - the positions of the remaining measurements in the raw arrays;
+        2) time - a float64 array of the times of the remaining measurements;
+        3) block - a float32 array of shape (len(rows), 2 * n_channels) whose columns are the raw measurements and the
+        median-filtered measurements of the remaining measurements;
+        4) activities - pd.Categorical of the activities of the remaining measurements (see get_activity_categorical)
+    (all empty for a recording of fewer than two measurements)
+    """
+    time = np.asarray(time_arg, dtype=np.float64)
+    n_channels = len(sensor_columns_arg)
+    if len(time) < 2:
+        # A recording of fewer than two measurements has no periods, so no measurement remains
+        return (np.empty(0, dtype=np.intp), time[:0], np.empty((0, 2 * n_channels), dtype=np.float32),
+                get_activity_categorical(activities_arg)[:0])
+    with instrumentation.span('period_filter', rows_in=len(time)) as period_span:
+        # The time differences are calculated once (the first measurement has no period and is removed)
+        time_diffs = np.empty(len(time))
+        time_diffs[0] = np.nan
+        np.subtract(time[1:], time[:-1], out=time_diffs[1:])
+        max_period = get_max_period(mean_period_arg=windowing.get_mean_period(time))
+        rows = np.flatnonzero(time_diffs <= max_period)
+        del time_diffs
+        period_span.rows_out = len(rows)
+
+    with instrumentation.span('median_filter', rows_in=len(rows)) as median_span:
+        # Gather the remaining measurements into one float32 block and filter them in place
+        time = time[rows]
+        block = np.empty((len(rows), 2 * n_channels), dtype=np.float32)
+        for channel, column in enumerate(sensor_columns_arg):
+            np.take(np.asarray(column, dtype=np.float32), rows, out=block[:, channel])
+        data_filtering.get_running_median(block[:, :n_channels], window_size_arg=median_window_size_arg,
+                                          out_arg=block[:, n_channels:])
+        median_span.rows_out = len(rows)
+
+    with instrumentation.span('activity_filter', rows_in=len(rows)) as activity_span:
+        # The labels are decoded once; the filter compares their integer codes
+        activities = get_activity_categorical(activities_arg)
+        codes = activities.codes[rows]
+        excluded_code = activities.categories.get_indexer([excluded_activity_arg])[0]
+        included = codes != excluded_code if excluded_code >= 0 else np.ones(len(codes), dtype=bool)
+        n_included = np.count_nonzero(included)
+        activity_span.rows_out = n_included
+        if n_included == len(included):
+            return rows, time, block, pd.Categorical.from_codes(codes, dtype=activities.dtype)
+
+        # Move the remaining rows to the beginning of the block (column by column to avoid copying the whole block)
+        for column in range(block.shape[1]):
+            block[:n_included, column] = block[included, column]
+    return (rows[included], time[included], block[:n_included],
+            pd.Categorical.from_codes(codes[included], dtype=activities.dtype))
+
+
+def preprocess_df(df_arg, median_window_size_arg=10):
+    """Function for applying preprocess_arrays to a recording dataframe
+    :param df_arg: the recording dataframe (timestamp,time,accX,accY,accZ,gyrX,gyrY,gyrZ,activity)
+    :param median_window_size_arg: window size for the median filter
+    :return: a new dataframe of the remaining measurements with the added '{column}_filtered' columns: float64 time,
+    float32 channels (they share the memory of the preprocessed block) and categorical activity (see
+    get_activity_categorical)
+    """
+    rows, time, block, activities = preprocess_arrays(time_arg=df_arg['time'].to_numpy(),
+                                                      sensor_columns_arg=[df_arg[column].to_numpy()
+                                                                          for column in SENSOR_COLUMNS],
+                                                      activities_arg=df_arg['activity'].array,
+                                                      median_window_size_arg=median_window_size_arg)
+    df = pd.DataFrame(block, index=df_arg.index[rows], copy=False,
+                      columns=SENSOR_COLUMNS + [f'{column}_filtered' for column in SENSOR_COLUMNS])
+    # Put the other columns of the recording in their original places
+    for position, column in enumerate(df_arg.columns):
+        if column == 'time':
+            df.insert(position, column, time)
+        elif column == 'activity':
+            df.insert(position, column, activities)
+        elif column not in df.columns:
+            df.insert(position, column, df_arg[column].to_numpy()[rows])
+    return df
+
+
+def perform_feature_engineering(df_arg, feature_names_arg=feature_engineering.STATISTICAL_MEASURES,
+                                channels_arg=windowing.DATA_CHANNELS, sampling_frequency_arg=1.0):
     y_train = df_arg['activity'].values
-    functions_list = [
-        lambda x: x.mean(),  # mean
-        lambda x: x.std(),  # std deviation
-        lambda x: np.mean(np.absolute(x - np.mean(x))),  # avg absolute diff
-        lambda x: x.min(),  # min
-        lambda x: x.max(),  # max
-        lambda x: x.max() - x.min(),  # range = max-min diff
-        lambda x: np.median(x),  # median
-        lambda x: np.percentile(x, 75) - np.percentile(x, 25),  # interquartile range
-        lambda x: np.sum(x < 0),  # negative count
-        lambda x: np.sum(x > 0),  # positive count
-        lambda x: stats.skew(x),  # skewness = assymetry
-        lambda x: stats.kurtosis(x)  # kurtosis
-    ]
-    result_columns = ['mean', 'std', 'aad', 'min', 'max', 'range', 'median', 'iqr', 'neg_count', 'pos_count',
-                      'assymetry', 'kurtosis']
-    df_arg = feature_engineering.get_statistical_measures_df(windowed_data_df=df_arg,
-                                                             functions=functions_list,
-                                                             data_df_columns=['accX', 'accY', 'accZ', 'gyrZ'],
-                                                             result_df_columns=result_columns)
+    df_arg = feature_engineering.get_statistical_measures_batch_df(windowed_data_df=df_arg,
+                                                                   data_df_columns=channels_arg,
+                                                                   result_df_columns=feature_names_arg,
+                                                                   sampling_frequency_arg=sampling_frequency_arg)
     df_arg['activity'] = y_train
     return df_arg
 
 
-def model_training_data_preparation(df_arg):
+def model_training_data_preparation(df_arg, return_scaler_arg=False, gap_arg=0, sparse_labels_arg=False):
     # Convert string labels to int
-    activity_dict = {'Squat': 0, 'Leg land': 1, 'Walk': 2, 'Lateral squat slide': 3, 'Jogging': 4}
-    df_arg['activity_number'] = df_arg['activity'].apply(lambda x: activity_dict[x])
-
-    X_train, y_train, X_valid, y_valid = model_training.split_train_data(train_df_arg=df_arg)
-    y_train = model_training.prepare_target_features(y_arg=y_train, one_hot_encoding=True)
-    y_valid = model_training.prepare_target_features(y_arg=y_valid, one_hot_encoding=True)
-    # Scale feature vectors
-    scaler = StandardScaler()
+    if 'activity_number' not in df_arg.columns:
+        df_arg['activity_number'] = get_activity_numbers(df_arg['activity'])
+
+    X_train, y_train, X_valid, y_valid = model_training.split_train_data(train_df_arg=df_arg, gap_arg=gap_arg)
+    # Sparse labels are the class numbers (for sparse_categorical_crossentropy) instead of one-hot matrices
+    y_train = model_training.prepare_target_features(y_arg=y_train, one_hot_encoding=not sparse_labels_arg)
+    y_valid = model_training.prepare_target_features(y_arg=y_valid, one_hot_encoding=not sparse_labels_arg)
+    # Scale feature vectors (in place: the split arrays are already new float32 arrays)
+    scaler = StandardScaler(copy=False)
     X_train = scaler.fit_transform(X_train)
     X_valid = scaler.transform(X_valid)
-    return X_train, y_train, X_valid, y_valid
\ No newline at end of file
+    if return_scaler_arg:
+        # The fitted scaler is needed to prepare the features of new data (e.g. for online inference)
+        return X_train, y_train, X_valid, y_valid, scaler
+    return X_train, y_train, X_valid, y_valid
+
+
+def preprocessing_stage(results_arg, median_window_size_arg):
+    # Exploring measurement period and frequency stability, Data Filtering, Exploratory Data Analysis
+    return {'df': preprocess_df(df_arg=results_arg['raw_df'], median_window_size_arg=median_window_size_arg)}
+
+
+def balancing_stage(results_arg, balance_level_arg):
+    # Perform undersampling to get a balanced dataframe
+    if balance_level_arg == 'rows':
+        return {'df': exploratory_data_analysis.get_undersampled_df(df_arg=results_arg['df'],
+                                                                    column_name_arg='activity')}
+    elif balance_level_arg != 'windows':
+        raise ValueError(f"Unknown balance level: {balance_level_arg}")
+    return {}
+
+
+def column_selection_stage(results_arg):
+    # Build a correlation matrix and remove certain axes of the accelerometer or gyroscope
+    df = results_arg['df']
+    sel_columns = [f'{column}_filtered' for column in SENSOR_COLUMNS]
+
+    # Calculate the correlation matrix and the variances for the selected columns in one pass
+    accumulator = exploratory_data_analysis.get_correlation_accumulator(df_arg=df, columns_arg=sel_columns)
+    corr_matrix = accumulator.get_correlation_df()
+    important_columns = ['accX_filtered', 'accY_filtered', 'accZ_filtered']
+    discard_columns = exploratory_data_analysis.get_discard_columns(corr_matrix_arg=corr_matrix,
+                                                                    important_columns_arg=important_columns,
+                                                                    df_arg=df,
+                                                                    variances_arg=accumulator.get_variances())
+    sel_columns = [col for col in sel_columns if col not in discard_columns]
+    sel_columns.append('activity')
+    filtered_df = df[['time'] + sel_columns].copy()
+    return {'corr_matrix': corr_matrix, 'discard_columns': discard_columns, 'filtered_df': filtered_df}
+
+
+def windowing_stage(results_arg, window_duration_arg, balance_level_arg, channels_arg):
+    windowed_df = windowing.get_windowed_df(df_arg=results_arg['filtered_df'], window_duration_arg=window_duration_arg,
+                                            channels_arg=channels_arg)
+    if balance_level_arg == 'windows':
+        windowed_df = exploratory_data_analysis.get_undersampled_df(df_arg=windowed_df, column_name_arg='activity')
+    return {'windowed_df': windowed_df}
+
+
+def feature_engineering_stage(results_arg, feature_names_arg, channels_arg):
+    # The sampling frequency of the spectral and the jerk features
+    sampling_frequency = windowing.get_sampling_frequency(df_arg=results_arg['filtered_df'])
+    features_df = perform_feature_engineering(df_arg=results_arg['windowed_df'], feature_names_arg=feature_names_arg,
+                                              channels_arg=channels_arg, sampling_frequency_arg=sampling_frequency)
+    # Convert string labels to int (here, so that the cached features contain the class numbers)
+    features_df['activity_number'] = get_activity_numbers(features_df['activity'])
+    return {'features_df': features_df}
+
+
+def model_training_preparation_stage(results_arg):
+    X_train, y_train, X_valid, y_valid = model_training_data_preparation(df_arg=results_arg['features_df'])
+    return {'X_train': X_train, 'y_train': y_train, 'X_valid': X_valid, 'y_valid': y_valid}
+
+
+def perform_pipeline(df_arg, median_window_size_arg=10, window_duration_arg=2, balance_level_arg='rows',
+                     feature_names_arg=feature_engineering.STATISTICAL_MEASURES, cache_arg=None,
+                     channels_arg=windowing.DATA_CHANNELS):
+    """Function that performs all the stages of the pipeline on the training recording
+    :param df_arg: the recording dataframe (timestamp,time,accX,accY,accZ,gyrX,gyrY,gyrZ,activity)
+    :param median_window_size_arg: window size for the median filter
+    :param window_duration_arg: the duration of one window in seconds
+    :param balance_level_arg: 'rows' - undersample the measurements before windowing; 'windows' - undersample the
+    windows (the windows are cut from the continuous recording, so no window spans the border of two class subsets)
+    :param feature_names_arg: a list of names of the registered features (feature_engineering.FEATURES), e.g.
+    feature_engineering.STATISTICAL_MEASURES + feature_engineering.SPECTRAL_FEATURES
+    :param cache_arg: stage_cache.StageCache for the stage results (if None, all the stages are performed; otherwise
+    the stages are resumed after the deepest stage cached for the same data and parameters, e.g. changing
+    window_duration_arg does not repeat filtering and undersampling)
+    :param channels_arg: the channels divided into windows (they must not be discarded by the correlation analysis;
+    the gyroscope channels correlated with the accelerometer ones are discarded)
+    :return: dictionary of the results of the stages: 'df' (preprocessed and balanced data), 'corr_matrix',
+    'discard_columns', 'filtered_df', 'windowed_df', 'features_df', 'X_train', 'y_train', 'X_valid', 'y_valid'
+    """
+    stages = [('preprocessing', preprocessing_stage, {'median_window_size_arg': median_window_size_arg}),
+              ('balancing', balancing_stage, {'balance_level_arg': balance_level_arg}),
+              ('column_selection', column_selection_stage, {}),
+              ('windowing', windowing_stage, {'window_duration_arg': window_duration_arg,
+                                              'balance_level_arg': balance_level_arg,
+                                              'channels_arg': list(channels_arg)}),
+              ('feature_engineering', feature_engineering_stage, {'feature_names_arg': list(feature_names_arg),
+                                                                  'channels_arg': list(channels_arg)}),
+              ('model_training_preparation', model_training_preparation_stage, {})]
+    with instrumentation.span('pipeline', rows_in=len(df_arg)) as pipeline_span:
+        input_key = stage_cache.get_df_fingerprint(df_arg) if cache_arg is not None else None
+        results = stage_cache.run_stages(stages_arg=stages, input_key_arg=input_key, cache_arg=cache_arg,
+                                         initial_results_arg={'raw_df': df_arg})
+        del results['raw_df']
+        pipeline_span.rows_out = len(results['X_train']) + len(results['X_valid'])
+    return results
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# The graphs are 12 inches wide at 100 dpi, so about 1200 pixel columns; min/max bucketing keeps two points per column
+DEFAULT_N_POINTS = 2400
+
+
+def get_minmax_indices(y_arg, n_buckets_arg):
+    """Function for min/max downsampling: the series is split into n_buckets_arg buckets of equal length, and the
+    positions of the minimum and the maximum of each bucket are kept (together with the first and the last points), so
+    the spikes of the series are preserved. The data must not contain NaN values
+    :param y_arg: an array of the values of the series
+    :param n_buckets_arg: the number of buckets (e.g. the width of the graph in pixels)
+    :return: a sorted array of the kept positions (all the positions if the series is short)
+    """
+    y = np.asarray(y_arg)
+    n_rows = len(y)
+    if n_rows <= 2 * n_buckets_arg:
+        return np.arange(n_rows)
+    bucket_size = -(-n_rows // n_buckets_arg)
+    n_full_rows = n_rows // bucket_size * bucket_size
+    # The full buckets are processed at once as the rows of a matrix
+    buckets = y[:n_full_rows].reshape(-1, bucket_size)
+    offsets = np.arange(0, n_full_rows, bucket_size)
+    indices = [offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1), [0, n_rows - 1]]
+    if n_full_rows < n_rows:
+        tail = y[n_full_rows:]
+        indices.append([n_full_rows + tail.argmin(), n_full_rows + tail.argmax()])
+    return np.unique(np.concatenate(indices))
+
+
+def get_lttb_indices(x_arg, y_arg, n_points_arg):
+    """Function for Largest-Triangle-Three-Buckets downsampling: the first and the last points are kept, the points
+    between them are split into n_points_arg - 2 buckets, and in each bucket the point that forms the largest triangle
+    with the point kept in the previous bucket and the average point of the next bucket is kept. The data must not
+    contain NaN values
+    :param x_arg: an array of the OX values of the series (sorted)
+    :param y_arg: an array of the OY values of the series
+    :param n_points_arg: the number of kept points
+    :return: a sorted array of the kept positions (all the positions if the series is short)
+    """
+    x = np.asarray(x_arg, dtype=np.float64)
+    y = np.asarray(y_arg, dtype=np.float64)
+    n_rows = len(y)
+    if n_points_arg >= n_rows or n_points_arg < 3:
+        return np.arange(n_rows)
+    edges = np.linspace(1, n_rows - 1, n_points_arg - 1).astype(np.int64)
+    # The average points of all the buckets are calculated at once; the last point is the "next bucket" of the last one
+    counts = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x[:n_rows - 1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[:n_rows - 1], edges[:-1]) / counts, y[-1])
+
+    indices = np.empty(n_points_arg, dtype=np.int64)
+    indices[0], indices[-1] = 0, n_rows - 1
+    selected = 0
+    for bucket in range(n_points_arg - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[selected] - average_x[bucket + 1]) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (average_y[bucket + 1] - y[selected]))
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+    return indices
+
+
+def get_downsampled_series(x_arg, y_arg, n_points_arg=DEFAULT_N_POINTS, method_arg='minmax'):
+    """Function for preparing a series for plotting: the series is downsampled to about n_points_arg points, so the
+    time of drawing does not depend on the length of the series
+    :param x_arg: an array of the OX values of the series (sorted; if None, the positions of the values are used)
+    :param y_arg: an array of the OY values of the series
+    :param n_points_arg: the maximum number of plotted points (if None, the series is not downsampled)
+    :param method_arg: 'minmax' (min/max bucketing) or 'lttb' (Largest-Triangle-Three-Buckets)
+    :return: tuple (x, y) of the arrays of the plotted points
+    """
+    y = np.asarray(y_arg)
+    x = np.arange(len(y)) if x_arg is None else np.asarray(x_arg)
+    if n_points_arg is None or len(y) <= n_points_arg:
+        return x, y
+    if method_arg == 'minmax':
+        indices = get_minmax_indices(y_arg=y, n_buckets_arg=n_points_arg // 2)
+    elif method_arg == 'lttb':
+        indices = get_lttb_indices(x_arg=x, y_arg=y, n_points_arg=n_points_arg)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method_arg}")
+    return x[indices], y[indices]
+
+
+def get_range_slice(x_arg, x_min_arg, x_max_arg):
+    """Function for finding the rows of a series that fall into the range of the OX axis with binary search (one
+    neighbouring row is added on each side, so the lines reach the borders of the range)
+    :param x_arg: an array of the OX values of the series (sorted)
+    :param x_min_arg: the beginning of the range
+    :param x_max_arg: the end of the range
+    :return: slice
+    """
+    x = np.asarray(x_arg)
+    start = max(int(np.searchsorted(x, x_min_arg, side='left')) - 1, 0)
+    end = min(int(np.searchsorted(x, x_max_arg, side='right')) + 1, len(x))
+    return slice(start, end)
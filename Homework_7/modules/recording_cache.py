@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+# The folder of the converted recordings (relative to the working directory of the scripts)
+CACHE_DIR = os.path.join('data', 'cache')
+# The version of the cache layout (the entries of other versions are converted again)
+CACHE_VERSION = 1
+
+
+def get_file_hash(filename, block_size=1 << 20):
+    """Function for calculating the hash of the contents of a file
+    :param filename: the name of the file
+    :param block_size: the number of bytes read at once
+    :return: the hexadecimal digest
+    """
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_cache_path(filename, cache_dir_arg=CACHE_DIR):
+    """Function for getting the folder of the cache entry of a recording file (the full path of the file is hashed, so
+    the files with the same name in different folders have different entries)
+    :param filename: the name of the recording file
+    :param cache_dir_arg: the folder of the cache
+    :return: the path of the entry folder
+    """
+    path_hash = hashlib.blake2b(os.path.realpath(filename).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir_arg, f'{os.path.splitext(os.path.basename(filename))[0]}-{path_hash}')
+
+
+def get_compact_columns(df_arg):
+    """Function for converting the columns of a recording dataframe to compact types: the float columns whose values
+    are whole milliseconds become int64 milliseconds, the other float columns become float32, the integer columns stay
+    int64 and the other columns become categorical codes
+    :param df_arg: the recording dataframe
+    :return: tuple (groups, columns): groups - a dictionary {group name: list of arrays of one dtype}; columns - a list
+    of dictionaries that describe the columns in their original order ('name', 'kind', 'group', 'position' in the group
+    and 'categories' of the categorical columns)
+    """
+    groups = {'float32': [], 'int64': []}
+    columns = []
+    for index, name in enumerate(df_arg.columns):
+        values = df_arg[name].to_numpy()
+        column = {'name': name}
+        if values.dtype.kind == 'f':
+            milliseconds = np.round(values * 1000)
+            if np.array_equal(milliseconds / 1000, values):
+                column['kind'], column['group'] = 'milliseconds', 'int64'
+                values = milliseconds.astype(np.int64)
+            else:
+                column['kind'], column['group'] = 'float32', 'float32'
+                values = values.astype(np.float32)
+        elif values.dtype.kind in 'iub':
+            column['kind'], column['group'] = 'int64', 'int64'
+            values = values.astype(np.int64)
+        else:
+            codes, categories = pd.factorize(values)
+            column['kind'], column['group'] = 'category', f'category{index}'
+            column['categories'] = [str(category) for category in categories]
+            groups[column['group']] = []
+            # The smallest integer type that holds the codes
+            values = codes.astype(np.min_scalar_type(-max(len(categories), 1)))
+        column['position'] = len(groups[column['group']])
+        groups[column['group']].append(values)
+        columns.append(column)
+    return groups, columns
+
+
+def convert_to_cache(filename, cache_dir_arg=CACHE_DIR):
+    """Function for converting a recording CSV file into a cache entry: each group of columns of one type is stored as
+    one (n_columns, n_rows) .npy array, and the description of the columns and the source file is stored in meta.json
+    :param filename: the name of the recording CSV file
+    :param cache_dir_arg: the folder of the cache
+    :return: the metadata of the entry
+    """
+    cache_path = get_cache_path(filename=filename, cache_dir_arg=cache_dir_arg)
+    stat = os.stat(filename)
+    df = pd.read_csv(filename)
+    groups, columns = get_compact_columns(df_arg=df)
+    meta = {'version': CACHE_VERSION, 'source': os.path.realpath(filename), 'source_hash': get_file_hash(filename),
+            'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns, 'n_rows': len(df), 'columns': columns,
+            'groups': [group for group, arrays in groups.items() if arrays]}
+
+    # The entry is written to a temporary folder and renamed, so a reader never sees a partial entry
+    temp_path = f'{cache_path}.tmp{os.getpid()}'
+    os.makedirs(temp_path, exist_ok=True)
+    for group in meta['groups']:
+        np.save(os.path.join(temp_path, f'{group}.npy'), np.stack(groups[group]))
+    with open(os.path.join(temp_path, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(temp_path, cache_path)
+    return meta
+
+
+def get_cache_meta(filename, cache_dir_arg=CACHE_DIR):
+    """Function for getting the metadata of the valid cache entry of a recording file. The entry is valid if the size
+    and the modification time of the file have not changed; if only the modification time has changed, the entry is
+    still valid when the hash of the contents is the same
+    :param filename: the name of the recording file
+    :param cache_dir_arg: the folder of the cache
+    :return: the metadata of the entry or None if there is no valid entry
+    """
+    meta_filename = os.path.join(get_cache_path(filename=filename, cache_dir_arg=cache_dir_arg), 'meta.json')
+    try:
+        with open(meta_filename) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(filename)
+    if meta.get('version') != CACHE_VERSION or meta['source_size'] != stat.st_size:
+        return None
+    if meta['source_mtime_ns'] != stat.st_mtime_ns:
+        if meta['source_hash'] != get_file_hash(filename):
+            return None
+        # The file has been touched or copied without changes
+        meta['source_mtime_ns'] = stat.st_mtime_ns
+        with open(meta_filename, 'w') as file:
+            json.dump(meta, file)
+    return meta
+
+
+def load_cache(cache_path_arg, meta_arg, mmap_arg=True):
+    """Function for loading a cache entry as a dataframe
+    :param cache_path_arg: the path of the entry folder
+    :param meta_arg: the metadata of the entry
+    :param mmap_arg: if True, the arrays are memory-mapped (copy-on-write, so the file is never modified) instead of
+    being read into memory
+    :return: the recording dataframe: float32 channels, int64 integer columns, float64 time (decoded from the
+    milliseconds) and categorical labels
+    """
+    groups = {group: np.load(os.path.join(cache_path_arg, f'{group}.npy'), mmap_mode='c' if mmap_arg else None)
+              for group in meta_arg['groups']}
+    float_columns = [column for column in meta_arg['columns'] if column['group'] == 'float32']
+
+    # The float32 channels form one block of the dataframe that shares the memory of the mapped array
+    if float_columns:
+        df = pd.DataFrame(groups['float32'].T, columns=[column['name'] for column in float_columns], copy=False)
+    else:
+        df = pd.DataFrame(index=pd.RangeIndex(meta_arg['n_rows']))
+    for position, column in enumerate(meta_arg['columns']):
+        values = groups[column['group']][column['position']]
+        if column['kind'] == 'milliseconds':
+            df.insert(position, column['name'], values / 1000)
+        elif column['kind'] == 'int64':
+            df.insert(position, column['name'], values)
+        elif column['kind'] == 'category':
+            df.insert(position, column['name'], pd.Categorical.from_codes(values, categories=column['categories']))
+    return df
+
+
+def read_recording(filename, cache_dir_arg=CACHE_DIR, mmap_arg=True):
+    """Function for reading a recording CSV file through the cache: the file is converted on the first read (and after
+    it has changed), and the next reads load the compact arrays of the entry
+    :param filename: the name of the recording CSV file
+    :param cache_dir_arg: the folder of the cache
+    :param mmap_arg: if True, the arrays of the entry are memory-mapped
+    :return: the recording dataframe (see load_cache)
+    """
+    meta = get_cache_meta(filename=filename, cache_dir_arg=cache_dir_arg)
+    if meta is None:
+        meta = convert_to_cache(filename=filename, cache_dir_arg=cache_dir_arg)
+    return load_cache(cache_path_arg=get_cache_path(filename=filename, cache_dir_arg=cache_dir_arg), meta_arg=meta,
+                      mmap_arg=mmap_arg)
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from modules import instrumentation
+
+
+def get_df_fingerprint(df_arg):
+    """Function for calculating the fingerprint of the contents of a dataframe (the column names, the dtypes, the index
+    and the values)
+    :param df_arg: the dataframe
+    :return: the hexadecimal digest
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    fingerprint.update(repr([(str(column), str(dtype)) for column, dtype in df_arg.dtypes.items()]).encode())
+    if isinstance(df_arg.index, pd.RangeIndex):
+        fingerprint.update(repr(df_arg.index).encode())
+    else:
+        fingerprint.update(pd.util.hash_pandas_object(df_arg.index).to_numpy().tobytes())
+    for column in df_arg.columns:
+        series = df_arg[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            fingerprint.update(repr(list(series.cat.categories)).encode())
+            fingerprint.update(np.ascontiguousarray(series.cat.codes.to_numpy()).tobytes())
+        elif series.dtype.kind in 'biufcmM':
+            # The numeric values are hashed as raw bytes
+            fingerprint.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+        else:
+            fingerprint.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return fingerprint.hexdigest()
+
+
+def get_stage_key(parent_key_arg, stage_name_arg, parameters_arg):
+    """Function for calculating the key of a stage result: the key of the previous stage (or the input fingerprint),
+    the name of the stage and its parameters
+    :param parent_key_arg: the key of the previous stage result or the fingerprint of the input data
+    :param stage_name_arg: the name of the stage
+    :param parameters_arg: a dictionary of the parameters of the stage
+    :return: the hexadecimal digest
+    """
+    key = hashlib.blake2b(digest_size=16)
+    key.update(f'{parent_key_arg}|{stage_name_arg}|{sorted(parameters_arg.items())!r}'.encode())
+    return key.hexdigest()
+
+
+def get_object_size(value_arg):
+    """Function for estimating the memory used by a stage result
+    :param value_arg: a dataframe, a series, an array, bytes or a dictionary/list/tuple of them
+    :return: the estimated size in bytes
+    """
+    if isinstance(value_arg, (bytes, bytearray)):
+        return len(value_arg)
+    if isinstance(value_arg, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value_arg.memory_usage(deep=True)))
+    if isinstance(value_arg, np.ndarray):
+        return value_arg.nbytes
+    if isinstance(value_arg, dict):
+        return sum(get_object_size(value) for value in value_arg.values())
+    if isinstance(value_arg, (list, tuple)):
+        return sum(get_object_size(value) for value in value_arg)
+    return 64
+
+
+class StageCache:
+    """Cache of the stage results of the pipeline: the recently used results are kept in memory (least recently used
+    results are evicted when the number of results or their estimated size exceeds the limits), and if cache_dir is set,
+    every result is also pickled to disk (the oldest files are removed when their total size exceeds max_disk_bytes)
+    """
+
+    def __init__(self, max_items=32, max_bytes=1 << 30, cache_dir=None, max_disk_bytes=4 << 30):
+        """
+        :param max_items: the maximum number of results kept in memory
+        :param max_bytes: the maximum estimated size of the results kept in memory
+        :param cache_dir: the folder for the pickled results (if None, the results are kept only in memory)
+        :param max_disk_bytes: the maximum total size of the pickled results
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.items = OrderedDict()  # key -> (value, size), the most recently used last
+        self.n_bytes = 0
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_filename(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def contains(self, key):
+        """Method for checking whether a result is cached (in memory or on disk) without loading it
+        """
+        with self.lock:
+            if key in self.items:
+                return True
+        return self.cache_dir is not None and os.path.exists(self.get_filename(key))
+
+    def get(self, key, default=None):
+        """Method for getting a cached result (a result found on disk is loaded into memory)
+        :param key: the key of the result
+        :param default: the value returned if the result is not cached
+        :return: the result or default
+        """
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key][0]
+        if self.cache_dir is None:
+            return default
+        filename = self.get_filename(key)
+        try:
+            with open(filename, 'rb') as file:
+                value = pickle.load(file)
+            # The modification time marks the recently used files
+            os.utime(filename)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return default
+        self.put_in_memory(key, value)
+        return value
+
+    def put(self, key, value):
+        """Method for caching a result
+        :param key: the key of the result
+        :param value: the result
+        :return: None
+        """
+        self.put_in_memory(key, value)
+        if self.cache_dir is None:
+            return
+        # The file is written under a temporary name and renamed, so a reader never loads a partial file
+        temp_filename = f'{self.get_filename(key)}.tmp{os.getpid()}.{threading.get_ident()}'
+        with open(temp_filename, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, self.get_filename(key))
+        self.evict_from_disk()
+
+    def put_in_memory(self, key, value):
+        size = get_object_size(value)
+        with self.lock:
+            if key in self.items:
+                self.n_bytes -= self.items.pop(key)[1]
+            self.items[key] = (value, size)
+            self.n_bytes += size
+            # Evict the least recently used results (the new result is kept even if it exceeds max_bytes alone)
+            while len(self.items) > 1 and (len(self.items) > self.max_items or self.n_bytes > self.max_bytes):
+                _, (_, evicted_size) = self.items.popitem(last=False)
+                self.n_bytes -= evicted_size
+
+    def evict_from_disk(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """Method for removing all the cached results (from memory and from disk)
+        """
+        with self.lock:
+            self.items.clear()
+            self.n_bytes = 0
+        if self.cache_dir is not None:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
+
+
+def run_stages(stages_arg, input_key_arg, cache_arg=None, initial_results_arg=None):
+    """Function for running a chain of stages with caching: the keys of all the stages are calculated from the input
+    fingerprint and the stage parameters, the results of the deepest stage whose results (and the results of all the
+    stages before it) are cached are loaded, and only the following stages are performed
+    :param stages_arg: a list of tuples (name, function, parameters): the function gets the dictionary of the results
+    of the previous stages as the first argument and the parameters as keyword arguments, and returns a dictionary of
+    its own results
+    :param input_key_arg: the fingerprint of the input data
+    :param cache_arg: StageCache (if None, all the stages are performed)
+    :param initial_results_arg: a dictionary of the inputs available to the first stage (e.g. the input data)
+    :return: the dictionary of the initial results and the results of all the stages
+    """
+    keys = []
+    parent_key = input_key_arg
+    for name, _, parameters in stages_arg:
+        parent_key = get_stage_key(parent_key_arg=parent_key, stage_name_arg=name, parameters_arg=parameters)
+        keys.append(parent_key)
+
+    # The number of the first stages whose results are all cached
+    n_cached = 0
+    if cache_arg is not None:
+        while n_cached < len(keys) and cache_arg.contains(keys[n_cached]):
+            n_cached += 1
+
+    results = dict(initial_results_arg or {})
+    n_rows = instrumentation.get_row_count(results)
+    for stage, ((name, function, parameters), key) in enumerate(zip(stages_arg, keys)):
+        with instrumentation.span(name, rows_in=n_rows) as stage_span:
+            stage_results = cache_arg.get(key) if stage < n_cached else None
+            stage_span.cached = stage_results is not None
+            if stage_results is None:
+                stage_results = function(results, **parameters)
+                if cache_arg is not None:
+                    cache_arg.put(key, stage_results)
+            # The stages that return no rows (e.g. skipped balancing) pass the number of rows on
+            n_rows = instrumentation.get_row_count(stage_results) or n_rows
+            stage_span.rows_out = n_rows
+        results.update(stage_results)
+    return results
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from modules import get_data, data_filtering, windowing, feature_engineering, pipeline
+
+
+def filter_period_chunks(chunks_arg, max_period_arg, column_name_arg='time'):
+    """Function for removing the measurements whose period (the difference from the previous measurement time) exceeds
+    max_period_arg from a stream of dataframe chunks (the previous measurement time is carried across chunk boundaries)
+    :param chunks_arg: an iterable of dataframes (consecutive parts of one recording)
+    :param max_period_arg: the maximum allowed measurement period
+    :param column_name_arg: the name of the column that contains information about the time of the measurements
+    :return: generator of the filtered dataframes
+    """
+    previous_time = np.nan
+    for chunk in chunks_arg:
+        if chunk.empty:
+            continue
+        times = chunk[column_name_arg].to_numpy()
+        time_diffs = np.diff(times, prepend=previous_time)
+        previous_time = times[-1]
+        yield chunk[time_diffs <= max_period_arg]
+
+
+def median_filter_chunks(chunks_arg, filter_columns_arg, window_size_arg):
+    """Function for applying the centred median filter (data_filtering.median_filter_data) to a stream of dataframe
+    chunks. The rows are yielded as soon as the whole filter window around them has been read, so the result is the
+    same as filtering the concatenated chunks at once
+    :param chunks_arg: an iterable of dataframes (consecutive parts of one recording)
+    :param filter_columns_arg: a list of columns whose contents should be filtered
+    :param window_size_arg: window size for the median filter
+    :return: generator of the dataframes with the added '{column}_filtered' columns
+    """
+    filtered_columns = [f'{column}_filtered' for column in filter_columns_arg]
+    median_filter = data_filtering.RunningMedianFilter(window_size=window_size_arg)
+    pending_df = None  # the rows whose filtered values are not known yet
+
+    for chunk in chunks_arg:
+        pending_df = chunk if pending_df is None else pd.concat([pending_df, chunk])
+        filtered = median_filter.append(chunk[filter_columns_arg].to_numpy())
+        if len(filtered):
+            ready_df = pending_df.iloc[:len(filtered)].copy()
+            ready_df[filtered_columns] = filtered
+            pending_df = pending_df.iloc[len(filtered):]
+            yield ready_df
+
+    # The last rows of the recording are filtered with the truncated windows (min_periods=1)
+    if pending_df is not None and len(pending_df):
+        ready_df = pending_df.copy()
+        ready_df[filtered_columns] = median_filter.flush()
+        yield ready_df
+
+
+def window_chunks(chunks_arg, data_columns_arg, window_size_arg, label_column_arg='activity'):
+    """Function for dividing a stream of dataframe chunks into overlapping (by 50%) windows. The windows are yielded as
+    soon as they are complete; the shorter windows at the end of the recording are yielded one by one at the end (as
+    windowing.get_windows produces them)
+    :param chunks_arg: an iterable of dataframes (consecutive parts of one recording)
+    :param data_columns_arg: a list of names of the columns that should be divided into windows
+    :param window_size_arg: the number of data points within a window
+    :param label_column_arg: the name of the column that contains the labels of the data points
+    :return: generator of tuples (windows, labels): windows - a contiguous array of shape
+    (n_windows, window_length, len(data_columns_arg)); labels - the most frequent label of each window
+    """
+    step_size = window_size_arg // 2
+    # The windows keep the dtype of the data (float32 stays float32)
+    values = np.empty((0, len(data_columns_arg)), dtype=np.float32)
+    labels = np.empty(0, dtype=object)
+
+    for chunk in chunks_arg:
+        values = np.concatenate([values, chunk[data_columns_arg].to_numpy()])
+        labels = np.concatenate([labels, chunk[label_column_arg].to_numpy(dtype=object)])
+        windows, _ = windowing.get_window_views(values_arg=values, window_size_arg=window_size_arg,
+                                                step_size_arg=step_size)
+        if not len(windows):
+            continue
+        codes, uniques = pd.factorize(labels)
+        label_codes = windowing.get_window_labels(codes_arg=codes, n_codes_arg=len(uniques),
+                                                  window_size_arg=window_size_arg, step_size_arg=step_size)
+        yield np.ascontiguousarray(windows), np.asarray(uniques, dtype=object)[label_codes[:len(windows)]]
+
+        # The next window starts right after the step of the last yielded window
+        values = values[len(windows) * step_size:]
+        labels = labels[len(windows) * step_size:]
+
+    _, tail_windows = windowing.get_window_views(values_arg=values, window_size_arg=window_size_arg,
+                                                 step_size_arg=step_size)
+    if tail_windows:
+        codes, uniques = pd.factorize(labels)
+        label_codes = windowing.get_window_labels(codes_arg=codes, n_codes_arg=len(uniques),
+                                                  window_size_arg=window_size_arg, step_size_arg=step_size)
+        for window, label_code in zip(tail_windows, label_codes):
+            yield window[np.newaxis], np.asarray(uniques, dtype=object)[[label_code]]
+
+
+def get_stream_parameters(filename, window_duration_arg=2, chunk_size_arg=100_000,
+                          excluded_activity_arg='No activity'):
+    """Function for finding the parameters of the streaming pipeline in the same way as the batch pipeline
+    (pipeline.preprocess_arrays, windowing.get_window_size and windowing.get_sampling_frequency) finds them, so both
+    produce the same windows and features. Only the time and the activity columns are read (in two passes: the raw
+    measurements, then the preprocessed ones)
+    :param filename: the recording CSV file
+    :param window_duration_arg: the duration of one window in seconds
+    :param chunk_size_arg: the number of rows read from the file at once
+    :param excluded_activity_arg: the label of the measurements that are removed by the preprocessing
+    :return: dictionary: 'max_period' (of the period filter), 'window_size', 'sampling_frequency' (of the spectral and
+    the jerk features)
+    """
+    max_period = pipeline.get_max_period(mean_period_arg=get_data.get_avg_period_from_file(filename=filename,
+                                                                                           chunk_size=chunk_size_arg))
+    # The periods of the measurements that remain after the period filter and the activity filter
+    accumulator = windowing.PeriodAccumulator()
+    chunks = get_data.read_chunks_from_file(filename=filename, chunk_size=chunk_size_arg, columns=['time', 'activity'])
+    for chunk in filter_period_chunks(chunks_arg=chunks, max_period_arg=max_period):
+        accumulator.update(chunk['time'].to_numpy()[chunk['activity'].to_numpy() != excluded_activity_arg])
+    window_size, _, sampling_frequency = accumulator.get_window_parameters(window_duration_arg=window_duration_arg)
+    return {'max_period': max_period, 'window_size': window_size, 'sampling_frequency': sampling_frequency}
+
+
+def stream_features(filename, window_duration_arg=2, window_size_arg=None, max_period_arg=None,
+                    median_window_size_arg=10, chunk_size_arg=100_000,
+                    feature_names_arg=feature_engineering.STATISTICAL_MEASURES, channels_arg=windowing.DATA_CHANNELS,
+                    sampling_frequency_arg=None):
+    """Function for running the pipeline stages from reading the recording to feature engineering (period filter ->
+    median filter -> removing 'No activity' -> windowing -> features) on a recording of any length. The file is read
+    in chunks and the feature rows are yielded as the windows are completed, so the memory usage depends on
+    chunk_size_arg rather than on the file size. With the default parameters the features are exactly the same as the
+    stages of pipeline.perform_pipeline before balancing produce (see get_stream_parameters): the channels are
+    filtered in float32 and the features are calculated in float64, as in the batch pipeline
+    :param filename: the recording CSV file (timestamp,time,accX,accY,accZ,gyrX,gyrY,gyrZ,activity)
+    :param window_duration_arg: the duration of one window in seconds (used if window_size_arg is None)
+    :param window_size_arg: the number of data points within a window (if None, see get_stream_parameters)
+    :param max_period_arg: the maximum allowed measurement period (if None, see get_stream_parameters)
+    :param median_window_size_arg: window size for the median filter
+    :param chunk_size_arg: the number of rows read from the file at once
+    :param feature_names_arg: a list of names of the registered features (feature_engineering.FEATURES)
+    :param channels_arg: the channels divided into windows
+    :param sampling_frequency_arg: the sampling frequency of the spectral and the jerk features, Hz (if None, see
+    get_stream_parameters)
+    :return: generator of features dataframes (the columns are the same as pipeline.perform_feature_engineering
+    returns)
+    """
+    data_columns = list(channels_arg)
+    if window_size_arg is None or max_period_arg is None or sampling_frequency_arg is None:
+        parameters = get_stream_parameters(filename=filename, window_duration_arg=window_duration_arg,
+                                           chunk_size_arg=chunk_size_arg)
+        window_size_arg = parameters['window_size'] if window_size_arg is None else window_size_arg
+        max_period_arg = parameters['max_period'] if max_period_arg is None else max_period_arg
+        sampling_frequency_arg = parameters['sampling_frequency'] if sampling_frequency_arg is None \
+            else sampling_frequency_arg
+
+    chunks = get_data.read_chunks_from_file(filename=filename, chunk_size=chunk_size_arg,
+                                            columns=['time'] + data_columns + ['activity'])
+    # The channels are converted to float32 after parsing, as pipeline.preprocess_arrays converts them
+    chunks = (chunk.astype({column: np.float32 for column in data_columns}) for chunk in chunks)
+    chunks = filter_period_chunks(chunks_arg=chunks, max_period_arg=max_period_arg)
+    chunks = median_filter_chunks(chunks_arg=chunks, filter_columns_arg=data_columns,
+                                  window_size_arg=median_window_size_arg)
+    chunks = (chunk[chunk['activity'] != 'No activity'] for chunk in chunks)
+
+    for windows, labels in window_chunks(chunks_arg=chunks,
+                                         data_columns_arg=[f'{column}_filtered' for column in data_columns],
+                                         window_size_arg=window_size_arg):
+        # The features are calculated in float64, as feature_engineering.get_statistical_measures_batch_df does
+        features_df = feature_engineering.get_features_df(windows_arg=windows.astype(np.float64),
+                                                          data_df_columns=data_columns,
+                                                          result_df_columns=feature_names_arg,
+                                                          sampling_frequency_arg=sampling_frequency_arg)
+        features_df['activity'] = labels
+        yield features_df
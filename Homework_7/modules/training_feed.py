@@ -0,0 +1,69 @@
+import numpy as np
+import tensorflow as tf
+
+from modules import feature_cache, model_training
+
+
+def get_dataset(features_arg, labels_arg, indices_arg, scaler_arg, batch_size_arg=256, shuffle_arg=True,
+                seed_arg=None):
+    """Function for creating a tf.data.Dataset of the scaled batches of the feature rows: the batches are read from
+    features_arg (e.g. the memory-mapped feature cache) by parallel map calls and prefetched while the model trains on
+    the previous batches, so the whole feature matrix is never loaded into memory
+    :param features_arg: an array (e.g. memory-mapped) of shape (n_rows, n_features)
+    :param labels_arg: an array of the class numbers of the rows
+    :param indices_arg: the positions of the rows of the dataset
+    :param scaler_arg: the fitted StandardScaler (e.g. feature_cache.get_streaming_scaler)
+    :param batch_size_arg: the number of rows of a batch
+    :param shuffle_arg: if True, the rows are shuffled once and the order of the batches is shuffled on each epoch
+    :param seed_arg: the seed of the shuffling
+    :return: tf.data.Dataset of tuples (X, y): X - float32 (batch_size, n_features); y - int32 class numbers (use
+    sparse_categorical_crossentropy)
+    """
+    indices = np.asarray(indices_arg)
+    if shuffle_arg:
+        indices = np.random.default_rng(seed_arg).permutation(indices)
+    n_batches = -(-len(indices) // batch_size_arg)
+    n_features = features_arg.shape[1]
+    mean = scaler_arg.mean_.astype(np.float32)
+    scale = scaler_arg.scale_.astype(np.float32)
+
+    def read_batch(batch):
+        # The rows of a batch are read in the order of their positions in the file
+        rows = np.sort(indices[batch * batch_size_arg:(batch + 1) * batch_size_arg])
+        return feature_cache.get_batch(features_arg=features_arg, labels_arg=labels_arg, indices_arg=rows,
+                                       mean_arg=mean, scale_arg=scale)
+
+    def map_batch(batch):
+        X, y = tf.numpy_function(read_batch, [batch], (tf.float32, tf.int32))
+        X.set_shape((None, n_features))
+        y.set_shape((None,))
+        return X, y
+
+    dataset = tf.data.Dataset.range(n_batches)
+    if shuffle_arg:
+        dataset = dataset.shuffle(n_batches, seed=seed_arg, reshuffle_each_iteration=True)
+    dataset = dataset.map(map_batch, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle_arg)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def get_training_datasets(cache_path_arg, training_part=0.8, gap_arg=0, batch_size_arg=256, seed_arg=None):
+    """Function for preparing the training and the validation feeds of a feature cache: the rows are split by class
+    (model_training.get_split_indices, only the int8 labels are loaded for it), the scaler is fitted to the training
+    rows in one pass, and both parts are streamed from the cache
+    :param cache_path_arg: the folder of the feature cache (see feature_cache.write_feature_cache)
+    :param training_part: the part of the rows of each class that goes to the training part
+    :param gap_arg: the number of rows around each validation row that are removed from the training part
+    :param batch_size_arg: the number of rows of a batch
+    :param seed_arg: the seed of the shuffling of the training rows
+    :return: dictionary: 'train_dataset', 'valid_dataset', 'scaler', 'n_features', 'n_classes', 'n_train', 'n_valid'
+    """
+    features, labels, meta = feature_cache.load_feature_cache(cache_path_arg=cache_path_arg)
+    train_indices, valid_indices = model_training.get_split_indices(labels_arg=np.asarray(labels),
+                                                                    training_part=training_part, gap_arg=gap_arg)
+    scaler = feature_cache.get_streaming_scaler(features_arg=features, indices_arg=train_indices)
+    return {'train_dataset': get_dataset(features_arg=features, labels_arg=labels, indices_arg=train_indices,
+                                         scaler_arg=scaler, batch_size_arg=batch_size_arg, seed_arg=seed_arg),
+            'valid_dataset': get_dataset(features_arg=features, labels_arg=labels, indices_arg=valid_indices,
+                                         scaler_arg=scaler, batch_size_arg=batch_size_arg, shuffle_arg=False),
+            'scaler': scaler, 'n_features': len(meta['feature_columns']), 'n_classes': len(meta['classes']),
+            'n_train': len(train_indices), 'n_valid': len(valid_indices)}
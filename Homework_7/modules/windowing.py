@@ -1,37 +1,221 @@
 from math import ceil
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
 warnings.filterwarnings('ignore')
 
 
-def get_windowed_df(df_arg, window_duration_arg):
-    # Calculate the number of data points within a 2-second window
-    sampling_frequency = 1.0 / df_arg['time'].diff().mean()  # Hz
-    window_size = ceil(sampling_frequency * window_duration_arg)
-    step_size = window_size // 2
+# The channels divided into windows by default (the '{channel}_filtered' columns of the preprocessed data)
+DATA_CHANNELS = ['accX', 'accY', 'accZ', 'gyrZ']
 
-    # Create a list to store the windowed dataframes
-    windowed_dfs = []
 
-    windowed_dict = {'accX': [], 'accY': [], 'accZ': [], 'gyrZ': [], 'activity': []}
-    # Divide the entire dataframe into 2-second windows
-    for i in range(0, len(df_arg), step_size):
-        window_df = df_arg.iloc[i:i + window_size]
+def get_mean_period(times_arg):
+    """Function for finding the average measurement period (the sum of the consecutive differences of the times is the
+    difference between the last and the first times, so it does not depend on how the times are split into chunks)
+    :param times_arg: an array of the measurement times
+    :return: the average measurement period (NaN for fewer than 2 measurements)
+    """
+    times = np.asarray(times_arg)
+    return (times[-1] - times[0]) / (len(times) - 1) if len(times) > 1 else np.nan
+
+
+def get_window_parameters(mean_period_arg, median_period_arg, window_duration_arg):
+    """Function for finding the parameters of the windows from the measurement periods of the preprocessed data (shared
+    by the batch and the streaming pipelines, so both produce the same windows and features)
+    :param mean_period_arg: the average measurement period (the number of data points within a window)
+    :param median_period_arg: the median measurement period (the sampling frequency of the spectral and the jerk
+    features; the median is not affected by the gaps between the parts of the recording)
+    :param window_duration_arg: the duration of one window in seconds
+    :return: tuple (window_size, step_size, sampling_frequency)
+    """
+    # Calculate the number of data points within a window_duration_arg-second window
+    window_size = ceil(1.0 / mean_period_arg * window_duration_arg)
+    return window_size, window_size // 2, 1.0 / median_period_arg
+
+
+def get_window_size(df_arg, window_duration_arg, time_column_arg='time'):
+    """Function for finding the number of data points within a window of the given duration and the step between the
+    beginnings of two adjacent windows (adjacent windows overlap by 50%)
+    :param df_arg: a dataframe containing the results of the device measurement
+    :param window_duration_arg: the duration of one window in seconds
+    :param time_column_arg: the name of the column that contains information about the time of the measurements
+    :return: tuple (window_size, step_size)
+    """
+    window_size, step_size, _ = get_window_parameters(mean_period_arg=get_mean_period(df_arg[time_column_arg]),
+                                                      median_period_arg=np.nan,
+                                                      window_duration_arg=window_duration_arg)
+    return window_size, step_size
+
+
+def get_sampling_frequency(df_arg, time_column_arg='time'):
+    """Function for estimating the sampling frequency from the median measurement period (the median is not affected by
+    the gaps between the parts of the recording, e.g. after removing rows)
+    :param df_arg: a dataframe containing the results of the device measurement
+    :param time_column_arg: the name of the column that contains information about the time of the measurements
+    :return: the sampling frequency, Hz
+    """
+    return 1.0 / np.median(np.diff(df_arg[time_column_arg].to_numpy()))
+
+
+class PeriodAccumulator:
+    """Accumulation of the measurement periods of a recording read in chunks: the average and the median periods are
+    the same as get_mean_period and np.median(np.diff(times)) of the concatenated times. The median is found from the
+    counts of the distinct periods (the times are stored with a fixed precision, so there are few of them)
+    """
+
+    def __init__(self):
+        self.first_time = None
+        self.last_time = None
+        self.n_times = 0
+        self.period_counts = {}
+
+    def update(self, times_arg):
+        """Method for adding the next consecutive times of the recording
+        :param times_arg: an array of the measurement times
+        """
+        times = np.asarray(times_arg, dtype=np.float64)
+        if not len(times):
+            return
+        periods = np.diff(times) if self.last_time is None else np.diff(times, prepend=self.last_time)
+        for period, count in zip(*np.unique(periods, return_counts=True)):
+            self.period_counts[period] = self.period_counts.get(period, 0) + int(count)
+        if self.first_time is None:
+            self.first_time = times[0]
+        self.last_time = times[-1]
+        self.n_times += len(times)
+
+    def get_mean_period(self):
+        return (self.last_time - self.first_time) / (self.n_times - 1) if self.n_times > 1 else np.nan
+
+    def get_median_period(self):
+        if not self.period_counts:
+            return np.nan
+        periods = np.array(sorted(self.period_counts))
+        cumulative_counts = np.cumsum([self.period_counts[period] for period in periods])
+        n_periods = cumulative_counts[-1]
+        # The middle period (the average of the two middle periods for an even number of periods, as np.median does)
+        middle = periods[np.searchsorted(cumulative_counts, [(n_periods - 1) // 2, n_periods // 2], side='right')]
+        return np.mean(middle)
+
+    def get_window_parameters(self, window_duration_arg):
+        """Method for finding the parameters of the windows of the accumulated times (see get_window_parameters)
+        :param window_duration_arg: the duration of one window in seconds
+        :return: tuple (window_size, step_size, sampling_frequency)
+        """
+        return get_window_parameters(mean_period_arg=self.get_mean_period(), median_period_arg=self.get_median_period(),
+                                     window_duration_arg=window_duration_arg)
+
+
+def get_window_views(values_arg, window_size_arg, step_size_arg):
+    """Function for dividing an array of measurements into overlapping windows without copying the data
+    :param values_arg: an array of shape (n_rows,) or (n_rows, n_channels) that contains the measurements
+    :param window_size_arg: the number of data points within a window
+    :param step_size_arg: the step between the beginnings of two adjacent windows
+    :return: tuple (windows, tail_windows):
+        1) windows - a read-only view of shape (n_windows, window_size) or (n_windows, window_size, n_channels) that
+        contains all the windows that fit into the array completely;
+        2) tail_windows - a list of the shorter windows that start near the end of the array (their beginnings are
+        still step_size_arg apart, but they contain fewer than window_size_arg data points)
+    """
+    values = np.asarray(values_arg)
+    n_rows = values.shape[0]
+    n_full_windows = (n_rows - window_size_arg) // step_size_arg + 1 if n_rows >= window_size_arg else 0
+
+    if n_full_windows:
+        # sliding_window_view places the window axis last: (n_rows - window_size + 1, [n_channels,] window_size)
+        windows = sliding_window_view(values, window_size_arg, axis=0)[::step_size_arg]
+        if values.ndim == 2:
+            windows = windows.transpose(0, 2, 1)
+    else:
+        windows = np.empty((0, window_size_arg) + values.shape[1:], dtype=values.dtype)
+
+    tail_windows = [values[start:start + window_size_arg]
+                    for start in range(n_full_windows * step_size_arg, n_rows, step_size_arg)]
+    return windows, tail_windows
+
+
+def get_window_labels(codes_arg, n_codes_arg, window_size_arg, step_size_arg):
+    """Function for finding the most frequent label code of each window (including the shorter tail windows)
+    :param codes_arg: an integer array of label codes (values from 0 to n_codes_arg - 1) for each data point
+    :param n_codes_arg: the number of different label codes
+    :param window_size_arg: the number of data points within a window
+    :param step_size_arg: the step between the beginnings of two adjacent windows
+    :return: an array that contains the most frequent label code of each window. If several codes are equally
+    frequent, the one that occurs first in the window is chosen (as pd.Series.value_counts().idxmax() does)
+    """
+    codes = np.asarray(codes_arg)
+    n_rows = len(codes)
+    starts = np.arange(0, n_rows, step_size_arg)
+    ends = np.minimum(starts + window_size_arg, n_rows)
+
+    # For each code: the number of its occurrences in every window and the position of its first occurrence
+    counts = np.empty((len(starts), n_codes_arg), dtype=np.int64)
+    first_positions = np.empty((len(starts), n_codes_arg), dtype=np.int64)
+    for code in range(n_codes_arg):
+        positions = np.flatnonzero(codes == code)
+        first_indices = np.searchsorted(positions, starts)
+        counts[:, code] = np.searchsorted(positions, ends) - first_indices
+        first_positions[:, code] = np.append(positions, n_rows)[first_indices]
+
+    # The most frequent code wins; among equally frequent codes the one that occurs earlier wins
+    keys = counts * (n_rows + 1) + (n_rows - first_positions)
+    return keys.argmax(axis=1)
+
+
+def get_windows(df_arg, window_duration_arg, data_columns_arg, label_column_arg='activity', window_size_arg=None):
+    """Function for dividing the dataframe into overlapping (by 50%) windows of the given duration
+    :param df_arg: a dataframe containing the results of the device measurement
+    :param window_duration_arg: the duration of one window in seconds
+    :param data_columns_arg: a list of names of the columns that should be divided into windows
+    :param label_column_arg: the name of the column that contains the labels of the data points
+    :param window_size_arg: the number of data points within a window (if None, it is calculated from the average
+    sampling frequency of df_arg and window_duration_arg)
+    :return: tuple (windows, tail_windows, labels):
+        1) windows - a view of shape (n_windows, window_size, len(data_columns_arg)) that contains the full windows;
+        2) tail_windows - a list of arrays of shape (window_length, len(data_columns_arg)) for the shorter windows at
+        the end of the dataframe;
+        3) labels - an array that contains the most frequent label of each window (the full windows go first);
+        pd.Categorical of the same categories if the labels of df_arg are categorical
+    """
+    if window_size_arg is None:
+        window_size, step_size = get_window_size(df_arg=df_arg, window_duration_arg=window_duration_arg)
+    else:
+        window_size, step_size = window_size_arg, window_size_arg // 2
+    windows, tail_windows = get_window_views(values_arg=df_arg[data_columns_arg].to_numpy(),
+                                             window_size_arg=window_size,
+                                             step_size_arg=step_size)
+
+    labels = df_arg[label_column_arg]
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        # The codes of the categorical labels are counted directly, and the window labels keep the categories
+        label_codes = get_window_labels(codes_arg=labels.cat.codes.to_numpy(),
+                                        n_codes_arg=len(labels.cat.categories),
+                                        window_size_arg=window_size, step_size_arg=step_size)
+        return windows, tail_windows, pd.Categorical.from_codes(label_codes, dtype=labels.dtype)
 
-        windowed_dict['accX'].append(window_df['accX_filtered'].values)
-        windowed_dict['accY'].append(window_df['accY_filtered'].values)
-        windowed_dict['accZ'].append(window_df['accZ_filtered'].values)
+    # Encode the labels as integers to count them for all windows at once
+    codes, uniques = pd.factorize(labels)
+    label_codes = get_window_labels(codes_arg=codes, n_codes_arg=len(uniques),
+                                    window_size_arg=window_size, step_size_arg=step_size)
+    labels = np.asarray(uniques, dtype=object)[label_codes]
+    return windows, tail_windows, labels
 
-        windowed_dict['gyrZ'].append(window_df['gyrZ_filtered'].values)
 
-        # Determine the most frequent activity in the window
-        most_frequent_activity = window_df['activity'].value_counts().idxmax()
-        # Assign the most frequent activity to all rows in the window
-        windowed_dict['activity'].append(most_frequent_activity)
+def get_windowed_df(df_arg, window_duration_arg, window_size_arg=None, channels_arg=DATA_CHANNELS):
+    # Divide the entire dataframe into 2-second windows (the filtered data of the channels_arg channels)
+    windows, tail_windows, labels = get_windows(df_arg=df_arg,
+                                                window_duration_arg=window_duration_arg,
+                                                data_columns_arg=[f'{column}_filtered' for column in channels_arg],
+                                                window_size_arg=window_size_arg)
 
-        windowed_dfs.append(window_df)
+    windowed_dict = {}
+    for channel, column in enumerate(channels_arg):
+        windowed_dict[column] = list(windows[:, :, channel]) + [window[:, channel] for window in tail_windows]
+    # Assign the most frequent activity to each window
+    windowed_dict['activity'] = labels
 
     return pd.DataFrame.from_dict(windowed_dict)
 
@@ -49,11 +233,13 @@ def get_pie_charts(first_df, second_df, column, first_chart_title='First DataFra
     required) or just the filename
     :return: matplotlib.figure object
     """
-    # Calculate the percentage of each activity in first_df
+    # Calculate the percentage of each activity in first_df (the categories without rows are not shown)
     activity_percentages_first_df = first_df[column].value_counts(normalize=True) * 100
+    activity_percentages_first_df = activity_percentages_first_df[activity_percentages_first_df > 0]
 
     # Calculate the percentage of each activity in second_df
     activity_percentages_second_df = second_df[column].value_counts(normalize=True) * 100
+    activity_percentages_second_df = activity_percentages_second_df[activity_percentages_second_df > 0]
 
     # Create subplots for pie charts
     fig, axes = plt.subplots(1, 2, figsize=(12, 6))
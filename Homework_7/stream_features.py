@@ -0,0 +1,22 @@
+import sys
+
+from modules import streaming
+
+
+def main():
+    """Streaming mode of the pipeline: python stream_features.py <recording.csv> <features.csv> [chunk_size]
+    The features are appended to the output file as the windows of the recording are completed
+    """
+    input_filename, output_filename = sys.argv[1], sys.argv[2]
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+
+    number_of_windows = 0
+    for features_df in streaming.stream_features(filename=input_filename, chunk_size_arg=chunk_size):
+        features_df.to_csv(output_filename, mode='w' if number_of_windows == 0 else 'a',
+                           header=number_of_windows == 0, index=False)
+        number_of_windows += len(features_df)
+    print(f"number of windows = {number_of_windows}")
+
+
+if __name__ == "__main__":
+    main()
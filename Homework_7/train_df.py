@@ -1,52 +1,45 @@
+import os
 import streamlit as st
 
-from modules import get_data, display_df, display_results, frequency_stability, data_filtering, \
-    exploratory_data_analysis, windowing, pipeline
+from modules import get_data, display_df, display_results, windowing, pipeline, recording_cache, stage_cache
 
 
-def main():
-    display_df.set_page_config(page_title_arg="Physical Activity Recognition", layout_arg="centered")
-    streamlit_train_df_filename = 'data/Train/Train_activities_1_2023-08-23.csv'
-
-    df = get_data.read_from_file(filename=streamlit_train_df_filename)
-
-    # Exploring measurement period and frequency stability
-    df = df[df['time'].diff() <= frequency_stability.get_avg_period(df, 'time') * 1.5]
-
-    # Data Filtering
-    df[['accX_filtered', 'accY_filtered', 'accZ_filtered', 'gyrX_filtered', 'gyrY_filtered', 'gyrZ_filtered']] \
-        = data_filtering.median_filter_data(df_arg=df,
-                                            filter_columns_arg=['accX', 'accY', 'accZ', 'gyrX', 'gyrY', 'gyrZ'],
-                                            window_size_arg=10)
+@st.cache_resource
+def get_stage_cache():
+    """Function for getting the stage cache shared by all the reruns and sessions of the app
+    :return: stage_cache.StageCache
+    """
+    return stage_cache.StageCache(cache_dir=os.path.join(recording_cache.CACHE_DIR, 'stages'))
 
-    # Exploratory Data Analysis
-    df = df[df['activity'] != 'No activity']
 
-    # Perform undersampling to get a balanced dataframe
-    df = exploratory_data_analysis.get_undersampled_df(df_arg=df, column_name_arg='activity')
+@st.cache_resource(max_entries=4)
+def get_pipeline_results(filename, file_size, file_mtime_ns):
+    """Function for performing the pipeline once for a version of the recording file: the reruns of the page (e.g.
+    after a checkbox toggle) get the same results object without reading the file or checking the stage cache. The
+    results must not be modified by the page
+    :param filename: the recording CSV file
+    :param file_size: the size of the file (with file_mtime_ns, invalidates the results when the file changes)
+    :param file_mtime_ns: the modification time of the file
+    :return: tuple (results, data_key): the dictionary returned by pipeline.perform_pipeline and the fingerprint of the
+    recording (the key of the rendered figures)
+    """
+    df = get_data.read_from_file(filename=filename)
+    data_key = stage_cache.get_df_fingerprint(df)
+    return pipeline.perform_pipeline(df_arg=df, cache_arg=get_stage_cache()), data_key
 
-    # Build a correlation matrix and remove certain axes of the accelerometer or gyroscope
-    sel_columns = ['accX_filtered', 'accY_filtered', 'accZ_filtered', 'gyrX_filtered', 'gyrY_filtered',
-                   'gyrZ_filtered']
 
-    # Calculate the correlation matrix for the selected columns
-    corr_matrix = df[sel_columns].corr()
-    important_columns = ['accX_filtered', 'accY_filtered', 'accZ_filtered']
-    discard_columns = exploratory_data_analysis.get_discard_columns(corr_matrix_arg=corr_matrix,
-                                                                    important_columns_arg=important_columns,
-                                                                    df_arg=df)
-    sel_columns = [col for col in sel_columns if col not in discard_columns]
-    sel_columns.append('activity')
-    filtered_df = df[['time'] + sel_columns].copy()
-
-    # Windowing
-    windowed_df = windowing.get_windowed_df(df_arg=filtered_df, window_duration_arg=2)
-
-    # Feature Engineering
-    windowed_df = pipeline.perform_feature_engineering(df_arg=windowed_df)
+def main():
+    display_df.set_page_config(page_title_arg="Physical Activity Recognition", layout_arg="centered")
+    streamlit_train_df_filename = 'data/Train/Train_activities_1_2023-08-23.csv'
 
-    # Model Training Preparation
-    X_train, y_train, X_valid, y_valid = pipeline.model_training_data_preparation(df_arg=windowed_df)
+    # Exploring measurement period and frequency stability, Data Filtering, Exploratory Data Analysis, Windowing,
+    # Feature Engineering, Model Training Preparation
+    file_stat = os.stat(streamlit_train_df_filename)
+    results, data_key = get_pipeline_results(filename=streamlit_train_df_filename, file_size=file_stat.st_size,
+                                             file_mtime_ns=file_stat.st_mtime_ns)
+    df, corr_matrix, discard_columns = results['df'], results['corr_matrix'], results['discard_columns']
+    filtered_df, windowed_df = results['filtered_df'], results['features_df']
+    X_train, y_train, X_valid, y_valid = results['X_train'], results['y_train'], results['X_valid'], results['y_valid']
 
     # Display results on the Streamlit page
     st.subheader("Running a pipeline on training data")
@@ -56,17 +49,22 @@ def main():
         if st.checkbox("Display general information"):
             display_results.show_freq_info(df_arg=df, column_name_arg='time')
         if st.checkbox("Display the results of frequency stabilization"):
-            display_results.show_freq_stability(df_arg=df, column_name_arg='time')
+            display_results.show_freq_stability(df_arg=df, column_name_arg='time', data_key_arg=f'{data_key}|df')
+    # Streamlit does not tell the script whether an expander is open, so the graphs in the expanders are rendered only
+    # when their checkboxes are selected
     with st.expander("Data Filtering"):
-        display_results.show_filtering_results(df_arg=df)
+        display_results.show_filtering_results(df_arg=df, data_key_arg=f'{data_key}|df')
     with st.expander("Exploratory Data Analysis"):
         display_results.show_data_analysis_results(df_arg=filtered_df,
                                                    corr_matrix_arg=corr_matrix,
-                                                   discard_columns_arg=discard_columns)
+                                                   discard_columns_arg=discard_columns,
+                                                   data_key_arg=f'{data_key}|filtered_df')
     with st.expander("Data Transformation"):
-        st.pyplot(windowing.get_pie_charts(first_df=filtered_df, second_df=windowed_df, column='activity',
-                                           first_chart_title="Original DataFrame",
-                                           second_chart_title="Windowed DataFrame"))
+        if st.checkbox("Display class distribution"):
+            display_results.show_figure(windowing.get_pie_charts, data_key_arg=f'{data_key}|windowed_df',
+                                        first_df=filtered_df, second_df=windowed_df, column='activity',
+                                        first_chart_title="Original DataFrame",
+                                        second_chart_title="Windowed DataFrame")
     with st.expander("Feature Engineering"):
         display_df.display_df_info(df_arg=windowed_df, title_arg="##### features_df info")
         st.info(f"Number of features = {len(windowed_df.columns) - 2}")